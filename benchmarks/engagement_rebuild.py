@@ -0,0 +1,89 @@
+"""Rebuild time of the event-sourced engagement projection
+
+Fills a scratch database with synthetic engagement events, then times a
+rebuild from the whole log, a rebuild from a snapshot plus a log tail, and
+the write path of both engagement modes. Run with:
+
+    python -m benchmarks.engagement_rebuild --events 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from src.database.manager import DatabaseManager
+
+ACTIONS = ['dismissed', 'clicked', 'expanded', 'acted']
+
+
+def _fill(db: DatabaseManager, events: int, tasks: int, first_seq: int, seed: int) -> None:
+    """Append events straight into the log, as the projector would have"""
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(seconds=events)
+    conn = db._connect()
+    batch = []
+    for seq in range(first_seq, first_seq + events):
+        batch.append((seq, rng.randint(1, tasks), rng.choice(ACTIONS),
+                      (start + timedelta(seconds=seq)).isoformat(sep=' ')))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO engagement_events VALUES (?, ?, ?, ?)", batch)
+            batch.clear()
+    conn.executemany("INSERT INTO engagement_events VALUES (?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def _time(label: str, func, count: int) -> None:
+    t0 = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<42} {elapsed:8.2f}s  {count / elapsed:>12,.0f} events/s")
+
+
+def _write_path(directory: str, mode: str, durability: str, count: int, tasks: int) -> None:
+    db = DatabaseManager(os.path.join(directory, f"write_{mode}_{durability}.db"),
+                         durability=durability, seed=False, engagement=mode)
+    rng = random.Random(1)
+    ops = [(rng.randint(1, tasks), rng.choice(ACTIONS)) for _ in range(count)]
+
+    def run():
+        for task_id, action in ops:
+            db.update_task_engagement(task_id, action)
+
+    _time(f"update_task_engagement ({mode}, {durability})", run, count)
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark engagement projection rebuilds")
+    parser.add_argument('--events', type=int, default=1_000_000, help="events in the log")
+    parser.add_argument('--tail', type=int, default=10_000, help="events after the snapshot")
+    parser.add_argument('--tasks', type=int, default=1000, help="distinct tasks")
+    parser.add_argument('--writes', type=int, default=2000,
+                        help="update_task_engagement calls timed per mode")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="engagement_rebuild_")
+    db = DatabaseManager(os.path.join(directory, "log.db"), seed=False, engagement='events')
+    log = db._engagement_log
+
+    t0 = time.perf_counter()
+    _fill(db, args.events, args.tasks, first_seq=1, seed=1)
+    print(f"Wrote {args.events:,} events for {args.tasks} tasks "
+          f"in {time.perf_counter() - t0:.1f}s ({directory})")
+
+    _time("rebuild from the whole log", lambda: log.rebuild(from_snapshot=False), args.events)
+    log.snapshot()
+    _fill(db, args.tail, args.tasks, first_seq=args.events + 1, seed=2)
+    _time(f"rebuild from snapshot + {args.tail:,} tail", log.rebuild, args.tail)
+    db.close()
+
+    for durability in ('sync', 'batched'):
+        for mode in ('table', 'events'):
+            _write_path(directory, mode, durability, args.writes, args.tasks)
+
+
+if __name__ == "__main__":
+    main()
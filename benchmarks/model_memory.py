@@ -0,0 +1,87 @@
+"""Per-object memory footprint and row-mapping cost of the data models
+
+Compares the slotted models with lazy timestamps against equivalent plain
+dataclasses built the old way (keyword arguments and eager
+``datetime.fromisoformat``). Run with:
+
+    python -m benchmarks.model_memory --count 100000
+"""
+import argparse
+import dataclasses
+import time
+import tracemalloc
+from datetime import datetime
+
+from src.models import GeneratedNotification, Task, task_from_row
+from src.models.ids import next_notification_id
+
+TIMESTAMP = '2025-01-15 09:30:00'
+
+
+def _plain(cls):
+    """Equivalent dataclass with a per-instance __dict__"""
+    return dataclasses.make_dataclass(
+        f"Plain{cls.__name__}",
+        [(f.name, f.type, f) if f.default is not dataclasses.MISSING else (f.name, f.type)
+         for f in dataclasses.fields(cls)],
+    )
+
+
+PlainTask = _plain(Task)
+PlainNotification = _plain(GeneratedNotification)
+
+
+def _task_rows(count: int):
+    return [(i, 1, f"Task {i}", 'learning', 5, "notes", 'simple', TIMESTAMP, TIMESTAMP, 1)
+            for i in range(count)]
+
+
+def _notification_args(i: int):
+    return (None, next_notification_id(), i, "hook", None, "next step", 0.8, 'simple', datetime.now())
+
+
+def _plain_task_from_row(row):
+    return PlainTask(
+        id=row[0], user_id=row[1], title=row[2], category=row[3],
+        importance=row[4], notes=row[5], task_type=row[6],
+        created_at=datetime.fromisoformat(row[7]),
+        updated_at=datetime.fromisoformat(row[8]),
+        is_active=bool(row[9])
+    )
+
+
+def measure(build, count: int):
+    """Build ``count`` objects; returns (bytes per object, microseconds per object)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(objects) == count
+    return size / count, elapsed / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100_000, help="objects per measurement")
+    args = parser.parse_args()
+    count = args.count
+    rows = _task_rows(count)
+
+    cases = [
+        ("Task (dict, eager timestamps)", lambda: [_plain_task_from_row(r) for r in rows]),
+        ("Task (slots, lazy timestamps)", lambda: [task_from_row(None, r) for r in rows]),
+        ("GeneratedNotification (dict)",
+         lambda: [PlainNotification(*_notification_args(i)) for i in range(count)]),
+        ("GeneratedNotification (slots)",
+         lambda: [GeneratedNotification(*_notification_args(i)) for i in range(count)]),
+    ]
+    print(f"{'model':<34} {'bytes/object':>13} {'us/object':>10}")
+    for name, build in cases:
+        per_object, per_object_us = measure(build, count)
+        print(f"{name:<34} {per_object:>13.0f} {per_object_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Throughput and memory of scroll-event ingestion
+
+Synthesizes time-ordered scroll and app-usage events for a population of
+users (sessions of scroll events a few seconds apart, separated by idle
+periods), feeds them to ScrollEventIngestor in batches as the server
+would, and reports events per second, triggers and memory per tracked
+user. Run with:
+
+    python -m benchmarks.scroll_ingestion --users 10000 --events 2000000
+"""
+import argparse
+import heapq
+import random
+import time
+import tracemalloc
+from itertools import islice
+from typing import Iterator, List, Tuple
+
+from src.core.ingestion import ScrollEvent, ScrollEventIngestor
+
+
+def _user_events(user_id: int, rng: random.Random,
+                 start: float) -> Iterator[Tuple[float, int, str]]:
+    """Endless event stream of one user as (timestamp, user_id, kind), which
+    heapq.merge orders by time; _events turns them into ScrollEvents"""
+    now = start + rng.uniform(0, 600)
+    while True:
+        yield (now, user_id, 'app_open')
+        end = now + rng.expovariate(1 / 90)
+        while now < end:
+            now += rng.uniform(1, 4)
+            yield (now, user_id, 'scroll')
+        yield (now, user_id, 'app_close')
+        now += rng.expovariate(1 / 600)
+
+
+def _events(users: int, count: int, seed: int) -> List[ScrollEvent]:
+    rng = random.Random(seed)
+    start = time.time()
+    merged = heapq.merge(*(_user_events(user_id, rng, start) for user_id in range(1, users + 1)))
+    return [(user_id, timestamp, kind) for timestamp, user_id, kind in islice(merged, count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scroll-event ingestion")
+    parser.add_argument('--users', type=int, default=10_000, help="simulated users")
+    parser.add_argument('--events', type=int, default=2_000_000, help="events ingested")
+    parser.add_argument('--batch', type=int, default=1000, help="events per ingest_many call")
+    parser.add_argument('--seed', type=int, default=42, help="random seed")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    events = _events(args.users, args.events, args.seed)
+    span = events[-1][1] - events[0][1]
+    print(f"Generated {len(events):,} events for {args.users:,} users covering "
+          f"{span / 3600:.1f}h in {time.perf_counter() - t0:.1f}s")
+
+    ingestor = ScrollEventIngestor()
+    triggers = 0
+    t0 = time.perf_counter()
+    for offset in range(0, len(events), args.batch):
+        triggers += len(ingestor.ingest_many(events[offset:offset + args.batch]))
+    elapsed = time.perf_counter() - t0
+    print(f"Ingested in {elapsed:.2f}s: {len(events) / elapsed:,.0f} events/s, "
+          f"{elapsed / len(events) * 1e6:.2f} us/event, {triggers:,} triggers")
+
+    # Memory of the per-user state, measured on a fresh ingestor
+    tracemalloc.start()
+    ingestor = ScrollEventIngestor()
+    for offset in range(0, len(events), args.batch):
+        ingestor.ingest_many(events[offset:offset + args.batch])
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Tracking {len(ingestor):,} users in {current / 1e6:.1f} MB "
+          f"({current / max(1, len(ingestor)):,.0f} bytes/user)")
+
+
+if __name__ == "__main__":
+    main()
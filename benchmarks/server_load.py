@@ -0,0 +1,136 @@
+"""Closed-loop load test of the HTTP service
+
+Each client thread holds one keep-alive connection and repeatedly requests
+a notification and reports a simulated response to it. By default the
+server is started in-process on a scratch database with template
+generation, so the test runs fully offline; pass --url to target a
+running server instead. Run with:
+
+    python -m benchmarks.server_load --clients 16 --duration 10
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from src.core.scroll_breaker import ScrollBreakerAI
+from src.server.app import NotificationServer
+from src.simulation.simulator import percentile
+
+USER_ACTIONS = ['dismissed', 'clicked', 'expanded', 'acted']
+
+
+def _start_server(db_path: str, provider: str, durability: str) -> tuple:
+    """Run a NotificationServer on its own event loop thread; returns (server, loop)"""
+    ai_system = ScrollBreakerAI(db_path=db_path, llm_provider=provider, durability=durability)
+    server = NotificationServer(ai_system, host='127.0.0.1', port=0)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="load-test-server", daemon=True).start()
+    started.wait()
+    return server, loop
+
+
+def _client(host: str, port: int, deadline: float, seed: int, users: List[int],
+            samples: Dict[str, List[float]], errors: List[int]) -> None:
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+
+    def call(method: str, path: str, body: Dict) -> Dict:
+        conn.request(method, path, json.dumps(body), {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        payload = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"{path}: {response.status} {payload.get('error')}")
+        return payload
+
+    while time.perf_counter() < deadline:
+        context = {'scrolling_time': rng.randint(20, 120), 'hour': rng.randrange(24),
+                   'day_of_week': rng.randrange(7)}
+        try:
+            t0 = time.perf_counter()
+            notification = call('POST', '/notifications',
+                                {'user_id': rng.choice(users), 'context': context})
+            t1 = time.perf_counter()
+            call('POST', '/responses', {
+                'notification_id': notification['notification_id'],
+                'user_action': rng.choice(USER_ACTIONS),
+                'response_time': rng.uniform(1, 20),
+                'context': context,
+            })
+            t2 = time.perf_counter()
+        except Exception:
+            errors.append(1)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            continue
+        samples['generate'].append(t1 - t0)
+        samples['respond'].append(t2 - t1)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the HTTP service")
+    parser.add_argument('--url', default=None, help="target a running server instead")
+    parser.add_argument('--clients', type=int, default=16, help="concurrent connections")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--users', type=int, default=1, help="user ids 1..N to spread load over")
+    parser.add_argument('--provider', default='none', help="LLM provider of the in-process server")
+    parser.add_argument('--durability', choices=['sync', 'batched'], default=None,
+                        help="database durability mode of the in-process server")
+    args = parser.parse_args()
+
+    server = loop = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="server_load_"), "load.db")
+        server, loop = _start_server(db_path, args.provider, args.durability)
+        host, port = server.host, server.port
+
+    samples = {'generate': [], 'respond': []}
+    errors: List[int] = []
+    deadline = time.perf_counter() + args.duration
+    users = list(range(1, args.users + 1))
+    threads = [
+        threading.Thread(target=_client,
+                         args=(host, port, deadline, seed, users, samples, errors))
+        for seed in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if server is not None:
+        asyncio.run_coroutine_threadsafe(server.shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    requests_done = len(samples['generate']) + len(samples['respond'])
+    print(f"Clients: {args.clients}, duration: {elapsed:.1f}s, errors: {len(errors)}")
+    print(f"Throughput: {requests_done / elapsed:.1f} HTTP requests/s")
+    for name, values in samples.items():
+        print(f"- {name}: p50={percentile(values, 50) * 1000:.2f}ms "
+              f"p90={percentile(values, 90) * 1000:.2f}ms "
+              f"p99={percentile(values, 99) * 1000:.2f}ms (n={len(values)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Selection throughput of worker processes with and without shared engagement state
+
+Starts ``--workers`` processes that each run a selection policy over one
+user's tasks for ``--duration`` seconds while another process records
+responses, first reading engagement from SQLite and then from the shared
+memory store (ENGAGEMENT_SHARED). Run with:
+
+    python -m benchmarks.shared_engagement --workers 4 --tasks 50 --policy thompson
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from src.core.selection import create_policy
+from src.database.manager import DatabaseManager
+from src.models.ids import next_notification_id
+from src.models.models import GeneratedNotification, NotificationResponse
+
+ACTIONS = ['dismissed', 'clicked', 'expanded', 'acted']
+CATEGORIES = ['learning', 'work', 'health', 'personal']
+
+
+def _context(rng: random.Random) -> dict:
+    return {'hour': rng.randrange(24), 'day_of_week': rng.randrange(7),
+            'scrolling_time': rng.randint(10, 150)}
+
+
+def _select(db_path: str, shared: bool, policy: str, duration: float, results) -> None:
+    db = DatabaseManager(db_path, seed=False, shared_engagement=shared)
+    selector = create_policy(policy, db)
+    tasks = db.get_user_tasks(1)
+    rng = random.Random(os.getpid())
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        selector.select(tasks, _context(rng))
+        count += 1
+    db.close()
+    results.put(count)
+
+
+def _respond(db_path: str, shared: bool, stop) -> None:
+    db = DatabaseManager(db_path, seed=False, shared_engagement=shared)
+    task_ids = [task.id for task in db.get_user_tasks(1)]
+    rng = random.Random(0)
+    while not stop.is_set():
+        task_id = rng.choice(task_ids)
+        action = rng.choice(ACTIONS)
+        notification = GeneratedNotification(
+            id=None, notification_id=next_notification_id(), task_id=task_id,
+            hook_message="benchmark", expanded_content=None, next_step=None,
+            confidence_score=0.5, generation_strategy="benchmark", timestamp=datetime.now(),
+            context_key="morning:weekday:short",
+        )
+        db.save_notification(notification)
+        db.save_response(NotificationResponse(
+            id=None, notification_id=notification.notification_id, task_id=task_id,
+            user_action=action, response_time=1.0, was_expanded=False,
+            timestamp=datetime.now(), context={},
+        ))
+        db.update_task_engagement(task_id, action)
+    db.close()
+
+
+def _run(db_path: str, shared: bool, args) -> None:
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    writer = multiprocessing.Process(target=_respond, args=(db_path, shared, stop))
+    workers = [multiprocessing.Process(target=_select,
+                                       args=(db_path, shared, args.policy, args.duration, results))
+               for _ in range(args.workers)]
+    writer.start()
+    for worker in workers:
+        worker.start()
+    total = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    stop.set()
+    writer.join()
+    label = "shared memory" if shared else "SQLite"
+    print(f"{label:<14} {total / args.duration:>10,.0f} selections/s "
+          f"({args.workers} workers, {args.tasks} tasks, {args.policy})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark selection reads across processes")
+    parser.add_argument('--workers', type=int, default=4, help="selecting processes")
+    parser.add_argument('--tasks', type=int, default=50, help="active tasks of the user")
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds per mode")
+    parser.add_argument('--policy', default='heuristic', help="selection policy")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="shared_engagement_"), "bench.db")
+    db = DatabaseManager(db_path, shared_engagement=False)
+    rng = random.Random(1)
+    for index in range(args.tasks):
+        db.create_task(1, f"Task {index}", rng.choice(CATEGORIES), rng.randint(1, 10),
+                       "benchmark task", rng.choice(['simple', 'complex']))
+    db.close()
+
+    for shared in (False, True):
+        _run(db_path, shared, args)
+
+
+if __name__ == "__main__":
+    main()
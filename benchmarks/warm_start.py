@@ -0,0 +1,79 @@
+"""Cold versus warm worker restarts
+
+Runs a worker against a scratch database with the stub LLM provider,
+event-sourced engagement and notification pools, and closes it so it leaves
+a warm-start snapshot. Each trial then restores copies of the database and
+the snapshot, and times constructing ScrollBreakerAI plus serving the first
+requests, once with the snapshot ignored (cold) and once restored from it
+(warm). Run with:
+
+    python -m benchmarks.warm_start --trials 5 --requests 20
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+
+def _serve(ai, requests: int) -> None:
+    for i in range(requests):
+        ai.generate_smart_notification({'scrolling_time': 600, 'hour': 21, 'day_of_week': 4},
+                                       user_id=i % 10 + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold and warm worker restarts")
+    parser.add_argument('--trials', type=int, default=5, help="restarts timed per mode")
+    parser.add_argument('--requests', type=int, default=20,
+                        help="requests served after each restart")
+    parser.add_argument('--warmup-requests', type=int, default=200,
+                        help="requests served before the snapshot is taken")
+    parser.add_argument('--latency-ms', type=float, default=300, help="stub LLM latency")
+    args = parser.parse_args()
+
+    # Configuration is read at import time
+    os.environ['ENGAGEMENT_MODE'] = 'events'
+    os.environ.setdefault('NOTIFICATION_POOL_SIZE', '3')
+    os.environ['STUB_LATENCY_MS'] = str(args.latency_ms)
+    os.environ['STUB_SEED'] = '42'
+    from src.core.scroll_breaker import ScrollBreakerAI
+
+    directory = tempfile.mkdtemp(prefix="warm_start_")
+    db_path = os.path.join(directory, "worker.db")
+    ai = ScrollBreakerAI(db_path, llm_provider='stub', warm_start=True)
+    _serve(ai, args.warmup_requests)
+    time.sleep(args.latency_ms * 5 / 1000)  # let pool refills land before the snapshot
+    ai.close()
+    # copy2 keeps the modification time the snapshot was validated against
+    for suffix in ('', '.warm'):
+        shutil.copy2(db_path + suffix, db_path + suffix + '.orig')
+    print(f"Snapshot of {os.path.getsize(db_path + '.warm'):,} bytes for a "
+          f"{os.path.getsize(db_path):,} byte database ({directory})")
+
+    timings = {'cold': [], 'warm': []}
+    for _ in range(args.trials):
+        for mode in timings:
+            shutil.copy2(db_path + '.orig', db_path)
+            shutil.copy(db_path + '.warm.orig', db_path + '.warm')
+            t0 = time.perf_counter()
+            ai = ScrollBreakerAI(db_path, llm_provider='stub', warm_start=mode == 'warm')
+            started = time.perf_counter()
+            _serve(ai, args.requests)
+            served = time.perf_counter()
+            assert ai.warm_started == (mode == 'warm')
+            timings[mode].append((started - t0, served - t0))
+            ai.warm_start = False  # keep the original snapshot for the next trial
+            ai.close()
+
+    for mode, samples in timings.items():
+        startup = statistics.median(start for start, _ in samples)
+        total = statistics.median(total for _, total in samples)
+        print(f"{mode:<5} startup {startup * 1000:8.1f} ms   "
+              f"startup + {args.requests} requests {total * 1000:8.1f} ms")
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,14 @@ from setuptools import setup, find_packages
 setup(
     name="scroll_breaker",
     version="0.1",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
+    python_requires=">=3.10",
     install_requires=[
         "python-dotenv",
         "google-generativeai",
         "requests",
     ],
+    extras_require={
+        "analytics": ["pyarrow"],
+    },
 )
@@ -1,13 +1,18 @@
 """Configuration management module"""
+import logging
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 from enum import Enum
 
+logger = logging.getLogger(__name__)
+
 class LLMProvider(Enum):
     """Available LLM providers"""
     GEMINI = "gemini"
     LOCAL = "local"
+    STUB = "stub"  # Offline stand-in with injected latency and failures
     NONE = "none"  # Fallback to templates
 
 # Get the root directory of the project
@@ -16,29 +21,140 @@ ENV_FILE = ROOT_DIR / '.env'
 
 # Load environment variables from .env file
 if ENV_FILE.exists():
-    print(f"Loading environment variables from {ENV_FILE}")
+    logger.info("Loading environment variables from %s", ENV_FILE)
     load_dotenv(ENV_FILE)
 else:
-    print(f"Warning: .env file not found at {ENV_FILE}")
+    logger.warning(".env file not found at %s", ENV_FILE)
 
 # LLM Configuration
 ACTIVE_LLM = os.getenv('ACTIVE_LLM', 'none').lower()
 if ACTIVE_LLM not in [e.value for e in LLMProvider]:
-    print(f"Warning: Invalid LLM provider '{ACTIVE_LLM}'. Using fallback templates.")
+    logger.warning("Invalid LLM provider '%s'. Using fallback templates.", ACTIVE_LLM)
     ACTIVE_LLM = LLMProvider.NONE.value
 else:
-    print(f"Using LLM provider: {ACTIVE_LLM}")
+    logger.info("Using LLM provider: %s", ACTIVE_LLM)
 
 # Gemini configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 if ACTIVE_LLM == LLMProvider.GEMINI.value and not GEMINI_API_KEY:
-    print("Warning: No Gemini API key found. Will use fallback templates.")
+    logger.warning("No Gemini API key found. Will use fallback templates.")
     ACTIVE_LLM = LLMProvider.NONE.value
 
 # Ollama configuration
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama2')
+# How long the server keeps the model loaded after a request (Ollama duration, e.g. '30m', '-1')
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+OLLAMA_TIMEOUT = float(os.getenv('OLLAMA_TIMEOUT', '120'))
 if ACTIVE_LLM == LLMProvider.LOCAL.value:
-    print(f"Using Ollama with model {OLLAMA_MODEL} at {OLLAMA_HOST}")
+    logger.info("Using Ollama with model %s at %s", OLLAMA_MODEL, OLLAMA_HOST)
+
+# Stub provider (ACTIVE_LLM=stub): log-normal latency around the median, and
+# the fractions of requests that fail, hit the rate limit or return bad JSON
+STUB_LATENCY_MS = float(os.getenv('STUB_LATENCY_MS', '800'))
+STUB_LATENCY_SIGMA = float(os.getenv('STUB_LATENCY_SIGMA', '0.5'))
+STUB_ERROR_RATE = float(os.getenv('STUB_ERROR_RATE', '0'))
+STUB_RATE_LIMIT_RATE = float(os.getenv('STUB_RATE_LIMIT_RATE', '0'))
+STUB_MALFORMED_RATE = float(os.getenv('STUB_MALFORMED_RATE', '0.05'))
+STUB_SEED = int(os.environ['STUB_SEED']) if os.getenv('STUB_SEED') else None
+
+# Instrumentation: record timing spans and counters (see src.instrumentation)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+# Archival of notification history into monthly segment files
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archives')
+ARCHIVE_HORIZON_DAYS = int(os.getenv('ARCHIVE_HORIZON_DAYS', '90'))
+
+# Database write path: 'sync' commits every write, 'batched' group-commits
+# notifications and responses from a background writer (see DatabaseManager)
+DB_DURABILITY = os.getenv('DB_DURABILITY', 'sync').lower()
+DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', '30'))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '200'))
+OUTBOX_FLUSH_INTERVAL = float(os.getenv('OUTBOX_FLUSH_MS', '5')) / 1000
+OUTBOX_MAX_QUEUE = int(os.getenv('OUTBOX_MAX_QUEUE', '10000'))
+
+# Work on an in-memory copy of the database file, written back every
+# DB_CHECKPOINT_INTERVAL seconds and on shutdown (see src/database/memory.py)
+DB_IN_MEMORY = os.getenv('DB_IN_MEMORY', '').lower() in ('1', 'true', 'yes')
+DB_CHECKPOINT_INTERVAL = float(os.getenv('DB_CHECKPOINT_INTERVAL', '5'))  # seconds of writes at risk
+
+# Task engagement storage: 'table' updates task_engagement in place, 'events'
+# appends to an event log projected in memory (see src/database/engagement_log.py)
+ENGAGEMENT_MODE = os.getenv('ENGAGEMENT_MODE', 'table').lower()
+ENGAGEMENT_SNAPSHOT_INTERVAL = int(os.getenv('ENGAGEMENT_SNAPSHOT_INTERVAL', '10000'))  # events
+
+# Engagement, response counters and bandit posteriors mirrored in shared memory
+# so selection in every worker process reads them without querying SQLite;
+# task ids at or above the capacity are read from the database
+ENGAGEMENT_SHARED = os.getenv('ENGAGEMENT_SHARED', '').lower() in ('1', 'true', 'yes')
+ENGAGEMENT_SHARED_CAPACITY = int(os.getenv('ENGAGEMENT_SHARED_CAPACITY', '16384'))  # task ids
+
+# Save in-process state (engagement projection, pools, caches) on shutdown and
+# restore it on the next start if the database is unchanged (see
+# src/core/warm_start.py); the snapshot defaults to <database>.warm
+WARM_START = os.getenv('WARM_START', '').lower() in ('1', 'true', 'yes')
+WARM_START_PATH = os.getenv('WARM_START_PATH', '')
+
+# Number of user shards; above 1 the database path holds the shard directory
+DB_SHARDS = int(os.getenv('DB_SHARDS', '1'))
+
+# Task selection policy: 'heuristic' or 'thompson' (see src/core/selection.py)
+SELECTION_POLICY = os.getenv('SELECTION_POLICY', 'heuristic').lower()
+# Extra Thompson draws per selection to estimate (and log) the propensity of
+# its choice for offline evaluation; 0 skips them
+SELECTION_PROPENSITY_SAMPLES = int(os.getenv('SELECTION_PROPENSITY_SAMPLES', '0'))
+
+# LLM generation queue (see src/notifications/queue.py). Rate limits are
+# requests per second with a burst allowance; 0 disables the limit.
+GENERATION_WORKERS = int(os.getenv('GENERATION_WORKERS', '4'))
+GENERATION_TIMEOUT = float(os.getenv('GENERATION_TIMEOUT', '30'))  # live deadline, seconds
+REFILL_TIMEOUT = float(os.getenv('REFILL_TIMEOUT', '300'))  # pool refill deadline, seconds
+PROVIDER_RATE_LIMITS = {
+    LLMProvider.GEMINI.value: (float(os.getenv('GEMINI_RATE_LIMIT', '1')),
+                               float(os.getenv('GEMINI_RATE_BURST', '5'))),
+    LLMProvider.LOCAL.value: (float(os.getenv('OLLAMA_RATE_LIMIT', '0')),
+                              float(os.getenv('OLLAMA_RATE_BURST', '1'))),
+    LLMProvider.STUB.value: (float(os.getenv('STUB_RATE_LIMIT', '0')),
+                             float(os.getenv('STUB_RATE_BURST', '1'))),
+}
+RATE_LIMIT_BACKOFF = float(os.getenv('RATE_LIMIT_BACKOFF', '30'))  # pause after a quota error
+
+# Pre-generated LLM notifications kept per complex task (0 disables the pool)
+NOTIFICATION_POOL_SIZE = int(os.getenv('NOTIFICATION_POOL_SIZE', '0'))
+NOTIFICATION_POOL_MAX_AGE = float(os.getenv('NOTIFICATION_POOL_MAX_AGE', '3600'))
+
+# Near-duplicate suppression: notifications remembered per task (0 disables)
+# and the largest SimHash Hamming distance (of 64 bits) counted as a repeat
+DEDUP_WINDOW = int(os.getenv('DEDUP_WINDOW', '10'))
+DEDUP_MAX_DISTANCE = int(os.getenv('DEDUP_MAX_DISTANCE', '10'))
+
+# Scroll-event ingestion (see src/core/ingestion.py). A session ends after
+# INGEST_IDLE_GAP seconds without events; a notification is triggered when a
+# session runs INGEST_SCROLL_THRESHOLD seconds or the user starts
+# INGEST_SESSION_THRESHOLD sessions within INGEST_WINDOW seconds, at most once
+# per INGEST_TRIGGER_COOLDOWN seconds per user
+INGEST_IDLE_GAP = float(os.getenv('INGEST_IDLE_GAP', '30'))
+INGEST_SCROLL_THRESHOLD = float(os.getenv('INGEST_SCROLL_THRESHOLD', '60'))
+INGEST_SESSION_THRESHOLD = int(os.getenv('INGEST_SESSION_THRESHOLD', '6'))
+INGEST_WINDOW = float(os.getenv('INGEST_WINDOW', '3600'))
+INGEST_WINDOW_BUCKETS = int(os.getenv('INGEST_WINDOW_BUCKETS', '60'))
+INGEST_TRIGGER_COOLDOWN = float(os.getenv('INGEST_TRIGGER_COOLDOWN', '600'))
+INGEST_MAX_USERS = int(os.getenv('INGEST_MAX_USERS', '100000'))  # least recently active evicted
+# Notifications generated inline per ingested batch; further triggers are
+# returned for the client to request with POST /notifications
+INGEST_MAX_NOTIFICATIONS = int(os.getenv('INGEST_MAX_NOTIFICATIONS', '5'))
+
+# HTTP service (python -m src.server)
+SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8080'))
+SERVER_MAX_CONCURRENCY = int(os.getenv('SERVER_MAX_CONCURRENCY', '32'))  # requests in flight
+SERVER_REQUEST_TIMEOUT = float(os.getenv('SERVER_REQUEST_TIMEOUT', '30'))  # seconds
+SERVER_SHUTDOWN_GRACE = float(os.getenv('SERVER_SHUTDOWN_GRACE', '10'))  # seconds
+
+# Notification IDs (see src/models/ids.py). Processes on one host lease a
+# worker id automatically; deployments spanning hosts, or running without
+# fcntl, must give each process a distinct ID_WORKER_ID (0-1022).
+ID_WORKER_ID = int(os.environ['ID_WORKER_ID']) if os.getenv('ID_WORKER_ID') else None
+ID_LEASE_DIR = os.getenv('ID_LEASE_DIR', os.path.join(tempfile.gettempdir(), 'scroll_breaker_ids'))
 
 # Add other configuration variables here
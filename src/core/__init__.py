@@ -1,3 +1,6 @@
+from .ingestion import ScrollEventIngestor
 from .scroll_breaker import ScrollBreakerAI
+from .selection import SelectionPolicy, HeuristicPolicy, ThompsonSamplingPolicy, create_policy
 
-__all__ = ['ScrollBreakerAI']
+__all__ = ['ScrollBreakerAI', 'ScrollEventIngestor', 'SelectionPolicy', 'HeuristicPolicy',
+           'ThompsonSamplingPolicy', 'create_policy']
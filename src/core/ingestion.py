@@ -0,0 +1,223 @@
+"""Scroll-event ingestion
+
+Turns a stream of per-user scroll and app-usage events into the context a
+notification is generated for, and decides when one is due. Events are
+``(user_id, timestamp, kind)`` with the device's epoch-seconds timestamp and
+a kind from EVENT_KINDS: 'scroll' and 'app_open' are activity, 'app_close'
+(or the screen turning off) ends the session.
+
+A session is a run of activity without a gap longer than ``idle_gap``; its
+length is the continuous scrolling time. Sessions started and seconds
+scrolled over the last ``window`` are kept in a ring of ``buckets`` counters
+with running totals, so each event costs O(1) and each user a fixed amount
+of memory; only the least recently active ``max_users`` users are tracked.
+
+A notification is triggered when a session reaches ``scroll_threshold``
+seconds, or when a session starts and the user has started
+``session_threshold`` within the window, at most once per ``cooldown``
+seconds per user.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.config import (
+    INGEST_IDLE_GAP, INGEST_SCROLL_THRESHOLD, INGEST_SESSION_THRESHOLD, INGEST_WINDOW,
+    INGEST_WINDOW_BUCKETS, INGEST_TRIGGER_COOLDOWN, INGEST_MAX_USERS
+)
+from src.instrumentation.metrics import METRICS
+
+EVENT_KINDS = ('scroll', 'app_open', 'app_close')
+
+ScrollEvent = Tuple[int, float, str]  # user_id, timestamp, kind
+
+
+class _UserActivity:
+    """Aggregates of one user's recent activity"""
+    __slots__ = ('active', 'session_start', 'last_event', 'last_trigger', 'triggered',
+                 'bucket', 'sessions', 'scrolling', 'sessions_total', 'scrolling_total')
+
+    def __init__(self, buckets: int):
+        self.active = False
+        self.session_start = 0.0
+        self.last_event = float('-inf')
+        self.last_trigger = float('-inf')
+        self.triggered = False  # the current session already triggered
+        self.bucket = -1  # absolute index of the newest ring bucket
+        self.sessions = [0] * buckets
+        self.scrolling = [0.0] * buckets
+        self.sessions_total = 0
+        self.scrolling_total = 0.0
+
+
+class ScrollEventIngestor:
+    """Sliding-window activity aggregates per user with notification triggers"""
+
+    def __init__(self, idle_gap: float = None, scroll_threshold: float = None,
+                 session_threshold: int = None, window: float = None, buckets: int = None,
+                 cooldown: float = None, max_users: int = None):
+        self.idle_gap = INGEST_IDLE_GAP if idle_gap is None else idle_gap
+        self.scroll_threshold = (INGEST_SCROLL_THRESHOLD if scroll_threshold is None
+                                 else scroll_threshold)
+        self.session_threshold = (INGEST_SESSION_THRESHOLD if session_threshold is None
+                                  else session_threshold)
+        self.window = INGEST_WINDOW if window is None else window
+        self.buckets = buckets or INGEST_WINDOW_BUCKETS
+        self.bucket_width = self.window / self.buckets
+        self.cooldown = INGEST_TRIGGER_COOLDOWN if cooldown is None else cooldown
+        self.max_users = max_users or INGEST_MAX_USERS
+        self._users: "OrderedDict[int, _UserActivity]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def export_state(self) -> Dict:
+        """Aggregates of every tracked user, least recently active first"""
+        with self._lock:
+            return {
+                'bucket_width': self.bucket_width,
+                'users': [(user_id, tuple(getattr(state, slot)
+                                          for slot in _UserActivity.__slots__))
+                          for user_id, state in self._users.items()],
+            }
+
+    def import_state(self, state: Dict) -> None:
+        """Restore users from export_state"""
+        # Windows counted in differently sized buckets start afresh
+        same_ring = state['bucket_width'] == self.bucket_width
+        with self._lock:
+            for user_id, values in state['users']:
+                activity = _UserActivity(self.buckets)
+                for slot, value in zip(_UserActivity.__slots__, values):
+                    setattr(activity, slot, value)
+                if not same_ring or len(activity.sessions) != self.buckets:
+                    activity.bucket = -1
+                    activity.sessions = [0] * self.buckets
+                    activity.scrolling = [0.0] * self.buckets
+                    activity.sessions_total = 0
+                    activity.scrolling_total = 0.0
+                self._users[user_id] = activity
+                self._users.move_to_end(user_id)
+                if len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+
+    def ingest(self, user_id: int, timestamp: float, kind: str = 'scroll') -> Optional[Dict]:
+        """Record one event; returns the notification context if it triggered one"""
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind '{kind}', expected one of {EVENT_KINDS}")
+        with self._lock:
+            return self._ingest(user_id, timestamp, kind)
+
+    def ingest_many(self, events: Iterable[ScrollEvent]) -> List[Tuple[int, Dict]]:
+        """Record a batch of events in order; returns (user_id, context) for
+        every notification they triggered"""
+        triggers = []
+        count = 0
+        ingest = self._ingest
+        with self._lock:
+            for user_id, timestamp, kind in events:
+                if kind not in EVENT_KINDS:
+                    raise ValueError(f"Unknown event kind '{kind}', "
+                                     f"expected one of {EVENT_KINDS}")
+                count += 1
+                context = ingest(user_id, timestamp, kind)
+                if context is not None:
+                    triggers.append((user_id, context))
+        METRICS.increment("ingest.events", count)
+        if triggers:
+            METRICS.increment("ingest.triggers", len(triggers))
+        return triggers
+
+    def context(self, user_id: int, now: float = None) -> Optional[Dict]:
+        """Current activity context of a user (None if none was seen), e.g.
+        for a notification requested without one"""
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                return None
+            now = state.last_event if now is None else max(now, state.last_event)
+            self._advance(state, int(now // self.bucket_width))
+            return self._context(state, now, None)
+
+    def _ingest(self, user_id: int, timestamp: float, kind: str) -> Optional[Dict]:
+        users = self._users
+        state = users.get(user_id)
+        if state is None:
+            if len(users) >= self.max_users:
+                users.popitem(last=False)
+            state = users[user_id] = _UserActivity(self.buckets)
+        else:
+            users.move_to_end(user_id)
+
+        # Late events count as simultaneous with the newest one, which keeps
+        # every aggregate monotonic in time
+        if timestamp < state.last_event:
+            timestamp = state.last_event
+        bucket = int(timestamp // self.bucket_width)
+        if bucket != state.bucket:
+            self._advance(state, bucket)
+        index = bucket % self.buckets
+
+        gap = timestamp - state.last_event
+        reason = None
+        if state.active and gap <= self.idle_gap:
+            state.scrolling[index] += gap
+            state.scrolling_total += gap
+            if kind == 'app_close':
+                state.active = False
+            elif not state.triggered and timestamp - state.session_start >= self.scroll_threshold:
+                reason = 'continuous'
+        elif kind == 'app_close':
+            state.active = False
+        else:
+            state.active = True
+            state.session_start = timestamp
+            state.triggered = False
+            state.sessions[index] += 1
+            state.sessions_total += 1
+            if state.sessions_total >= self.session_threshold:
+                reason = 'sessions'
+        state.last_event = timestamp
+
+        if reason is None or timestamp - state.last_trigger < self.cooldown:
+            return None
+        state.last_trigger = timestamp
+        state.triggered = True
+        return self._context(state, timestamp, reason)
+
+    def _advance(self, state: _UserActivity, bucket: int) -> None:
+        """Move the ring forward to ``bucket``, dropping buckets that left the window"""
+        if bucket <= state.bucket:
+            return
+        if bucket - state.bucket >= self.buckets:
+            state.sessions = [0] * self.buckets
+            state.scrolling = [0.0] * self.buckets
+            state.sessions_total = 0
+            state.scrolling_total = 0.0
+        else:
+            sessions, scrolling = state.sessions, state.scrolling
+            for expired in range(state.bucket + 1, bucket + 1):
+                index = expired % self.buckets
+                state.sessions_total -= sessions[index]
+                state.scrolling_total -= scrolling[index]
+                sessions[index] = 0
+                scrolling[index] = 0.0
+        state.bucket = bucket
+
+    def _context(self, state: _UserActivity, now: float, reason: Optional[str]) -> Dict:
+        """Generation context: continuous scrolling time of the live session
+        plus the window aggregates"""
+        live = state.active and now - state.last_event <= self.idle_gap
+        moment = datetime.fromtimestamp(now)
+        context = {
+            'scrolling_time': int(state.last_event - state.session_start) if live else 0,
+            'hour': moment.hour,
+            'day_of_week': moment.weekday(),
+            'sessions_per_hour': round(state.sessions_total * 3600 / self.window, 1),
+            'scrolling_per_hour': int(max(0.0, state.scrolling_total) * 3600 / self.window),
+        }
+        if reason is not None:
+            context['trigger'] = reason
+        return context
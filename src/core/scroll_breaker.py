@@ -1,23 +1,78 @@
 import random
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from functools import partial
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from src.database.manager import DatabaseManager
+from src.config import (
+    DB_SHARDS, DB_DURABILITY, ENGAGEMENT_MODE, SELECTION_POLICY, NOTIFICATION_POOL_SIZE,
+    DEDUP_WINDOW, WARM_START, WARM_START_PATH, INGEST_MAX_NOTIFICATIONS
+)
+from src.core.ingestion import ScrollEvent, ScrollEventIngestor
+from src.core.selection import context_key, create_policy
+from src.core.warm_start import load_snapshot, save_snapshot
+from src.database.manager import SCHEMA_VERSION, DatabaseManager
+from src.database.sharding import ShardedDatabaseManager
+from src.instrumentation.metrics import instrumented
+from src.notifications.dedup import NearDuplicateIndex
 from src.notifications.generator import LLMNotificationGenerator
-from src.models.models import Task, GeneratedNotification, NotificationResponse
+from src.notifications.pool import NotificationPool
+from src.notifications.queue import GenerationQueue
+from src.models.models import GeneratedNotification, NotificationResponse, Task
 
+@instrumented("ai")
 class ScrollBreakerAI:
     """Main AI system with database integration and LLM support"""
     
-    def __init__(self, db_path: str = "scroll_breaker.db", llm_provider: str = None):
-        """Initialize the scroll breaker AI system"""
-        self.db = DatabaseManager(db_path)
-        self.llm_generator = LLMNotificationGenerator(llm_provider=llm_provider)
+    def __init__(self, db_path: str = "scroll_breaker.db", llm_provider: str = None,
+                 durability: str = None, shards: int = None, selection_policy: str = None,
+                 in_memory: bool = None, warm_start: bool = None, selection_seed: int = None):
+        """Initialize the scroll breaker AI system; ``selection_seed`` makes the
+        random choices of the selection policy and the templates reproducible"""
+        shards = DB_SHARDS if shards is None else shards
+        self.warm_start = WARM_START if warm_start is None else warm_start
+        self.snapshot_path = WARM_START_PATH or f"{db_path}.warm"
+        # A snapshot only restores into a store opened the same way
+        self._layout = {'shards': max(shards, 1), 'engagement': ENGAGEMENT_MODE,
+                        'durability': durability or DB_DURABILITY}
+        warm = (load_snapshot(self.snapshot_path, db_path, SCHEMA_VERSION, self._layout)
+                if self.warm_start else None) or {}
+        self.warm_started = bool(warm)
+
+        if shards > 1:
+            self.db = ShardedDatabaseManager(db_path, num_shards=shards, durability=durability,
+                                             in_memory=in_memory, warm_state=warm.get('db'))
+        else:
+            self.db = DatabaseManager(db_path, durability=durability, in_memory=in_memory,
+                                      warm_state=warm.get('db'))
+        self.selection_policy = create_policy(selection_policy or SELECTION_POLICY, self.db,
+                                              seed=selection_seed)
+        self.llm_generator = LLMNotificationGenerator(llm_provider=llm_provider,
+                                                      warm_state=warm.get('generator'),
+                                                      seed=selection_seed)
+        self.generation_queue = GenerationQueue(self.llm_generator)
+        self.dedup = NearDuplicateIndex() if DEDUP_WINDOW > 0 else None
+        self.notification_pool = (NotificationPool(self.generation_queue, dedup=self.dedup)
+                                  if NOTIFICATION_POOL_SIZE > 0 else None)
+        self.ingestor = ScrollEventIngestor()
+        for component, key in ((self.dedup, 'dedup'), (self.notification_pool, 'pool'),
+                               (self.ingestor, 'ingestor')):
+            if component is not None and warm.get(key) is not None:
+                component.import_state(warm[key])
         self.user_id = 1  # Default user for demo
     
-    def generate_smart_notification(self, context: Dict = None) -> Optional[GeneratedNotification]:
+    def generate_smart_notification(self, context: Dict = None,
+                                    user_id: int = None) -> Optional[GeneratedNotification]:
         """Generate a smart notification based on current context"""
         
+        if user_id is None:
+            user_id = self.user_id
+        
+        # Without an explicit context, use the user's ingested scroll activity
+        if context is None:
+            context = self.ingestor.context(user_id, time.time())
+        
         if context is None:
             context = {
                 'scrolling_time': random.randint(20, 120),
@@ -26,94 +81,96 @@ class ScrollBreakerAI:
             }
         
         # Get user's active tasks
-        tasks = self.db.get_user_tasks(self.user_id)
+        tasks = self.db.get_user_tasks(user_id)
         if not tasks:
             return None
         
         # Select best task based on context and scoring
-        selected_task = self._select_best_task(tasks, context)
+        selected_task, propensity = self.selection_policy.select(tasks, context)
         
         # Get task performance for LLM context
         task_performance = self.db.get_task_performance(selected_task.id)
         
-        # Generate notification using LLM
-        notification = self.llm_generator.generate_notification(
-            selected_task, context, task_performance
-        )
+        # Generate notification; LLM work goes through the rate-limited queue
+        notification = None
+        if self.llm_generator.uses_llm(selected_task):
+            if self.notification_pool is not None:
+                notification = self.notification_pool.take(selected_task, context,
+                                                           task_performance)
+            if notification is None:
+                notification = self.generation_queue.generate(selected_task, context,
+                                                              task_performance)
+        else:
+            notification = self.llm_generator.generate_notification(
+                selected_task, context, task_performance
+            )
+        
+        # Near-duplicates of what the task recently showed are replaced from the
+        # pool or the templates rather than by another LLM call
+        if self.dedup is not None:
+            notification = self.dedup.choose(selected_task.id, chain(
+                [notification],
+                self._pooled_alternatives(selected_task, context, task_performance),
+                self.llm_generator.template_alternatives(selected_task, context),
+            ))
+        
+        # Record the decision so responses update the right posterior and the
+        # history can be replayed offline
+        notification.context_key = context_key(context)
+        notification.context = context
+        notification.selection_propensity = propensity
         
         # Save to database
         self.db.save_notification(notification)
         
         return notification
-    def _select_best_task(self, tasks: List[Task], context: Dict) -> Task:
-        """Select the best task based on importance, context, engagement and performance"""
-        scored_tasks = []
-        
-        for task in tasks:
-            # Get engagement metrics
-            engagement = self.db.get_task_engagement(task.id)
-            
-            # Skip tasks in cooldown
-            if engagement['is_cooling_down']:
+    
+    def ingest_events(self, events: Iterable[ScrollEvent], max_notifications: int = None,
+                      deadline: float = None
+                      ) -> Tuple[List[GeneratedNotification], List[Tuple[int, Dict]]]:
+        """Feed (user_id, timestamp, kind) scroll/app-usage events and generate a
+        notification for users whose activity crossed a trigger threshold.
+
+        At most ``max_notifications`` (INGEST_MAX_NOTIFICATIONS) are generated,
+        and none once the ``deadline`` (time.monotonic()) has passed; the
+        remaining triggers are returned as (user_id, context) to be requested
+        separately, so a large batch stays bounded.
+        """
+        limit = INGEST_MAX_NOTIFICATIONS if max_notifications is None else max_notifications
+        notifications = []
+        deferred = []
+        for index, (user_id, context) in enumerate(self.ingestor.ingest_many(events)):
+            if index >= limit or (deadline is not None and time.monotonic() >= deadline):
+                deferred.append((user_id, context))
                 continue
-                
-            # Base score from importance and engagement
-            score = (task.importance / 10.0) * engagement['engagement_score']
-            
-            # Context adjustments
-            hour = context.get('hour', 12)
-            if task.category == 'health' and 6 <= hour <= 10:
-                score += 0.2
-            elif task.category == 'work' and 9 <= hour <= 17:
-                score += 0.15
-            elif task.category == 'personal' and 18 <= hour <= 21:
-                score += 0.1
-            elif task.category == 'learning' and (19 <= hour <= 22 or 14 <= hour <= 16):
-                score += 0.1
-            
-            # Get performance data
-            performance = self.db.get_task_performance(task.id)
-            if performance['total'] > 0:
-                success_rate = performance['positive'] / performance['total']
-                # Boost tasks that historically perform well
-                score += (success_rate - 0.5) * 0.2
-                
-                # Reduce score based on consecutive dismissals
-                score *= max(0.2, 1 - (engagement['consecutive_dismissals'] * 0.2))
-            
-            scored_tasks.append((task, score))
-        
-        if not scored_tasks:
-            # If all tasks are in cooldown, get the one with shortest remaining cooldown
-            return min(tasks, key=lambda t: self.db._get_cooldown_remaining(t.id))
-        
-        # Sort by score
-        scored_tasks.sort(key=lambda x: x[1], reverse=True)
-        
-        # Adaptive exploration rate - more exploration with poor engagement
-        avg_engagement = sum(self.db.get_task_engagement(t.id)['engagement_score'] 
-                           for t in tasks) / len(tasks)
-        explore_rate = 0.3 + (1 - avg_engagement) * 0.2  # 30-50% exploration based on engagement
-        
-        if random.random() < explore_rate:
-            # Weighted random selection from all tasks
-            tasks_only, scores = zip(*scored_tasks)
-            weights = [max(0.1, score) for score in scores]
-            return random.choices(tasks_only, weights=weights)[0]
-        else:
-            return scored_tasks[0][0]
-    def process_user_response(self, notification_id: str, user_action: str, 
+            notification = self.generate_smart_notification(context, user_id=user_id)
+            if notification is not None:
+                notifications.append(notification)
+        return notifications, deferred
+    
+    def _pooled_alternatives(self, task: Task, context: Dict,
+                             performance: Dict) -> Iterator[GeneratedNotification]:
+        """Pooled notifications for the task, taken one at a time as needed; the
+        first take of the request already scheduled the refills"""
+        if self.notification_pool is None or not self.llm_generator.uses_llm(task):
+            return iter(())
+        take = partial(self.notification_pool.take, task, context, performance, refill=False)
+        return islice(iter(take, None), self.notification_pool.size)
+    
+    def process_user_response(self, notification_id: int, user_action: str, 
                             response_time: float, context: Dict = None) -> Dict:
         """Process user response and update engagement metrics"""
         
         if context is None:
             context = {}
         
+        task_id = self.db.get_task_id_for_notification(notification_id)
+        
         # Create and save response
         response = NotificationResponse(
             id=None,
             notification_id=notification_id,
-            task_id=0,  # Will be set by database manager
+            task_id=task_id,
             user_action=user_action,
             response_time=response_time,
             was_expanded=context.get('was_expanded', False),
@@ -121,9 +178,8 @@ class ScrollBreakerAI:
             context=context
         )
         
-        # Save response and get task_id
+        # Save response
         response_id = self.db.save_response(response)
-        task_id = self.db.get_task_id_for_notification(notification_id)
         
         # Update engagement metrics
         self.db.update_task_engagement(task_id, user_action)
@@ -139,6 +195,26 @@ class ScrollBreakerAI:
             'message': f'Response recorded: {user_action}'
         }
     
-    def get_system_stats(self) -> Dict:
-        """Get comprehensive system statistics"""
-        return self.db.get_system_stats(self.user_id)
+    def close(self) -> None:
+        """Flush pending writes and release resources"""
+        self.generation_queue.close()
+        self.db.close()
+        if self.warm_start:
+            self._save_snapshot()
+
+    def _save_snapshot(self) -> None:
+        """Write the in-process state for the next start (WARM_START)"""
+        state = {
+            'db': self.db.export_state(),
+            'generator': self.llm_generator.export_state(),
+            'dedup': self.dedup.export_state() if self.dedup is not None else None,
+            'pool': (self.notification_pool.export_state()
+                     if self.notification_pool is not None else None),
+            'ingestor': self.ingestor.export_state(),
+        }
+        db_paths = getattr(self.db, 'db_paths', None) or [self.db.db_path]
+        save_snapshot(self.snapshot_path, db_paths, SCHEMA_VERSION, self._layout, state)
+    
+    def get_system_stats(self, user_id: int = None, window: str = None) -> Dict:
+        """Get comprehensive system statistics, optionally for a recent window"""
+        return self.db.get_system_stats(self.user_id if user_id is None else user_id, window)
@@ -0,0 +1,128 @@
+"""Warm-start snapshots (WARM_START)
+
+On close, ScrollBreakerAI writes the in-process state a restart would
+otherwise rebuild or lose to a snapshot file next to the database: the
+engagement projection, shard routes, the generator's prompt cache and
+provider health, pooled notifications, near-duplicate windows and scroll
+activity. The next process restores that state instead of initializing
+the schema, replaying the engagement log and probing the LLM before
+serving.
+
+A snapshot is only trusted for the exact database and layout it was taken
+against. The header records the schema version, the layout (shard count,
+engagement mode, durability) and, for every database file, its size,
+modification time and SQLite file change counter. It is validated before
+the payload is read. Any write after the snapshot, a leftover write-ahead
+log, a different schema version or layout, or a bad checksum sends the
+process down the cold path. A snapshot is used at
+most once: it is deleted when read. The payload is a pickle, so the file
+must be as trusted as the database.
+"""
+import json
+import logging
+import os
+import pickle
+import struct
+import zlib
+from typing import Dict, List, Optional
+
+from src.instrumentation.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SBWARM\x00\x00'
+FORMAT_VERSION = 1
+# magic, format version, schema version, key length, payload length, payload
+# crc32; the key (JSON) names the layout and the database files
+HEADER = struct.Struct('<8sIIIQI')
+
+# Offset and size of the file change counter in the SQLite header
+CHANGE_COUNTER = struct.Struct('>I')
+CHANGE_COUNTER_OFFSET = 24
+
+
+def database_key(paths: List[str]) -> Optional[List[list]]:
+    """Identity of the current contents of the database files, or None while
+    a write-ahead log holds changes not yet in the files"""
+    key = []
+    for path in paths:
+        wal = path + '-wal'
+        if os.path.exists(wal) and os.path.getsize(wal) > 0:
+            return None
+        with open(path, 'rb') as f:
+            f.seek(CHANGE_COUNTER_OFFSET)
+            counter = f.read(CHANGE_COUNTER.size)
+            stat = os.fstat(f.fileno())
+        key.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+                    CHANGE_COUNTER.unpack(counter)[0] if len(counter) == CHANGE_COUNTER.size
+                    else 0])
+    return key
+
+
+def save_snapshot(path: str, db_paths: List[str], schema_version: int, layout: Dict,
+                  state: Dict) -> bool:
+    """Write ``state`` for the closed database files; returns whether it was written"""
+    try:
+        files = database_key(db_paths)
+        if files is None:
+            logger.warning("Not writing warm-start snapshot: write-ahead log not checkpointed")
+            return False
+        with METRICS.span("warm_start.save"):
+            key_bytes = json.dumps({'layout': layout, 'files': files}).encode()
+            payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+            header = HEADER.pack(MAGIC, FORMAT_VERSION, schema_version, len(key_bytes),
+                                 len(payload), zlib.crc32(payload))
+            temporary = path + '.tmp'
+            with open(temporary, 'wb') as f:
+                f.write(header)
+                f.write(key_bytes)
+                f.write(payload)
+            os.replace(temporary, path)
+    except OSError as e:
+        logger.warning("Could not write warm-start snapshot %s: %s", path, e)
+        return False
+    logger.info("Wrote warm-start snapshot %s (%d bytes)", path,
+                HEADER.size + len(key_bytes) + len(payload))
+    return True
+
+
+def load_snapshot(path: str, db_path: str, schema_version: int,
+                  layout: Dict) -> Optional[Dict]:
+    """State saved for ``db_path`` if the snapshot still matches its files
+    and ``layout``, otherwise None; the snapshot file is removed either way"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with METRICS.span("warm_start.load"):
+            state = _read(path, db_path, schema_version, layout)
+    except Exception as e:
+        state = None
+        logger.warning("Ignoring warm-start snapshot %s: %s", path, e)
+    finally:
+        os.remove(path)
+    METRICS.increment("warm_start.loaded" if state is not None else "warm_start.rejected")
+    return state
+
+
+def _read(path: str, db_path: str, schema_version: int, layout: Dict) -> Dict:
+    with open(path, 'rb') as f:
+        magic, version, snapshot_schema, key_length, payload_length, crc = \
+            HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("not a snapshot of this format")
+        if snapshot_schema != schema_version:
+            raise ValueError(f"schema version {snapshot_schema}, expected {schema_version}")
+        if os.fstat(f.fileno()).st_size != HEADER.size + key_length + payload_length:
+            raise ValueError("truncated")
+        key = json.loads(f.read(key_length))
+        if key.get('layout') != layout:
+            raise ValueError(f"layout {key.get('layout')}, expected {layout}")
+        files = key.get('files')
+        if not files or files[0][0] != os.path.abspath(db_path):
+            raise ValueError(f"taken for another database ({files[0][0] if files else None})")
+        if files != database_key([entry[0] for entry in files]):
+            raise ValueError("database changed since the snapshot")
+        payload = f.read(payload_length)
+    if zlib.crc32(payload) != crc:
+        raise ValueError("checksum mismatch")
+    return pickle.loads(payload)
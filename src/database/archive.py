@@ -0,0 +1,326 @@
+"""Time-partitioned archival of notification history
+
+Rows of generated_notifications and notification_responses older than the
+archive horizon are moved into one SQLite file per database and month
+(``<archive_dir>/<database stem>.history_YYYY_MM.db``, so the shards of a
+sharded store archive separately) and registered in the hot database's
+archive_segments table. Rollups and task counters live in the hot database
+and are not touched, so dashboard stats and task performance stay correct.
+Historical queries go through ``NotificationArchive.history``, which attaches
+the segments covering the requested range behind ``history_*`` views.
+"""
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.config import ARCHIVE_DIR, ARCHIVE_HORIZON_DAYS
+from src.database.manager import (
+    ATTACH_BATCH_SIZE, TEXT_ID_TABLES, copy_with_integer_ids, record_legacy_ids,
+    rename_text_id_table
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_TABLES = ('generated_notifications', 'notification_responses')
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _month_bounds(month: str) -> Tuple[str, str]:
+    """Return the [start, end) timestamps of a 'YYYY-MM' month"""
+    year, month_number = (int(part) for part in month.split('-'))
+    start = datetime(year, month_number, 1)
+    end = datetime(year + month_number // 12, month_number % 12 + 1, 1)
+    return start.strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT)
+
+
+def _columns(cursor: sqlite3.Cursor, schema: str, table: str) -> List[str]:
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+class NotificationArchive:
+    """Moves old notification history into monthly archive files and reads it back"""
+
+    def __init__(self, db_path: str = "scroll_breaker.db", archive_dir: str = None,
+                 horizon_days: int = None):
+        self.db_path = db_path
+        self.archive_dir = archive_dir or ARCHIVE_DIR
+        self.horizon_days = ARCHIVE_HORIZON_DAYS if horizon_days is None else horizon_days
+
+    def segment_path(self, month: str, archive_dir: str = None) -> str:
+        """Path of this database's archive file for a 'YYYY-MM' month"""
+        stem, _ = os.path.splitext(os.path.basename(self.db_path))
+        return os.path.join(archive_dir or self.archive_dir,
+                            f"{stem}.history_{month.replace('-', '_')}.db")
+
+    @staticmethod
+    def _registered_path(cursor: sqlite3.Cursor, month: str) -> Optional[str]:
+        """Segment already holding a month; it keeps receiving that month's rows"""
+        cursor.execute("SELECT path FROM archive_segments WHERE month = ?", (month,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def segments(self, since: datetime = None, until: datetime = None) -> List[Tuple[str, str]]:
+        """Registered (month, path) segments overlapping [since, until)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT month, path FROM archive_segments ORDER BY month")
+        rows = cursor.fetchall()
+        conn.close()
+
+        lower = since.strftime('%Y-%m') if since else None
+        upper = until.strftime('%Y-%m') if until else None
+        return [
+            (month, path) for month, path in rows
+            if (lower is None or month >= lower) and (upper is None or month <= upper)
+        ]
+
+    def archive(self, now: datetime = None, vacuum: bool = False) -> Dict[str, int]:
+        """Move rows older than the horizon into monthly segments.
+
+        Returns the number of rows moved per table. ``now`` is UTC and
+        defaults to the current time.
+        """
+        now = now or datetime.now(timezone.utc)
+        cutoff = (now - timedelta(days=self.horizon_days)).strftime(TIMESTAMP_FORMAT)
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        months = set()
+        for table in ARCHIVED_TABLES:
+            cursor.execute(f'''
+                SELECT DISTINCT strftime('%Y-%m', timestamp) FROM {table}
+                WHERE timestamp < ?
+            ''', (cutoff,))
+            months.update(row[0] for row in cursor.fetchall() if row[0])
+
+        moved = {table: 0 for table in ARCHIVED_TABLES}
+        for month in sorted(months):
+            counts = self._archive_month(conn, month, cutoff)
+            for table, count in counts.items():
+                moved[table] += count
+            logger.info("Archived %s: %s", month, counts)
+
+        if vacuum and any(moved.values()):
+            conn.execute("VACUUM")
+        conn.close()
+        return moved
+
+    def _archive_month(self, conn: sqlite3.Connection, month: str, cutoff: str) -> Dict[str, int]:
+        """Move one month's rows (up to the cutoff) into its segment"""
+        start, end = _month_bounds(month)
+        end = min(end, cutoff)
+        cursor = conn.cursor()
+        path = self._registered_path(cursor, month) or self.segment_path(month)
+
+        cursor.execute("ATTACH DATABASE ? AS segment", (path,))
+        try:
+            counts = {}
+            for table in ARCHIVED_TABLES:
+                columns = self._prepare_segment_table(cursor, table)
+                column_list = ", ".join(columns)
+                cursor.execute(f'''
+                    INSERT INTO segment.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table}
+                    WHERE timestamp >= ? AND timestamp < ?
+                ''', (start, end))
+                cursor.execute(f'''
+                    DELETE FROM main.{table}
+                    WHERE timestamp >= ? AND timestamp < ?
+                ''', (start, end))
+                counts[table] = cursor.rowcount
+
+            cursor.execute('''
+                INSERT INTO archive_segments (month, path, notifications, responses)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (month) DO UPDATE SET
+                    path = excluded.path,
+                    notifications = notifications + excluded.notifications,
+                    responses = responses + excluded.responses,
+                    archived_at = CURRENT_TIMESTAMP
+            ''', (month, path, counts['generated_notifications'],
+                  counts['notification_responses']))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("DETACH DATABASE segment")
+        return counts
+
+    def _prepare_segment_table(self, cursor: sqlite3.Cursor, table: str) -> List[str]:
+        """Create or widen the segment copy of a table; returns the hot table's columns"""
+        columns = _columns(cursor, 'main', table)
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS segment.{table} AS "
+                       f"SELECT * FROM main.{table} WHERE 0")
+        existing = set(_columns(cursor, 'segment', table))
+        for column in columns:
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE segment.{table} ADD COLUMN {column}")
+
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS segment.idx_{table}_timestamp "
+                       f"ON {table} (timestamp)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS segment.idx_{table}_notification "
+                       f"ON {table} (notification_id)")
+        return columns
+
+    def move_tasks(self, target_db_path: str, task_ids: Iterable[int]) -> Dict[str, int]:
+        """Move the archived rows of tasks to another database's segments, e.g.
+        when a shard is split; returns the number of rows moved per table.
+        Target segments are created next to the source segments."""
+        target = NotificationArchive(target_db_path, self.archive_dir, self.horizon_days)
+        task_ids = [(task_id,) for task_id in task_ids]
+        moved = {table: 0 for table in ARCHIVED_TABLES}
+        if not task_ids:
+            return moved
+
+        hot = sqlite3.connect(self.db_path)
+        target_hot = sqlite3.connect(target_db_path)
+        try:
+            for month, path in self.segments():
+                if not os.path.exists(path):
+                    logger.warning("Archive segment for %s is missing: %s", month, path)
+                    continue
+                target_path = (target._registered_path(target_hot.cursor(), month)
+                               or target.segment_path(month, os.path.dirname(path)))
+                counts = self._move_segment_rows(path, target_path, task_ids)
+                if not any(counts.values()):
+                    continue
+                hot.execute('''
+                    UPDATE archive_segments
+                    SET notifications = notifications - ?, responses = responses - ?
+                    WHERE month = ?
+                ''', (counts['generated_notifications'], counts['notification_responses'],
+                      month))
+                target_hot.execute('''
+                    INSERT INTO archive_segments (month, path, notifications, responses)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (month) DO UPDATE SET
+                        notifications = notifications + excluded.notifications,
+                        responses = responses + excluded.responses
+                ''', (month, target_path, counts['generated_notifications'],
+                      counts['notification_responses']))
+                hot.commit()
+                target_hot.commit()
+                for table, count in counts.items():
+                    moved[table] += count
+        finally:
+            hot.close()
+            target_hot.close()
+        return moved
+
+    def _move_segment_rows(self, source_path: str, target_path: str,
+                           task_ids: List[tuple]) -> Dict[str, int]:
+        """Move the rows of tasks from one segment file to another"""
+        conn = sqlite3.connect(source_path)
+        cursor = conn.cursor()
+        cursor.execute("ATTACH DATABASE ? AS segment", (target_path,))
+        try:
+            cursor.execute("CREATE TEMP TABLE moving_tasks (task_id INTEGER PRIMARY KEY)")
+            cursor.executemany("INSERT INTO moving_tasks VALUES (?)", task_ids)
+            counts = {}
+            for table in ARCHIVED_TABLES:
+                if not _columns(cursor, 'main', table):
+                    counts[table] = 0
+                    continue
+                # The source segment plays the hot database's part here
+                column_list = ", ".join(self._prepare_segment_table(cursor, table))
+                cursor.execute(f'''
+                    INSERT INTO segment.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table}
+                    WHERE task_id IN (SELECT task_id FROM moving_tasks)
+                ''')
+                cursor.execute(f'''
+                    DELETE FROM main.{table}
+                    WHERE task_id IN (SELECT task_id FROM moving_tasks)
+                ''')
+                counts[table] = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return counts
+
+    def migrate_notification_ids(self) -> None:
+        """Convert segments archived with text notification IDs to integer IDs"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT month, path FROM archive_segments ORDER BY month")
+        for month, path in cursor.fetchall():
+            if not os.path.exists(path):
+                logger.warning("Archive segment for %s is missing: %s", month, path)
+                continue
+            cursor.execute("ATTACH DATABASE ? AS segment", (path,))
+            try:
+                cursor.execute("PRAGMA segment.table_info(generated_notifications)")
+                types = {row[1]: row[2] for row in cursor.fetchall()}
+                if types.get('notification_id', '').upper() != 'TEXT':
+                    continue
+                cursor.execute("BEGIN IMMEDIATE")
+                mapping = {}
+                for table in TEXT_ID_TABLES:
+                    rename_text_id_table(cursor, 'segment', table)
+                    self._prepare_segment_table(cursor, table)
+                    copy_with_integer_ids(cursor, 'segment', table, mapping)
+                    cursor.execute(f"DROP TABLE segment.legacy_{table}")
+                record_legacy_ids(cursor, mapping)
+                conn.commit()
+                logger.info("Converted archive segment %s to integer notification IDs", month)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute("DETACH DATABASE segment")
+        conn.close()
+
+    @contextmanager
+    def history(self, since: datetime = None, until: datetime = None):
+        """Connection exposing hot and archived rows as ``history_<table>`` views.
+
+        Only segments overlapping [since, until) are attached. SQLite limits
+        attached databases, so ranges spanning more than ATTACH_BATCH_SIZE
+        months must be queried in pieces.
+        """
+        segments = self.segments(since, until)
+        if len(segments) > ATTACH_BATCH_SIZE:
+            raise ValueError(f"Range spans {len(segments)} archive segments; "
+                             f"query at most {ATTACH_BATCH_SIZE} months at a time")
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            schemas = []
+            for index, (month, path) in enumerate(segments):
+                if not os.path.exists(path):
+                    logger.warning("Archive segment for %s is missing: %s", month, path)
+                    continue
+                schema = f"segment_{index}"
+                cursor.execute("ATTACH DATABASE ? AS " + schema, (path,))
+                schemas.append(schema)
+
+            for table in ARCHIVED_TABLES:
+                columns = _columns(cursor, 'main', table)
+                selects = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+                for schema in schemas:
+                    present = set(_columns(cursor, schema, table))
+                    if not present:
+                        continue
+                    projected = ", ".join(
+                        column if column in present else f"NULL AS {column}"
+                        for column in columns
+                    )
+                    selects.append(f"SELECT {projected} FROM {schema}.{table}")
+                cursor.execute(f"CREATE TEMP VIEW history_{table} AS "
+                               + " UNION ALL ".join(selects))
+            yield conn
+        finally:
+            conn.close()
+
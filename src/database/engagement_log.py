@@ -0,0 +1,227 @@
+"""Event-sourced task engagement (ENGAGEMENT_MODE=events)
+
+Every response appends one row to engagement_events; nothing is read back
+on the write path. Engagement score, consecutive dismissals and cooldowns
+are materialized in memory by replaying events through ``apply_response``,
+so the log is the source of truth and reads never touch the database.
+
+Every ``snapshot_interval`` events, the state of the tasks that changed is
+written to task_engagement together with the last event applied to each
+(``event_seq``), and the log position is recorded in engagement_snapshots.
+Startup loads task_engagement and replays the log tail after the latest
+snapshot; events at or below a task's ``event_seq`` are skipped, so tables
+copied between shards or left behind by the table mode are never applied
+twice. Sequence numbers are assigned in-process: one process writes a
+database's log, as with the outbox.
+"""
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set
+
+from src.config import ENGAGEMENT_SNAPSHOT_INTERVAL
+from src.instrumentation.metrics import METRICS
+from src.models.engagement import EngagementState, apply_response
+
+logger = logging.getLogger(__name__)
+
+# Events read per fetch when replaying the log
+REPLAY_BATCH_SIZE = 10_000
+
+
+class EngagementLog:
+    """Append-only engagement event log with its in-memory projection"""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 submit: Optional[Callable[[str, tuple], None]] = None,
+                 snapshot_interval: int = None, state: Dict = None):
+        """
+        Args:
+            connect: Opens a connection to the database holding the log
+            submit: Queues a write for the outbox instead of committing it here
+            snapshot_interval: Events between snapshots
+            state: Projection from export_state, restored instead of rebuilding
+        """
+        self._connect = connect
+        self._submit = submit
+        self.snapshot_interval = snapshot_interval or ENGAGEMENT_SNAPSHOT_INTERVAL
+        self._lock = threading.Lock()
+        self._states: Dict[int, EngagementState] = {}
+        self._task_seqs: Dict[int, int] = {}  # task_id -> last event applied
+        self._dirty: Set[int] = set()
+        self._last_seq = 0
+        self._snapshot_seq = 0
+        if state is not None:
+            self._states = state['states']
+            self._task_seqs = state['task_seqs']
+            self._dirty = state['dirty']
+            self._last_seq = state['last_seq']
+            self._snapshot_seq = state['snapshot_seq']
+        else:
+            self.rebuild()
+
+    def rebuild(self, from_snapshot: bool = True) -> int:
+        """Rebuild the projection from the latest snapshot (or the whole log)
+        plus the log tail; returns the number of events replayed"""
+        states: Dict[int, EngagementState] = {}
+        task_seqs: Dict[int, int] = {}
+        start = 0
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        if from_snapshot:
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM engagement_snapshots")
+            start = cursor.fetchone()[0]
+            cursor.execute('''
+                SELECT task_id, consecutive_dismissals, engagement_score, last_success,
+                       cooldown_until, COALESCE(event_seq, 0)
+                FROM task_engagement
+                ORDER BY id
+            ''')
+            for task_id, dismissals, score, last_success, cooldown_until, seq in cursor:
+                states[task_id] = EngagementState(
+                    consecutive_dismissals=dismissals or 0,
+                    engagement_score=1.0 if score is None else score,
+                    last_success=_parse(last_success),
+                    cooldown_until=_parse(cooldown_until),
+                )
+                task_seqs[task_id] = seq
+
+        cursor.execute('''
+            SELECT seq, task_id, user_action, occurred_at
+            FROM engagement_events
+            WHERE seq > ?
+            ORDER BY seq
+        ''', (start,))
+        replayed = 0
+        replayed_tasks: Set[int] = set()
+        while True:
+            rows = cursor.fetchmany(REPLAY_BATCH_SIZE)
+            if not rows:
+                break
+            for seq, task_id, user_action, occurred_at in rows:
+                if seq <= task_seqs.get(task_id, 0):
+                    continue
+                states[task_id] = apply_response(states.get(task_id) or EngagementState(),
+                                                 user_action, datetime.fromisoformat(occurred_at))
+                task_seqs[task_id] = seq
+                replayed_tasks.add(task_id)
+                replayed += 1
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM engagement_events")
+        # Never reuse a sequence number a snapshot already covers, even if the
+        # event itself was lost
+        last_seq = max(cursor.fetchone()[0], start, max(task_seqs.values(), default=0))
+        conn.close()
+
+        with self._lock:
+            self._states = states
+            self._task_seqs = task_seqs
+            # Replayed state is not in task_engagement yet; the next snapshot writes it
+            self._dirty = replayed_tasks
+            self._last_seq = last_seq
+            self._snapshot_seq = start
+        logger.info("Engagement projection rebuilt: %d tasks, %d events replayed",
+                    len(states), replayed)
+        return replayed
+
+    def get(self, task_id: int) -> Optional[EngagementState]:
+        """Current engagement of a task, None if it has no history"""
+        return self._states.get(task_id)
+
+    def states(self) -> Dict[int, EngagementState]:
+        """Engagement of every task with history"""
+        with self._lock:
+            return dict(self._states)
+
+    def export_state(self) -> Dict:
+        """The projection and log positions, for a warm start"""
+        with self._lock:
+            return {'states': dict(self._states), 'task_seqs': dict(self._task_seqs),
+                    'dirty': set(self._dirty), 'last_seq': self._last_seq,
+                    'snapshot_seq': self._snapshot_seq}
+
+    def append(self, task_id: int, user_action: str, now: datetime) -> EngagementState:
+        """Record a response and return the task's new engagement"""
+        with self._lock:
+            self._last_seq += 1
+            seq = self._last_seq
+            state = apply_response(self._states.get(task_id) or EngagementState(),
+                                   user_action, now)
+            self._states[task_id] = state
+            self._task_seqs[task_id] = seq
+            self._dirty.add(task_id)
+            snapshot_due = seq - self._snapshot_seq >= self.snapshot_interval
+
+        event = (seq, task_id, user_action, now.isoformat(sep=' '))
+        if self._submit is not None:
+            self._submit('engagement_event', event)
+        else:
+            conn = self._connect()
+            write_event(conn.cursor(), event)
+            conn.commit()
+            conn.close()
+        METRICS.increment("engagement.events")
+
+        if snapshot_due:
+            self.snapshot()
+        return state
+
+    def snapshot(self) -> None:
+        """Write the state of tasks changed since the last snapshot to task_engagement"""
+        with self._lock:
+            if self._last_seq == self._snapshot_seq and not self._dirty:
+                return
+            seq = self._last_seq
+            rows = [(task_id, self._states[task_id], self._task_seqs[task_id])
+                    for task_id in self._dirty]
+            self._dirty = set()
+            self._snapshot_seq = seq
+
+        snapshot = (seq, rows)
+        if self._submit is not None:
+            self._submit('engagement_snapshot', snapshot)
+        else:
+            with METRICS.span("engagement.snapshot"):
+                conn = self._connect()
+                write_snapshot(conn.cursor(), snapshot)
+                conn.commit()
+                conn.close()
+
+
+def write_event(cursor: sqlite3.Cursor, event: tuple) -> None:
+    cursor.execute('''
+        INSERT INTO engagement_events (seq, task_id, user_action, occurred_at)
+        VALUES (?, ?, ?, ?)
+    ''', event)
+
+
+def write_snapshot(cursor: sqlite3.Cursor, snapshot: tuple) -> None:
+    """Upsert the snapshotted task states and record the log position they cover"""
+    seq, rows = snapshot
+    for task_id, state, task_seq in rows:
+        values = (state.consecutive_dismissals, state.engagement_score, state.last_success,
+                  state.cooldown_until, task_seq, task_id)
+        cursor.execute('''
+            UPDATE task_engagement
+            SET last_interaction = CURRENT_TIMESTAMP,
+                consecutive_dismissals = ?,
+                engagement_score = ?,
+                last_success = ?,
+                cooldown_until = ?,
+                event_seq = ?
+            WHERE task_id = ?
+        ''', values)
+        if cursor.rowcount == 0:
+            cursor.execute('''
+                INSERT INTO task_engagement
+                (consecutive_dismissals, engagement_score, last_success, cooldown_until,
+                 event_seq, task_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', values)
+    cursor.execute("INSERT OR REPLACE INTO engagement_snapshots (seq, tasks) VALUES (?, ?)",
+                   (seq, len(rows)))
+
+
+def _parse(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
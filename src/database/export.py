@@ -0,0 +1,241 @@
+"""Columnar analytics export of notification and response history
+
+Streams generated_notifications, notification_responses (hot and archived)
+and task_engagement into Parquet or Arrow IPC files in fixed-size batches,
+so memory use is bounded by the batch size. The JSON ``context`` of
+responses is flattened into typed columns by SQLite's JSON functions.
+Incremental runs only export rows past the watermarks recorded by the
+previous run.
+
+Requires the optional ``pyarrow`` dependency (``pip install -e .[analytics]``).
+"""
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('parquet', 'arrow')
+WATERMARK_FILE = '_watermarks.json'
+
+# Context keys promoted to their own typed columns; the rest go to context_extra
+CONTEXT_COLUMNS = (
+    ('scrolling_time', 'INTEGER', 'int64'),
+    ('hour', 'INTEGER', 'int64'),
+    ('day_of_week', 'INTEGER', 'int64'),
+    ('was_expanded', 'INTEGER', 'bool'),
+)
+
+
+def _table_specs(include_llm_text: bool) -> Dict[str, Dict]:
+    """Column expressions, arrow types and watermark column for each exported table"""
+    notification_columns = [
+        ('id', 'id', 'int64'),
+        ('notification_id', 'notification_id', 'int64'),
+        ('task_id', 'task_id', 'int64'),
+        ('hook_message', 'hook_message', 'string'),
+        ('expanded_content', 'expanded_content', 'string'),
+        ('next_step', 'next_step', 'string'),
+        ('confidence_score', 'confidence_score', 'float64'),
+        ('generation_strategy', 'generation_strategy', 'string'),
+        ('timestamp', 'timestamp', 'timestamp'),
+    ]
+    if include_llm_text:
+        notification_columns += [
+            ('llm_prompt_used', 'llm_prompt_used', 'string'),
+            ('llm_response_raw', 'llm_response_raw', 'string'),
+        ]
+
+    response_columns = [
+        ('id', 'id', 'int64'),
+        ('notification_id', 'notification_id', 'int64'),
+        ('task_id', 'task_id', 'int64'),
+        ('user_action', 'user_action', 'string'),
+        ('response_time', 'response_time', 'float64'),
+        ('was_expanded', 'was_expanded', 'bool'),
+        ('timestamp', 'timestamp', 'timestamp'),
+    ]
+    for key, sql_type, arrow_type in CONTEXT_COLUMNS:
+        response_columns.append(
+            (f'context_{key}', f"CAST(json_extract(context, '$.{key}') AS {sql_type})", arrow_type)
+        )
+    promoted = ", ".join(f"'$.{key}'" for key, _, _ in CONTEXT_COLUMNS)
+    response_columns.append(
+        ('context_extra', f"NULLIF(json_remove(context, {promoted}), '{{}}')", 'string')
+    )
+
+    return {
+        'generated_notifications': {
+            'columns': notification_columns,
+            'watermark': 'id',
+            'archived': True,
+        },
+        'notification_responses': {
+            'columns': response_columns,
+            'watermark': 'id',
+            'archived': True,
+        },
+        # Rows are updated in place; incremental runs export rows changed since the last run
+        'task_engagement': {
+            'columns': [
+                ('id', 'id', 'int64'),
+                ('task_id', 'task_id', 'int64'),
+                ('last_interaction', 'last_interaction', 'timestamp'),
+                ('consecutive_dismissals', 'consecutive_dismissals', 'int64'),
+                ('last_success', 'last_success', 'timestamp'),
+                ('engagement_score', 'engagement_score', 'float64'),
+                ('cooldown_until', 'cooldown_until', 'timestamp'),
+            ],
+            'watermark': 'last_interaction',
+            'archived': False,
+        },
+    }
+
+
+def _arrow_type(name: str):
+    if name == 'timestamp':
+        return pa.timestamp('us')
+    return {'int64': pa.int64(), 'float64': pa.float64(), 'bool': pa.bool_(),
+            'string': pa.string()}[name]
+
+
+class HistoryExporter:
+    """Exports history tables to columnar files in bounded-memory batches"""
+
+    def __init__(self, db_path: str = "scroll_breaker.db", output_dir: str = "export",
+                 batch_size: int = 50_000, file_format: str = 'parquet',
+                 include_archives: bool = True, include_llm_text: bool = False):
+        if pa is None:
+            raise ImportError("Columnar export requires pyarrow: pip install -e .[analytics]")
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{file_format}', "
+                             f"expected one of {EXPORT_FORMATS}")
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.file_format = file_format
+        self.include_archives = include_archives
+        self.specs = _table_specs(include_llm_text)
+
+    @property
+    def watermark_path(self) -> str:
+        return os.path.join(self.output_dir, WATERMARK_FILE)
+
+    def load_watermarks(self) -> Dict:
+        if not os.path.exists(self.watermark_path):
+            return {}
+        with open(self.watermark_path) as f:
+            return json.load(f)
+
+    def _save_watermarks(self, watermarks: Dict) -> None:
+        temp_path = self.watermark_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(watermarks, f, indent=2)
+        os.replace(temp_path, self.watermark_path)
+
+    def _sources(self, table: str) -> List[str]:
+        """Database files holding rows of a table: hot database first, then archives"""
+        sources = [self.db_path]
+        if self.include_archives and self.specs[table]['archived']:
+            conn = sqlite3.connect(self.db_path)
+            rows = conn.execute("SELECT path FROM archive_segments ORDER BY month").fetchall()
+            conn.close()
+            sources += [path for (path,) in rows if os.path.exists(path)]
+        return sources
+
+    def export(self, tables: List[str] = None, incremental: bool = False) -> Dict[str, int]:
+        """Export tables and return the number of rows written per table"""
+        tables = tables or list(self.specs)
+        watermarks = self.load_watermarks() if incremental else {}
+        run_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+        written = {}
+
+        for table in tables:
+            if table not in self.specs:
+                raise ValueError(f"Unknown export table '{table}'")
+            count, watermark = self._export_table(table, watermarks.get(table), run_id)
+            written[table] = count
+            if watermark is not None:
+                watermarks[table] = watermark
+            logger.info("Exported %d rows from %s", count, table)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._save_watermarks(watermarks)
+        return written
+
+    def _export_table(self, table: str, since, run_id: str) -> Tuple[int, Optional[object]]:
+        """Stream one table into a single output file; returns (rows, new watermark)"""
+        spec = self.specs[table]
+        names = [name for name, _, _ in spec['columns']]
+        schema = pa.schema([(name, _arrow_type(kind)) for name, _, kind in spec['columns']])
+        watermark_column = spec['watermark']
+        watermark_index = names.index(watermark_column)
+
+        select = ", ".join(f"{expr} AS {name}" for name, expr, _ in spec['columns'])
+        query = f"SELECT {select} FROM {table}"
+        params: tuple = ()
+        if since is not None:
+            query += f" WHERE {watermark_column} > ?"
+            params = (since,)
+        query += f" ORDER BY {watermark_column}"
+
+        table_dir = os.path.join(self.output_dir, table)
+        extension = 'parquet' if self.file_format == 'parquet' else 'arrow'
+        path = os.path.join(table_dir, f"part-{run_id}.{extension}")
+
+        writer = None
+        rows_written = 0
+        new_watermark = since
+        try:
+            for source in self._sources(table):
+                conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+                try:
+                    cursor = conn.execute(query, params)
+                    while True:
+                        rows = cursor.fetchmany(self.batch_size)
+                        if not rows:
+                            break
+                        if writer is None:
+                            os.makedirs(table_dir, exist_ok=True)
+                            writer = self._open_writer(path, schema)
+                        writer.write_batch(self._to_batch(rows, schema))
+                        rows_written += len(rows)
+                        last = rows[-1][watermark_index]
+                        if last is not None and (new_watermark is None or last > new_watermark):
+                            new_watermark = last
+                finally:
+                    conn.close()
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return rows_written, new_watermark
+
+    def _open_writer(self, path: str, schema):
+        if self.file_format == 'parquet':
+            return pq.ParquetWriter(path, schema, compression='zstd')
+        return pa_ipc.new_file(path, schema)
+
+    def _to_batch(self, rows: List[tuple], schema):
+        """Build a record batch from row tuples, column by column"""
+        arrays = []
+        for index, field in enumerate(schema):
+            values = [row[index] for row in rows]
+            if pa.types.is_timestamp(field.type):
+                arrays.append(pa.array(values, pa.string()).cast(field.type))
+            elif pa.types.is_boolean(field.type):
+                arrays.append(pa.array([None if v is None else bool(v) for v in values],
+                                       field.type))
+            else:
+                arrays.append(pa.array(values, field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
@@ -0,0 +1,134 @@
+"""Database maintenance commands
+
+Run with:
+    python -m src.database.maintenance --db scroll_breaker.db backfill-rollups
+    python -m src.database.maintenance --db scroll_breaker.db archive --vacuum
+    python -m src.database.maintenance --db scroll_breaker.db export --incremental
+    python -m src.database.maintenance --db scroll_breaker.db split-shard --shard 0
+"""
+import argparse
+import logging
+import os
+import sqlite3
+from typing import List
+
+from src.database.archive import NotificationArchive
+from src.database.manager import DatabaseManager
+from src.database.memory import check_no_memory_owner
+
+
+def _open(db_path: str) -> DatabaseManager:
+    """Open a database for maintenance: bring the schema up to date, but seed
+    no demo data and write synchronously, whatever the serving configuration.
+    Refuses a database a running process has open in memory."""
+    check_no_memory_owner(db_path)
+    return DatabaseManager(db_path, durability='sync', seed=False, engagement='table',
+                           shared_engagement=False, in_memory=False)
+
+
+def _shard_paths(db_path: str) -> List[str]:
+    """Shard files listed in the directory of a sharded store"""
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return [row[0] for row in conn.execute("SELECT path FROM shards")]
+    except sqlite3.OperationalError:
+        return []  # not created yet
+    finally:
+        conn.close()
+
+
+def backfill_rollups(args) -> None:
+    """Rebuild the stats rollup tables from history"""
+    db = _open(args.db)
+    try:
+        db.backfill_rollups()
+    finally:
+        db.close()
+    print(f"Rebuilt stats rollups in {args.db}")
+
+
+def archive(args) -> None:
+    """Move old notification history into monthly archive segments"""
+    _open(args.db).close()  # make sure the schema is current
+    archiver = NotificationArchive(args.db, args.archive_dir, args.horizon_days)
+    moved = archiver.archive(vacuum=args.vacuum)
+    print(f"Archived {moved['generated_notifications']} notifications and "
+          f"{moved['notification_responses']} responses to {archiver.archive_dir}")
+
+
+def export(args) -> None:
+    """Export history to Parquet/Arrow files for analytics"""
+    from src.database.export import HistoryExporter
+
+    exporter = HistoryExporter(
+        args.db, args.output_dir,
+        batch_size=args.batch_size,
+        file_format=args.format,
+        include_archives=not args.skip_archives,
+        include_llm_text=args.include_llm_text,
+    )
+    written = exporter.export(args.tables, incremental=args.incremental)
+    for table, count in written.items():
+        print(f"{table}: {count} rows")
+
+
+def split_shard(args) -> None:
+    """Move half of a shard's users into a new shard"""
+    from src.database.sharding import ShardedDatabaseManager
+
+    for path in [args.db] + _shard_paths(args.db):
+        check_no_memory_owner(path)
+    store = ShardedDatabaseManager(args.db, in_memory=False)
+    try:
+        new_shard = store.split_shard(args.shard)
+    finally:
+        store.close()
+    print(f"Split shard {args.shard} into new shard {new_shard}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scroll Breaker database maintenance")
+    parser.add_argument('--db', default="scroll_breaker.db", help="database path")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    backfill = subparsers.add_parser('backfill-rollups', help="rebuild the stats rollup tables")
+    backfill.set_defaults(handler=backfill_rollups)
+
+    archive_parser = subparsers.add_parser('archive', help="archive old notification history")
+    archive_parser.add_argument('--archive-dir', default=None, help="segment directory")
+    archive_parser.add_argument('--horizon-days', type=int, default=None,
+                                help="keep this many days in the hot database")
+    archive_parser.add_argument('--vacuum', action='store_true',
+                                help="reclaim space in the hot database afterwards")
+    archive_parser.set_defaults(handler=archive)
+
+    export_parser = subparsers.add_parser('export', help="export history to Parquet/Arrow")
+    export_parser.add_argument('--output-dir', default="export", help="output directory")
+    export_parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet')
+    export_parser.add_argument('--tables', nargs='+', default=None, help="tables to export")
+    export_parser.add_argument('--batch-size', type=int, default=50_000,
+                               help="rows held in memory per batch")
+    export_parser.add_argument('--incremental', action='store_true',
+                               help="only export rows newer than the last watermark")
+    export_parser.add_argument('--skip-archives', action='store_true',
+                               help="do not read archived segments")
+    export_parser.add_argument('--include-llm-text', action='store_true',
+                               help="include raw LLM prompts and responses")
+    export_parser.set_defaults(handler=export)
+
+    split_parser = subparsers.add_parser('split-shard', help="split a user shard in two")
+    split_parser.add_argument('--shard', type=int, required=True, help="shard to split")
+    split_parser.set_defaults(handler=split_shard)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        args.handler(args)
+    except RuntimeError as e:
+        parser.exit(1, f"error: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
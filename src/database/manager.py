@@ -1,22 +1,278 @@
 import json
+import logging
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Dict, List
-from src.models.models import User, Task, GeneratedNotification, NotificationResponse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from src.config import (
+    DB_DURABILITY, DB_BUSY_TIMEOUT, OUTBOX_BATCH_SIZE, OUTBOX_FLUSH_INTERVAL, OUTBOX_MAX_QUEUE,
+    ENGAGEMENT_MODE, ENGAGEMENT_SHARED, DB_IN_MEMORY
+)
+from src.database.engagement_log import EngagementLog, write_event, write_snapshot
+from src.database.memory import InMemoryDatabase
+from src.database.outbox import WriteBehindOutbox
+from src.database.shared_state import SharedEngagementStore, SharedRows
+from src.instrumentation.metrics import instrumented
+from src.models.ids import MAX_SEQUENCE, legacy_notification_id
+from src.models.engagement import EngagementState, apply_response
+from src.models.models import User, Task, GeneratedNotification, NotificationResponse, task_from_row
 
+logger = logging.getLogger(__name__)
+
+POSITIVE_ACTIONS = ('acted', 'expanded', 'clicked')
+
+# Time windows accepted by get_system_stats
+STATS_WINDOWS = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+
+# Rollup bucket format; matches CURRENT_TIMESTAMP (UTC) truncated to the hour
+ROLLUP_BUCKET_FORMAT = '%Y-%m-%d %H:00:00'
+
+# Tables backfill_rollups rebuilds from history (stats_rollup_totals is
+# derived from stats_rollup_hourly)
+BACKFILLED_TABLES = ('stats_rollup_hourly', 'task_response_counts', 'task_bandit_posteriors')
+
+# Archive segments attached at once when scanning history (SQLite allows 10)
+ATTACH_BATCH_SIZE = 8
+
+# Durability modes: 'sync' commits each write before returning, 'batched'
+# queues notification/response writes for the write-behind outbox
+DURABILITY_MODES = ('sync', 'batched')
+
+# Engagement modes: 'table' updates task_engagement in place, 'events' appends
+# to engagement_events and projects the state in memory (see engagement_log)
+ENGAGEMENT_MODES = ('table', 'events')
+
+# Columns added after their table was first released: (table, column, declaration).
+# Existing databases get them when opened.
+ADDED_COLUMNS = [
+    ('generated_notifications', 'context_key', 'TEXT'),
+    ('generated_notifications', 'context', 'TEXT'),
+    ('generated_notifications', 'selection_propensity', 'REAL'),
+    ('task_engagement', 'event_seq', 'INTEGER'),  # last engagement event reflected
+]
+
+# Tables whose notification_id column held text IDs before integer IDs;
+# notifications come first so responses can be mapped through them
+TEXT_ID_TABLES = ('generated_notifications', 'notification_responses')
+
+# Rows converted per batch when migrating text notification IDs
+ID_MIGRATION_BATCH_SIZE = 5000
+
+# Stored in PRAGMA user_version by init_database; bump it whenever the schema
+# changes, so warm-start snapshots of an older schema are not trusted
+SCHEMA_VERSION = 2
+
+
+def rename_text_id_table(cursor: sqlite3.Cursor, schema: str, table: str) -> None:
+    """Move a text-ID table to legacy_<table>, dropping its indexes so their
+    names are free for the new table"""
+    cursor.execute(f"SELECT name FROM {schema}.sqlite_master "
+                   f"WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))
+    for (index,) in cursor.fetchall():
+        cursor.execute(f"DROP INDEX {schema}.{index}")
+    cursor.execute(f"ALTER TABLE {schema}.{table} RENAME TO legacy_{table}")
+
+
+def record_legacy_ids(cursor: sqlite3.Cursor, mapping: Dict[str, int]) -> None:
+    """Remember the integer each text notification ID was converted to, so
+    clients still holding a text ID resolve to it even where the conversion
+    probed past a collision"""
+    cursor.executemany("INSERT OR REPLACE INTO main.legacy_notification_ids "
+                       "(text_id, notification_id) VALUES (?, ?)", mapping.items())
+
+
+def copy_with_integer_ids(cursor: sqlite3.Cursor, schema: str, table: str,
+                          mapping: Dict[str, int]) -> int:
+    """Copy legacy_<table> into <table>, converting text notification IDs; returns
+    the number of rows copied.
+
+    Notifications get ``legacy_notification_id`` of their text ID, probing the
+    next sequence numbers on the rare collision, and are recorded in
+    ``mapping`` so the responses copied afterwards reference the same integers.
+    """
+    assign = table == 'generated_notifications'
+    used = set(mapping.values())
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    target_columns = {row[1] for row in cursor.fetchall()}
+    cursor.execute(f"PRAGMA {schema}.table_info(legacy_{table})")
+    columns = [row[1] for row in cursor.fetchall() if row[1] in target_columns]
+    position = columns.index('notification_id')
+    column_list = ", ".join(columns)
+    insert = (f"INSERT INTO {schema}.{table} ({column_list}) "
+              f"VALUES ({', '.join('?' for _ in columns)})")
+
+    reader = cursor.connection.cursor()
+    reader.execute(f"SELECT {column_list} FROM {schema}.legacy_{table} ORDER BY rowid")
+    copied = 0
+    while True:
+        rows = reader.fetchmany(ID_MIGRATION_BATCH_SIZE)
+        if not rows:
+            return copied
+        converted = []
+        for row in rows:
+            row = list(row)
+            text = str(row[position])
+            new_id = mapping.get(text)
+            if new_id is None:
+                new_id = legacy_notification_id(text)
+                if assign:
+                    while new_id in used:
+                        new_id = (new_id & ~MAX_SEQUENCE) | ((new_id + 1) & MAX_SEQUENCE)
+                    used.add(new_id)
+                    mapping[text] = new_id
+            row[position] = new_id
+            converted.append(row)
+        cursor.executemany(insert, converted)
+        copied += len(converted)
+
+# Data seeded into an empty database
+INITIAL_USER = {
+    "username": "john_doe",
+    "email": "john@example.com",
+    "preferences": {
+        "notification_frequency": "medium",
+        "preferred_times": [9, 14, 19],
+        "categories_enabled": ["learning", "work", "health", "personal"]
+    }
+}
+
+INITIAL_TASKS = [
+    {
+        "title": "Learn Computer Vision with OpenCV",
+        "category": "learning",
+        "importance": 9,
+        "notes": "Just started learning basic concepts like image processing and feature detection.",
+        "task_type": "complex"
+    },
+    {
+        "title": "Master React Hooks and Context API",
+        "category": "learning", 
+        "importance": 8,
+        "notes": "Halfway through - understanding useEffect and useState well.",
+        "task_type": "complex"
+    },
+    # Add more tasks as needed
+]
+
+@instrumented("db")
 class DatabaseManager:
     """Handles all database operations"""
     
-    def __init__(self, db_path: str = "scroll_breaker.db"):
+    def __init__(self, db_path: str = "scroll_breaker.db", durability: str = None,
+                 seed: bool = True, engagement: str = None, shared_engagement: bool = None,
+                 in_memory: bool = None, warm_state: Dict = None):
+        """``warm_state`` comes from export_state of a manager that closed the
+        unchanged database (see src/core/warm_start.py); the schema is then
+        known to be current and the engagement projection is restored from it"""
         self.db_path = db_path
-        self.init_database()
-        self.seed_initial_data()
+        self.durability = durability or DB_DURABILITY
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode '{self.durability}', "
+                             f"expected one of {DURABILITY_MODES}")
+        self.engagement = engagement or ENGAGEMENT_MODE
+        if self.engagement not in ENGAGEMENT_MODES:
+            raise ValueError(f"Unknown engagement mode '{self.engagement}', "
+                             f"expected one of {ENGAGEMENT_MODES}")
+        self._shared: Optional[SharedEngagementStore] = None
+        shared = ENGAGEMENT_SHARED if shared_engagement is None else shared_engagement
+        if shared and self.engagement == 'events':
+            # Event sequence numbers are assigned per process; several
+            # processes appending to one log would collide on them
+            raise ValueError("The engagement event log is written by a single process; "
+                             "shared engagement state needs ENGAGEMENT_MODE=table")
+        
+        self._memory: Optional[InMemoryDatabase] = None
+        if DB_IN_MEMORY if in_memory is None else in_memory:
+            if shared:
+                raise ValueError("An in-memory database is private to its process; "
+                                 "it cannot back shared engagement state")
+            self._memory = InMemoryDatabase(db_path)
+        
+        if warm_state is not None and 'engagement' not in warm_state:
+            logger.warning("Ignoring warm state of another store layout")
+            warm_state = None
+        if warm_state is None:
+            self.init_database()
+            if seed:
+                self.seed_initial_data()
+        
+        self._outbox: Optional[WriteBehindOutbox] = None
+        if self.durability == 'batched':
+            self._outbox = WriteBehindOutbox(
+                self._connect, self._apply_queued_write,
+                batch_size=OUTBOX_BATCH_SIZE,
+                flush_interval=OUTBOX_FLUSH_INTERVAL,
+                max_queue=OUTBOX_MAX_QUEUE,
+            )
+        
+        self._engagement_log: Optional[EngagementLog] = None
+        if self.engagement == 'events':
+            self._engagement_log = EngagementLog(
+                self._connect, self._outbox.submit if self._outbox is not None else None,
+                state=warm_state.get('engagement') if warm_state else None
+            )
+        
+        if shared:
+            self._shared = SharedEngagementStore(self.db_path, self._shared_rows)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that waits on locks instead of failing immediately"""
+        if self._memory is not None:
+            return self._memory.connect()
+        return sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT)
+    
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until all queued writes are committed"""
+        if self._outbox is None:
+            return True
+        return self._outbox.flush(timeout)
+    
+    @property
+    def in_memory(self) -> bool:
+        return self._memory is not None
+    
+    def checkpoint(self) -> bool:
+        """Write an in-memory database back to its file now; returns whether
+        anything was written"""
+        if self._memory is None:
+            return False
+        self.flush()
+        return self._memory.checkpoint()
+    
+    def export_state(self) -> Dict:
+        """In-process state worth restoring on a warm start"""
+        return {'engagement': (self._engagement_log.export_state()
+                               if self._engagement_log is not None else None)}
+    
+    def close(self) -> None:
+        """Snapshot engagement, commit queued writes and stop the outbox writer;
+        an in-memory database is written back to its file"""
+        if self._engagement_log is not None:
+            self._engagement_log.snapshot()
+        if self._outbox is not None:
+            self._outbox.close()
+        if self._memory is not None:
+            self._memory.close()
+        if self._shared is not None:
+            self._shared.close()
     
     def init_database(self):
         """Initialize database with required tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
+        # With a background writer committing continuously, WAL lets readers
+        # proceed without waiting on it (the mode persists in the file)
+        if self.durability == 'batched':
+            cursor.execute("PRAGMA journal_mode=WAL")
+        
+        # Notification IDs used to be text; such tables are set aside and
+        # copied into the integer-keyed tables below in the same transaction
+        migrate_ids = self._set_aside_text_id_tables(cursor)
+        
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -49,7 +305,7 @@ class DatabaseManager:
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS generated_notifications (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                notification_id TEXT UNIQUE NOT NULL,
+                notification_id INTEGER UNIQUE NOT NULL,
                 task_id INTEGER NOT NULL,
                 hook_message TEXT NOT NULL,
                 expanded_content TEXT,
@@ -59,6 +315,9 @@ class DatabaseManager:
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 llm_prompt_used TEXT,
                 llm_response_raw TEXT,
+                context_key TEXT,
+                context TEXT,
+                selection_propensity REAL,
                 FOREIGN KEY (task_id) REFERENCES tasks (id)
             )
         ''')
@@ -67,7 +326,7 @@ class DatabaseManager:
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS notification_responses (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                notification_id TEXT NOT NULL,
+                notification_id INTEGER NOT NULL,
                 task_id INTEGER NOT NULL,
                 user_action TEXT NOT NULL,
                 response_time REAL NOT NULL,
@@ -92,12 +351,159 @@ class DatabaseManager:
             )
         ''')
         
+        # Hourly engagement rollups per user and category, maintained on write
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_rollup_hourly (
+                user_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                notifications INTEGER NOT NULL DEFAULT 0,
+                responses INTEGER NOT NULL DEFAULT 0,
+                positive_responses INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, category, bucket)
+            )
+        ''')
+        
+        # All-time rollups per user and category
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_rollup_totals (
+                user_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                notifications INTEGER NOT NULL DEFAULT 0,
+                responses INTEGER NOT NULL DEFAULT 0,
+                positive_responses INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, category)
+            )
+        ''')
+        
+        # Per-task response counters; survive archival of notification_responses
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS task_response_counts (
+                task_id INTEGER PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                positive INTEGER NOT NULL DEFAULT 0,
+                negative INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        # Beta posterior of each task's positive-response rate per selection context
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS task_bandit_posteriors (
+                task_id INTEGER NOT NULL,
+                context_key TEXT NOT NULL,
+                successes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (task_id, context_key)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Append-only engagement log and its snapshots (engagement mode 'events')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS engagement_events (
+                seq INTEGER PRIMARY KEY,
+                task_id INTEGER NOT NULL,
+                user_action TEXT NOT NULL,
+                occurred_at TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS engagement_snapshots (
+                seq INTEGER PRIMARY KEY,
+                tasks INTEGER NOT NULL,
+                taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Integer each pre-migration text notification ID was converted to
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS legacy_notification_ids (
+                text_id TEXT PRIMARY KEY,
+                notification_id INTEGER NOT NULL
+            )
+        ''')
+        
+        # Registry of monthly archive files holding rows moved out of this database
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive_segments (
+                month TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                notifications INTEGER NOT NULL DEFAULT 0,
+                responses INTEGER NOT NULL DEFAULT 0,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        for table, column, declaration in ADDED_COLUMNS:
+            cursor.execute(f"PRAGMA table_info({table})")
+            if column not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_tasks_user ON tasks (user_id, is_active)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_notifications_timestamp
+            ON generated_notifications (timestamp)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_responses_timestamp
+            ON notification_responses (timestamp)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_responses_notification
+            ON notification_responses (notification_id)
+        ''')
+        
+        if migrate_ids:
+            mapping: Dict[str, int] = {}
+            for table in TEXT_ID_TABLES:
+                copied = copy_with_integer_ids(cursor, 'main', table, mapping)
+                cursor.execute(f"DROP TABLE legacy_{table}")
+                logger.info("Converted %d %s rows to integer notification IDs", copied, table)
+            record_legacy_ids(cursor, mapping)
+        
+        # Databases created before rollups existed need a one-time backfill
+        cursor.execute('''
+            SELECT (EXISTS(SELECT 1 FROM generated_notifications)
+                    AND NOT EXISTS(SELECT 1 FROM stats_rollup_totals))
+                OR (EXISTS(SELECT 1 FROM notification_responses)
+                    AND NOT EXISTS(SELECT 1 FROM task_response_counts))
+        ''')
+        needs_backfill = cursor.fetchone()[0]
+        
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] != SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        
         conn.commit()
         conn.close()
+        
+        if migrate_ids:
+            # Imported here: the archive module builds on this one
+            from src.database.archive import NotificationArchive
+            NotificationArchive(self.db_path).migrate_notification_ids()
+        
+        if needs_backfill:
+            self.backfill_rollups()
+
+    @staticmethod
+    def _set_aside_text_id_tables(cursor: sqlite3.Cursor) -> bool:
+        """Rename tables still keyed by text notification IDs to legacy_<table>.
+
+        Opens the transaction the conversion runs in; returns whether one is needed.
+        """
+        cursor.execute("PRAGMA table_info(generated_notifications)")
+        types = {row[1]: row[2] for row in cursor.fetchall()}
+        if types.get('notification_id', '').upper() != 'TEXT':
+            return False
+        cursor.execute("BEGIN IMMEDIATE")
+        for table in TEXT_ID_TABLES:
+            rename_text_id_table(cursor, 'main', table)
+        return True
 
     def seed_initial_data(self):
         """Seed database with initial user and tasks if empty"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Check if we already have data
@@ -110,34 +516,13 @@ class DatabaseManager:
         cursor.execute('''
             INSERT INTO users (username, email, preferences)
             VALUES (?, ?, ?)
-        ''', ("john_doe", "john@example.com", json.dumps({
-            "notification_frequency": "medium",
-            "preferred_times": [9, 14, 19],
-            "categories_enabled": ["learning", "work", "health", "personal"]
-        })))
+        ''', (INITIAL_USER["username"], INITIAL_USER["email"],
+              json.dumps(INITIAL_USER["preferences"])))
         
         user_id = cursor.lastrowid
         
         # Create initial tasks
-        initial_tasks = [
-            {
-                "title": "Learn Computer Vision with OpenCV",
-                "category": "learning",
-                "importance": 9,
-                "notes": "Just started learning basic concepts like image processing and feature detection.",
-                "task_type": "complex"
-            },
-            {
-                "title": "Master React Hooks and Context API",
-                "category": "learning", 
-                "importance": 8,
-                "notes": "Halfway through - understanding useEffect and useState well.",
-                "task_type": "complex"
-            },
-            # Add more tasks as needed
-        ]
-        
-        for task_data in initial_tasks:
+        for task_data in INITIAL_TASKS:
             cursor.execute('''
                 INSERT INTO tasks (user_id, title, category, importance, notes, task_type)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -146,12 +531,45 @@ class DatabaseManager:
         
         conn.commit()
         conn.close()
-        print(f"Seeded database with 1 user and {len(initial_tasks)} tasks")
+        logger.info("Seeded database with 1 user and %d tasks", len(INITIAL_TASKS))
+
+    def create_user(self, username: str, email: str, preferences: Dict = None,
+                    user_id: int = None) -> int:
+        """Create a user and return its ID (assigned unless given)"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO users (id, username, email, preferences)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, username, email, json.dumps(preferences or {})))
+        
+        user_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        return user_id
+
+    def create_task(self, user_id: int, title: str, category: str, importance: int,
+                    notes: str = "", task_type: str = "simple", task_id: int = None) -> int:
+        """Create a task for a user and return its ID (assigned unless given)"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO tasks (id, user_id, title, category, importance, notes, task_type)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (task_id, user_id, title, category, importance, notes, task_type))
+        
+        task_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        return task_id
 
     def get_user_tasks(self, user_id: int) -> List[Task]:
         """Get all active tasks for a user"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
+        cursor.row_factory = task_from_row
         
         cursor.execute('''
             SELECT id, user_id, title, category, importance, notes, task_type,
@@ -160,60 +578,343 @@ class DatabaseManager:
             WHERE user_id = ? AND is_active = 1
             ORDER BY importance DESC, created_at DESC
         ''', (user_id,))
-        
-        tasks = []
-        for row in cursor.fetchall():
-            tasks.append(Task(
-                id=row[0], user_id=row[1], title=row[2], category=row[3],
-                importance=row[4], notes=row[5], task_type=row[6],
-                created_at=datetime.fromisoformat(row[7]),
-                updated_at=datetime.fromisoformat(row[8]),
-                is_active=bool(row[9])
-            ))
+        tasks = cursor.fetchall()
         
         conn.close()
         return tasks
 
-    def save_notification(self, notification: GeneratedNotification) -> int:
-        """Save generated notification to database"""
-        conn = sqlite3.connect(self.db_path)
+    def save_notification(self, notification: GeneratedNotification) -> Optional[int]:
+        """Save generated notification to database.
+        
+        Returns the row ID, or None when the write was queued (batched durability).
+        """
+        if self._outbox is not None:
+            self._outbox.submit('notification', notification,
+                                notification_id=notification.notification_id,
+                                task_id=notification.task_id)
+            return None
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        notification_id = self._insert_notification(cursor, notification)
+        
+        conn.commit()
+        conn.close()
+        return notification_id
+
+    def save_response(self, response: NotificationResponse) -> Optional[int]:
+        """Save user response to database.
+        
+        Returns the row ID, or None when the write was queued (batched durability).
+        """
+        if self._outbox is not None:
+            if not response.task_id:
+                response.task_id = self.get_task_id_for_notification(response.notification_id)
+            self._outbox.submit('response', response)
+            self._mirror_response(response)
+            return None
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
+        response_id = self._insert_response(cursor, response)
+        
+        conn.commit()
+        conn.close()
+        self._mirror_response(response)
+        return response_id
+
+    def _mirror_response(self, response: NotificationResponse) -> None:
+        """Count a saved response in the shared engagement state"""
+        if self._shared is None:
+            return
+        notification = (self._outbox.pending_item(response.notification_id)
+                        if self._outbox is not None else None)
+        if notification is not None:
+            task_id, context_key = notification.task_id, notification.context_key
+        else:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT task_id, context_key FROM generated_notifications
+                WHERE notification_id = ?
+            ''', (response.notification_id,))
+            row = cursor.fetchone()
+            conn.close()
+            task_id, context_key = row if row else (0, None)
+        task_id = response.task_id or task_id
+        if task_id and self._shared.covers(task_id):
+            positive = 1 if response.user_action in POSITIVE_ACTIONS else 0
+            negative = 1 if response.user_action == 'dismissed' else 0
+            self._shared.add_response(task_id, context_key, positive, negative)
+
+    def _shared_rows(self) -> SharedRows:
+        """Engagement, response counters and posteriors to mirror in shared memory"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        if self._engagement_log is not None:
+            engagement = list(self._engagement_log.states().items())
+        else:
+            cursor.execute('''
+                SELECT task_id, consecutive_dismissals, engagement_score, cooldown_until
+                FROM task_engagement
+            ''')
+            engagement = [
+                (task_id, EngagementState(
+                    consecutive_dismissals=dismissals or 0,
+                    engagement_score=1.0 if score is None else score,
+                    cooldown_until=datetime.fromisoformat(cooldown) if cooldown else None,
+                ))
+                for task_id, dismissals, score, cooldown in cursor.fetchall()
+            ]
+        cursor.execute("SELECT task_id, total, positive, negative FROM task_response_counts")
+        counts = cursor.fetchall()
+        cursor.execute("SELECT task_id, context_key, successes, failures FROM task_bandit_posteriors")
+        arms = cursor.fetchall()
+        conn.close()
+        return engagement, counts, arms
+
+    def _apply_queued_write(self, cursor: sqlite3.Cursor, write: tuple) -> None:
+        """Apply a write taken from the outbox"""
+        kind, item = write
+        if kind == 'notification':
+            self._insert_notification(cursor, item)
+        elif kind == 'response':
+            self._insert_response(cursor, item)
+        elif kind == 'engagement_event':
+            write_event(cursor, item)
+        elif kind == 'engagement_snapshot':
+            write_snapshot(cursor, item)
+        else:
+            raise ValueError(f"Unknown queued write '{kind}'")
+
+    def _insert_notification(self, cursor: sqlite3.Cursor,
+                             notification: GeneratedNotification) -> int:
+        """Insert a notification and count it in the rollups"""
         cursor.execute('''
             INSERT INTO generated_notifications 
             (notification_id, task_id, hook_message, expanded_content, next_step,
-             confidence_score, generation_strategy, llm_prompt_used, llm_response_raw)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+             confidence_score, generation_strategy, llm_prompt_used, llm_response_raw,
+             context_key, context, selection_propensity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (notification.notification_id, notification.task_id, notification.hook_message,
               notification.expanded_content, notification.next_step, notification.confidence_score,
               notification.generation_strategy, notification.llm_prompt_used,
-              notification.llm_response_raw))
+              notification.llm_response_raw, notification.context_key,
+              json.dumps(notification.context) if notification.context is not None else None,
+              notification.selection_propensity))
+        row_id = cursor.lastrowid
         
-        notification_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return notification_id
+        self._bump_rollups(cursor, notification.task_id, notifications=1)
+        return row_id
 
-    def save_response(self, response: NotificationResponse) -> int:
-        """Save user response to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _insert_response(self, cursor: sqlite3.Cursor, response: NotificationResponse) -> int:
+        """Insert a response, count it in the rollups and update the task's posterior"""
+        task_id = response.task_id
+        if not task_id:
+            cursor.execute('''
+                SELECT task_id FROM generated_notifications WHERE notification_id = ?
+            ''', (response.notification_id,))
+            row = cursor.fetchone()
+            task_id = row[0] if row else 0
         
         cursor.execute('''
             INSERT INTO notification_responses 
             (notification_id, task_id, user_action, response_time, was_expanded, context)
             VALUES (?, ?, ?, ?, ?, ?)
-        ''', (response.notification_id, response.task_id, response.user_action,
+        ''', (response.notification_id, task_id, response.user_action,
               response.response_time, response.was_expanded, json.dumps(response.context)))
+        row_id = cursor.lastrowid
+        
+        positive = 1 if response.user_action in POSITIVE_ACTIONS else 0
+        negative = 1 if response.user_action == 'dismissed' else 0
+        self._bump_rollups(cursor, task_id, responses=1, positive_responses=positive)
+        cursor.execute('''
+            INSERT INTO task_response_counts (task_id, total, positive, negative)
+            VALUES (?, 1, ?, ?)
+            ON CONFLICT (task_id) DO UPDATE SET
+                total = total + 1,
+                positive = positive + excluded.positive,
+                negative = negative + excluded.negative
+        ''', (task_id, positive, negative))
+        
+        # Credit the context the notification was selected in
+        cursor.execute('''
+            INSERT INTO task_bandit_posteriors (task_id, context_key, successes, failures)
+            SELECT task_id, context_key, ?, ? FROM generated_notifications
+            WHERE notification_id = ? AND context_key IS NOT NULL
+            ON CONFLICT (task_id, context_key) DO UPDATE SET
+                successes = successes + excluded.successes,
+                failures = failures + excluded.failures
+        ''', (positive, 1 - positive, response.notification_id))
+        return row_id
+
+    def _bump_rollups(self, cursor: sqlite3.Cursor, task_id: int, notifications: int = 0,
+                      responses: int = 0, positive_responses: int = 0) -> None:
+        """Add counts for a task's user and category to the current hour and the totals"""
+        cursor.execute('''
+            INSERT INTO stats_rollup_hourly
+            (user_id, category, bucket, notifications, responses, positive_responses)
+            SELECT user_id, category, strftime(?, 'now'), ?, ?, ?
+            FROM tasks WHERE id = ?
+            ON CONFLICT (user_id, category, bucket) DO UPDATE SET
+                notifications = notifications + excluded.notifications,
+                responses = responses + excluded.responses,
+                positive_responses = positive_responses + excluded.positive_responses
+        ''', (ROLLUP_BUCKET_FORMAT, notifications, responses, positive_responses, task_id))
+        
+        cursor.execute('''
+            INSERT INTO stats_rollup_totals
+            (user_id, category, notifications, responses, positive_responses)
+            SELECT user_id, category, ?, ?, ?
+            FROM tasks WHERE id = ?
+            ON CONFLICT (user_id, category) DO UPDATE SET
+                notifications = notifications + excluded.notifications,
+                responses = responses + excluded.responses,
+                positive_responses = positive_responses + excluded.positive_responses
+        ''', (notifications, responses, positive_responses, task_id))
+
+    def backfill_rollups(self) -> None:
+        """Rebuild the stats rollups, task counters and bandit posteriors from the
+        full history, including rows moved to archive segments"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT path FROM archive_segments ORDER BY month")
+        segment_paths = [row[0] for row in cursor.fetchall()]
+        
+        # Attach archives in batches; ATTACH is not allowed inside a transaction
+        batches = [segment_paths[i:i + ATTACH_BATCH_SIZE]
+                   for i in range(0, len(segment_paths), ATTACH_BATCH_SIZE)]
+        
+        # Rebuilt into temporary copies across those transactions, then swapped
+        # in by one, so readers keep seeing the old rollups until then
+        for table in BACKFILLED_TABLES:
+            cursor.execute("SELECT sql FROM main.sqlite_master WHERE name = ?", (table,))
+            definition = cursor.fetchone()[0]
+            cursor.execute(definition.replace(f"CREATE TABLE {table}",
+                                              f"CREATE TEMP TABLE staged_{table}", 1))
+        self._backfill_from(cursor, 'main')
+        conn.commit()
+        
+        for batch in batches:
+            schemas = [f"segment_{index}" for index in range(len(batch))]
+            for schema, path in zip(schemas, batch):
+                cursor.execute("ATTACH DATABASE ? AS " + schema, (path,))
+            for schema in schemas:
+                self._backfill_from(cursor, schema)
+            conn.commit()
+            for schema in schemas:
+                cursor.execute("DETACH DATABASE " + schema)
+        
+        for table in BACKFILLED_TABLES:
+            cursor.execute(f"DELETE FROM main.{table}")
+            cursor.execute(f"INSERT INTO main.{table} SELECT * FROM temp.staged_{table}")
+        cursor.execute("DELETE FROM main.stats_rollup_totals")
+        cursor.execute('''
+            INSERT INTO main.stats_rollup_totals
+            (user_id, category, notifications, responses, positive_responses)
+            SELECT user_id, category, SUM(notifications), SUM(responses), SUM(positive_responses)
+            FROM temp.staged_stats_rollup_hourly
+            GROUP BY user_id, category
+        ''')
         
-        response_id = cursor.lastrowid
         conn.commit()
         conn.close()
-        return response_id
+        logger.info("Backfilled stats rollups from %d archive segments", len(segment_paths))
+        if self._shared is not None:
+            self._shared.reload()
+
+    def _backfill_from(self, cursor: sqlite3.Cursor, schema: str) -> None:
+        """Add the history stored in one attached schema to the staged rollups"""
+        cursor.execute(f'''
+            INSERT INTO temp.staged_stats_rollup_hourly (user_id, category, bucket, notifications)
+            SELECT t.user_id, t.category, strftime(?, gn.timestamp), COUNT(*)
+            FROM {schema}.generated_notifications gn
+            JOIN main.tasks t ON t.id = gn.task_id
+            WHERE true
+            GROUP BY t.user_id, t.category, strftime(?, gn.timestamp)
+            ON CONFLICT (user_id, category, bucket) DO UPDATE SET
+                notifications = notifications + excluded.notifications
+        ''', (ROLLUP_BUCKET_FORMAT, ROLLUP_BUCKET_FORMAT))
+        
+        # Older rows were stored without a task_id; resolve those through the notification
+        responses = f'''
+            SELECT COALESCE(
+                       NULLIF(nr.task_id, 0),
+                       (SELECT task_id FROM {schema}.generated_notifications gn
+                        WHERE gn.notification_id = nr.notification_id)
+                   ) AS task_id,
+                   nr.user_action, nr.timestamp
+            FROM {schema}.notification_responses nr
+        '''
+        
+        cursor.execute(f'''
+            INSERT INTO temp.staged_stats_rollup_hourly
+            (user_id, category, bucket, responses, positive_responses)
+            SELECT t.user_id, t.category, strftime(?, r.timestamp), COUNT(*),
+                   SUM(CASE WHEN r.user_action IN ('acted', 'expanded', 'clicked')
+                           THEN 1 ELSE 0 END)
+            FROM ({responses}) r
+            JOIN main.tasks t ON t.id = r.task_id
+            WHERE true
+            GROUP BY t.user_id, t.category, strftime(?, r.timestamp)
+            ON CONFLICT (user_id, category, bucket) DO UPDATE SET
+                responses = responses + excluded.responses,
+                positive_responses = positive_responses + excluded.positive_responses
+        ''', (ROLLUP_BUCKET_FORMAT, ROLLUP_BUCKET_FORMAT))
+        
+        cursor.execute(f'''
+            INSERT INTO temp.staged_task_response_counts (task_id, total, positive, negative)
+            SELECT r.task_id, COUNT(*),
+                   SUM(CASE WHEN r.user_action IN ('acted', 'expanded', 'clicked')
+                           THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN r.user_action = 'dismissed' THEN 1 ELSE 0 END)
+            FROM ({responses}) r
+            WHERE r.task_id IS NOT NULL
+            GROUP BY r.task_id
+            ON CONFLICT (task_id) DO UPDATE SET
+                total = total + excluded.total,
+                positive = positive + excluded.positive,
+                negative = negative + excluded.negative
+        ''')
+        
+        # Segments archived before context keys were recorded have no posteriors to add
+        cursor.execute(f"PRAGMA {schema}.table_info(generated_notifications)")
+        if 'context_key' in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f'''
+                INSERT INTO temp.staged_task_bandit_posteriors
+                (task_id, context_key, successes, failures)
+                SELECT gn.task_id, gn.context_key,
+                       SUM(CASE WHEN nr.user_action IN ('acted', 'expanded', 'clicked')
+                               THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN nr.user_action IN ('acted', 'expanded', 'clicked')
+                               THEN 0 ELSE 1 END)
+                FROM {schema}.notification_responses nr
+                JOIN {schema}.generated_notifications gn
+                    ON gn.notification_id = nr.notification_id
+                WHERE gn.context_key IS NOT NULL
+                GROUP BY gn.task_id, gn.context_key
+                ON CONFLICT (task_id, context_key) DO UPDATE SET
+                    successes = successes + excluded.successes,
+                    failures = failures + excluded.failures
+            ''')
 
     def update_task_engagement(self, task_id: int, user_action: str) -> None:
         """Update task engagement metrics based on user action"""
-        conn = sqlite3.connect(self.db_path)
+        if self._shared is not None and self._shared.covers(task_id):
+            self._shared.update_engagement(
+                task_id, lambda: self._update_engagement(task_id, user_action))
+        else:
+            self._update_engagement(task_id, user_action)
+
+    def _update_engagement(self, task_id: int, user_action: str) -> EngagementState:
+        """Persist the task's engagement after a response and return it"""
+        if self._engagement_log is not None:
+            return self._engagement_log.append(task_id, user_action, datetime.now())
+        
+        conn = self._connect()
         cursor = conn.cursor()
 
         # Get current engagement data
@@ -233,45 +934,54 @@ class DatabaseManager:
                 VALUES (?, ?, 1.0)
             ''', (task_id, now))
             engagement_id = cursor.lastrowid
-            consecutive_dismissals = 0
-            engagement_score = 1.0
+            state = EngagementState()
         else:
             engagement_id = row[0]
-            consecutive_dismissals = row[1]
-            engagement_score = row[2]
+            state = EngagementState(consecutive_dismissals=row[1], engagement_score=row[2])
 
         # Update metrics based on action
-        if user_action == 'dismissed':
-            consecutive_dismissals += 1
-            engagement_score *= 0.8  # Reduce score by 20%
-            
-            # Set cooldown period based on consecutive dismissals
-            cooldown_minutes = min(30 * consecutive_dismissals, 240)  # Max 4 hours
-            cooldown_until = now + timedelta(minutes=cooldown_minutes)
-        else:
-            consecutive_dismissals = 0
-            engagement_score = min(engagement_score * 1.2, 1.0)  # Increase score up to max 1.0
-            cooldown_until = None
+        state = apply_response(state, user_action, now)
 
-        # Update engagement record
+        # Update engagement record; event_seq marks events logged in the
+        # 'events' mode as already reflected, should it be enabled again
         cursor.execute('''
             UPDATE task_engagement 
             SET last_interaction = ?,
                 consecutive_dismissals = ?,
                 last_success = ?,
                 engagement_score = ?,
-                cooldown_until = ?
+                cooldown_until = ?,
+                event_seq = (SELECT MAX(seq) FROM engagement_events)
             WHERE id = ?
-        ''', (now, consecutive_dismissals,
-              now if user_action in ['acted', 'expanded'] else None,
-              engagement_score, cooldown_until, engagement_id))
+        ''', (now, state.consecutive_dismissals, state.last_success,
+              state.engagement_score, state.cooldown_until, engagement_id))
 
         conn.commit()
         conn.close()
+        return state
+
+    def rebuild_engagement(self) -> None:
+        """Reload the in-memory engagement state after its tables changed underneath"""
+        if self._engagement_log is not None:
+            self._engagement_log.rebuild()
+        if self._shared is not None:
+            self._shared.reload()
 
     def get_task_engagement(self, task_id: int) -> Dict:
         """Get engagement metrics for a task"""
-        conn = sqlite3.connect(self.db_path)
+        state = None
+        if self._shared is not None and self._shared.covers(task_id):
+            state = self._shared.engagement(task_id)
+        if state is None and self._engagement_log is not None:
+            state = self._engagement_log.get(task_id) or EngagementState()
+        if state is not None:
+            return {
+                'consecutive_dismissals': state.consecutive_dismissals,
+                'engagement_score': state.engagement_score,
+                'is_cooling_down': state.is_cooling_down(datetime.now())
+            }
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -299,72 +1009,156 @@ class DatabaseManager:
             )
         }
 
+    def get_bandit_arms(self, task_ids: List[int], context_key: str) -> Dict[int, Dict]:
+        """Posterior counts and cooldown state of several tasks in one context"""
+        if not task_ids:
+            return {}
+        if self._shared is not None and all(map(self._shared.covers, task_ids)):
+            now = datetime.now().timestamp()
+            arms = {}
+            for task_id in task_ids:
+                arm = self._shared.arm(task_id, context_key)
+                if arm is None:
+                    break  # a slot left mid-write; ask the database
+                successes, failures, cooldown_until = arm
+                arms[task_id] = {
+                    'successes': successes,
+                    'failures': failures,
+                    'is_cooling_down': cooldown_until > now
+                }
+            else:
+                return arms
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        placeholders = ", ".join("?" * len(task_ids))
+        if self._engagement_log is not None:
+            cursor.execute(f'''
+                SELECT t.id, COALESCE(p.successes, 0), COALESCE(p.failures, 0)
+                FROM tasks t
+                LEFT JOIN task_bandit_posteriors p ON p.task_id = t.id AND p.context_key = ?
+                WHERE t.id IN ({placeholders})
+            ''', (context_key, *task_ids))
+            rows = cursor.fetchall()
+            conn.close()
+            now = datetime.now()
+            return {
+                task_id: {
+                    'successes': successes,
+                    'failures': failures,
+                    'is_cooling_down': (self._engagement_log.get(task_id)
+                                        or EngagementState()).is_cooling_down(now)
+                }
+                for task_id, successes, failures in rows
+            }
+        
+        cursor.execute(f'''
+            SELECT t.id, COALESCE(p.successes, 0), COALESCE(p.failures, 0), e.cooldown_until
+            FROM tasks t
+            LEFT JOIN task_bandit_posteriors p ON p.task_id = t.id AND p.context_key = ?
+            LEFT JOIN task_engagement e ON e.task_id = t.id
+            WHERE t.id IN ({placeholders})
+        ''', (context_key, *task_ids))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        now = datetime.now()
+        return {
+            task_id: {
+                'successes': successes,
+                'failures': failures,
+                'is_cooling_down': (
+                    datetime.fromisoformat(cooldown_until) > now if cooldown_until else False
+                )
+            }
+            for task_id, successes, failures, cooldown_until in rows
+        }
+
     def get_task_performance(self, task_id: int) -> Dict:
         """Get performance metrics for a specific task"""
-        conn = sqlite3.connect(self.db_path)
+        counts = (self._shared.counts(task_id)
+                  if self._shared is not None and self._shared.covers(task_id) else None)
+        if counts is not None:
+            total, positive, negative = counts
+            return {'total': total, 'positive': positive, 'negative': negative}
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT user_action, COUNT(*) as count
-            FROM notification_responses
+            SELECT total, positive, negative
+            FROM task_response_counts
             WHERE task_id = ?
-            GROUP BY user_action
         ''', (task_id,))
         
-        results = cursor.fetchall()
+        row = cursor.fetchone()
         conn.close()
         
-        performance = {'total': 0, 'positive': 0, 'negative': 0}
-        for action, count in results:
-            performance['total'] += count
-            if action in ['acted', 'expanded', 'clicked']:
-                performance['positive'] += count
-            elif action == 'dismissed':
-                performance['negative'] += count
+        if not row:
+            return {'total': 0, 'positive': 0, 'negative': 0}
         
-        return performance
+        return {'total': row[0], 'positive': row[1], 'negative': row[2]}
 
-    def get_system_stats(self, user_id: int) -> Dict:
-        """Get comprehensive system statistics"""
-        conn = sqlite3.connect(self.db_path)
+    def get_system_stats(self, user_id: int = None, window: str = None) -> Dict:
+        """Get comprehensive system statistics from the pre-aggregated rollups.
+        
+        Args:
+            user_id: User to report on, or None for all users
+            window: One of STATS_WINDOWS ('24h', '7d', '30d'), or None for all time
+        """
+        if window is not None and window not in STATS_WINDOWS:
+            raise ValueError(f"Unknown stats window '{window}', "
+                             f"expected one of {list(STATS_WINDOWS)}")
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
-        # Basic counts
-        cursor.execute("""
-            SELECT COUNT(*) FROM tasks WHERE user_id = ? AND is_active = 1
-        """, (user_id,))
-        active_tasks = cursor.fetchone()[0]
+        user_filter = "user_id = ?" if user_id is not None else "1"
+        user_params = (user_id,) if user_id is not None else ()
         
-        cursor.execute("SELECT COUNT(*) FROM generated_notifications")
-        total_notifications = cursor.fetchone()[0]
+        # Active task counts and the categories the user has tasks in
+        cursor.execute(f"""
+            SELECT category, SUM(is_active) FROM tasks
+            WHERE {user_filter}
+            GROUP BY category
+        """, user_params)
+        task_categories = cursor.fetchall()
+        active_tasks = sum(count or 0 for _, count in task_categories)
         
-        cursor.execute("SELECT COUNT(*) FROM notification_responses")
-        total_responses = cursor.fetchone()[0]
+        if window is None:
+            cursor.execute(f"""
+                SELECT category, SUM(notifications), SUM(responses), SUM(positive_responses)
+                FROM stats_rollup_totals
+                WHERE {user_filter}
+                GROUP BY category
+            """, user_params)
+        else:
+            since = (datetime.now(timezone.utc) - STATS_WINDOWS[window]).strftime(ROLLUP_BUCKET_FORMAT)
+            cursor.execute(f"""
+                SELECT category, SUM(notifications), SUM(responses), SUM(positive_responses)
+                FROM stats_rollup_hourly
+                WHERE {user_filter} AND bucket >= ?
+                GROUP BY category
+            """, user_params + (since,))
+        rollups = {row[0]: row[1:] for row in cursor.fetchall()}
         
-        # Performance by category
-        cursor.execute('''
-            SELECT t.category, 
-                   COUNT(nr.id) as total_responses,
-                   SUM(CASE WHEN nr.user_action IN ('acted', 'expanded', 'clicked') 
-                           THEN 1 ELSE 0 END) as positive_responses
-            FROM tasks t
-            LEFT JOIN notification_responses nr ON t.id = nr.task_id
-            WHERE t.user_id = ?
-            GROUP BY t.category
-        ''', (user_id,))
+        conn.close()
         
+        total_notifications = 0
+        total_responses = 0
         category_performance = {}
-        for row in cursor.fetchall():
-            category, total, positive = row
-            success_rate = (positive / total) if total > 0 else 0
+        for category in sorted({category for category, _ in task_categories} | set(rollups)):
+            notifications, total, positive = rollups.get(category, (0, 0, 0))
+            total_notifications += notifications
+            total_responses += total
             category_performance[category] = {
                 'total_responses': total,
-                'success_rate': success_rate
+                'success_rate': (positive / total) if total > 0 else 0
             }
         
-        conn.close()
-        
         return {
+            'window': window,
             'active_tasks': active_tasks,
             'total_notifications': total_notifications,
             'total_responses': total_responses,
@@ -373,9 +1167,22 @@ class DatabaseManager:
                            if total_notifications > 0 else 0
         }
 
-    def get_task_id_for_notification(self, notification_id: str) -> int:
+    def resolve_legacy_notification_id(self, text_id: str) -> Optional[int]:
+        """Integer a pre-migration text notification ID was converted to"""
+        conn = self._connect()
+        row = conn.execute("SELECT notification_id FROM legacy_notification_ids "
+                           "WHERE text_id = ?", (text_id,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def get_task_id_for_notification(self, notification_id: int) -> int:
         """Get the task ID associated with a notification"""
-        conn = sqlite3.connect(self.db_path)
+        if self._outbox is not None:
+            task_id = self._outbox.pending_task_id(notification_id)
+            if task_id is not None:
+                return task_id
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -389,9 +1196,17 @@ class DatabaseManager:
         
         return row[0] if row else 0
 
-    def _get_cooldown_remaining(self, task_id: int) -> float:
+    def get_cooldown_remaining(self, task_id: int) -> float:
         """Get remaining cooldown time in minutes"""
-        conn = sqlite3.connect(self.db_path)
+        state = (self._shared.engagement(task_id)
+                 if self._shared is not None and self._shared.covers(task_id) else None)
+        if state is not None:
+            return state.cooldown_remaining(datetime.now())
+        if self._engagement_log is not None:
+            state = self._engagement_log.get(task_id)
+            return state.cooldown_remaining(datetime.now()) if state else 0
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
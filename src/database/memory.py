@@ -0,0 +1,182 @@
+"""In-memory working copy of a database file (DB_IN_MEMORY)
+
+At startup the file is copied with the SQLite backup API into an in-memory
+database on the ``memdb`` VFS, which every connection of this process opens
+by name and which locks like a file (a busy connection waits instead of
+failing). All reads and writes then run against memory; a background thread
+copies the database back to the file every ``checkpoint_interval`` seconds
+when something changed, and once more on close.
+
+A crash loses at most the writes of the last interval. Each checkpoint is a
+single transaction on the file, so the file always holds a complete
+checkpoint. The copy is private to the process: other processes must not
+write the file while it is open here, since the next checkpoint would
+overwrite their changes. The owner holds a lock on ``<database>.memory.lock``
+for as long as the copy is open; maintenance commands check it with
+check_no_memory_owner and refuse to run (without fcntl, on Windows, nothing
+is locked or checked).
+"""
+import atexit
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+
+from typing import Optional
+
+from src.config import DB_BUSY_TIMEOUT, DB_CHECKPOINT_INTERVAL
+from src.instrumentation.metrics import METRICS
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Distinguishes the in-memory databases of several managers in one process
+_instances = itertools.count()
+
+
+def owner_lock_path(db_path: str) -> str:
+    """Lock file held while ``db_path`` is open in memory"""
+    return f"{db_path}.memory.lock"
+
+
+def _lock_owner(db_path: str, exclusive: bool) -> Optional[int]:
+    """Descriptor holding the owner lock of ``db_path``, or None when an
+    owner holds it"""
+    fd = os.open(owner_lock_path(db_path), os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def check_no_memory_owner(db_path: str) -> None:
+    """Raise RuntimeError if a process has ``db_path`` open in memory"""
+    if fcntl is None or not os.path.exists(owner_lock_path(db_path)):
+        return
+    fd = _lock_owner(db_path, exclusive=False)
+    if fd is None:
+        raise RuntimeError(f"{db_path} is open in memory by a running process, whose next "
+                           "checkpoint would overwrite changes to the file; stop it first")
+    os.close(fd)
+
+
+class InMemoryDatabase:
+    """A memdb copy of ``db_path``, checkpointed back to it periodically"""
+
+    def __init__(self, db_path: str, checkpoint_interval: float = None):
+        """
+        Args:
+            db_path: Database file loaded at startup and written by checkpoints
+            checkpoint_interval: Seconds between checkpoints (the data-loss window);
+                0 checkpoints only on close
+        """
+        self.db_path = db_path
+        self.checkpoint_interval = (DB_CHECKPOINT_INTERVAL if checkpoint_interval is None
+                                    else checkpoint_interval)
+        self.uri = f"file:/scroll_breaker_{os.getpid()}_{next(_instances)}?vfs=memdb"
+        self._owner_fd = None
+        if fcntl is not None:
+            self._owner_fd = _lock_owner(db_path, exclusive=True)
+            if self._owner_fd is None:
+                raise RuntimeError(f"{db_path} is already open in memory by another process")
+
+        # Holds the database open for the lifetime of the copy; also the
+        # source of checkpoints, and its data_version tells whether other
+        # connections committed since the last one
+        self._keeper = sqlite3.connect(self.uri, uri=True, timeout=DB_BUSY_TIMEOUT,
+                                       check_same_thread=False)
+        self._lock = threading.Lock()
+        self._checkpointed_version = None
+        try:
+            self._load()
+        except BaseException:
+            self._keeper.close()
+            if self._owner_fd is not None:
+                os.close(self._owner_fd)
+            raise
+
+        self._closed = False
+        self._stop = threading.Event()
+        self._thread = None
+        if self.checkpoint_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="db-checkpointer",
+                                            daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the in-memory database"""
+        return sqlite3.connect(self.uri, uri=True, timeout=DB_BUSY_TIMEOUT)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.db_path):
+            return
+        with METRICS.span("db.memory.load"):
+            source = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT)
+            try:
+                # memdb cannot open a WAL database image; only checkpoints
+                # write the file from now on, so rollback journaling is enough
+                source.execute("PRAGMA journal_mode=DELETE")
+                source.backup(self._keeper)
+            finally:
+                source.close()
+        self._checkpointed_version = self._data_version()
+        logger.info("Loaded %s into memory (%d bytes)", self.db_path,
+                    os.path.getsize(self.db_path))
+
+    def _data_version(self) -> int:
+        return self._keeper.execute("PRAGMA data_version").fetchone()[0]
+
+    def checkpoint(self, force: bool = False) -> bool:
+        """Copy the database to the file if it changed since the last
+        checkpoint (or always with ``force``); returns whether it was copied"""
+        with self._lock:
+            if self._keeper is None:
+                return False
+            version = self._data_version()
+            if not force and version == self._checkpointed_version:
+                return False
+            with METRICS.span("db.memory.checkpoint"):
+                target = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT)
+                try:
+                    self._keeper.backup(target)
+                finally:
+                    target.close()
+            self._checkpointed_version = version
+        METRICS.increment("db.memory.checkpoints")
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.checkpoint_interval):
+            try:
+                self.checkpoint()
+            except sqlite3.Error as e:
+                # The loss window grows until a checkpoint succeeds again
+                METRICS.increment("db.memory.checkpoint_failed")
+                logger.error("Checkpoint of %s failed: %s", self.db_path, e)
+
+    def close(self) -> None:
+        """Stop the checkpointer, write a final checkpoint and free the memory"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.checkpoint()
+        finally:
+            with self._lock:
+                self._keeper.close()
+                self._keeper = None
+            if self._owner_fd is not None:
+                os.close(self._owner_fd)
+                self._owner_fd = None
+            atexit.unregister(self.close)
@@ -0,0 +1,242 @@
+"""Write-behind outbox with group commit
+
+Writes are queued and applied by a single writer thread, which commits
+them in batches of up to ``batch_size`` rows or after ``flush_interval``
+seconds, whichever comes first. One writer means one SQLite write lock
+holder, and callers no longer wait on the commit's fsync. Should the
+writer thread die, flush and close commit what it left queued themselves.
+"""
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from src.instrumentation.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxFull(Exception):
+    """Raised when the outbox stays full for longer than the submit timeout"""
+
+
+class _FlushMarker:
+    """Queue entry asking the writer to commit everything before it"""
+    __slots__ = ('done',)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+# Seconds between checks that the writer thread is still alive while waiting on it
+WRITER_CHECK_INTERVAL = 0.1
+
+
+class WriteBehindOutbox:
+    """Single writer thread applying queued writes in group commits"""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 apply: Callable[[sqlite3.Cursor, tuple], None],
+                 batch_size: int = 200, flush_interval: float = 0.005,
+                 max_queue: int = 10_000, submit_timeout: Optional[float] = 5.0):
+        """
+        Args:
+            connect: Opens the writer's connection
+            apply: Applies one queued item using the writer's cursor
+            batch_size: Maximum rows per commit
+            flush_interval: Seconds to wait for more rows after the first one
+            max_queue: Queue capacity; submit blocks when it is full
+            submit_timeout: Seconds submit waits for space before raising OutboxFull
+                (None waits forever)
+        """
+        self._connect = connect
+        self._apply = apply
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+
+        # notification_id -> (task_id, item) for notifications queued but not yet committed
+        self._pending_lock = threading.Lock()
+        self._pending_notifications: Dict[int, tuple] = {}
+
+        self._drain_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-outbox-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, kind: str, item, notification_id: int = None, task_id: int = None) -> None:
+        """Queue a write; blocks while the queue is full (back-pressure)"""
+        if self._closed:
+            raise RuntimeError("Outbox is closed")
+        if notification_id is not None:
+            with self._pending_lock:
+                self._pending_notifications[notification_id] = (task_id, item)
+        try:
+            self._queue.put((kind, item, notification_id), timeout=self.submit_timeout)
+        except queue.Full:
+            if notification_id is not None:
+                with self._pending_lock:
+                    self._pending_notifications.pop(notification_id, None)
+            METRICS.increment("db.outbox.rejected")
+            raise OutboxFull(f"Outbox full ({self._queue.maxsize} pending writes)")
+        METRICS.set_gauge("db.outbox.queue_depth", self._queue.qsize())
+
+    def pending_task_id(self, notification_id: int) -> Optional[int]:
+        """Task of a notification that is queued but not committed yet"""
+        with self._pending_lock:
+            pending = self._pending_notifications.get(notification_id)
+        return pending[0] if pending else None
+
+    def pending_item(self, notification_id: int):
+        """Queued item of a notification that is not committed yet"""
+        with self._pending_lock:
+            pending = self._pending_notifications.get(notification_id)
+        return pending[1] if pending else None
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until everything submitted so far is committed; False on timeout.
+
+        Writes left queued by a writer thread that died are committed from the
+        calling thread instead; False if that fails too.
+        """
+        if self._closed or not self._thread.is_alive():
+            return self._write_stranded()
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = WRITER_CHECK_INTERVAL
+            if deadline is not None:
+                wait = min(wait, max(deadline - time.monotonic(), 0.0))
+            if marker.done.wait(wait):
+                return True
+            if not self._thread.is_alive():
+                return marker.done.is_set() or self._write_stranded()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def close(self) -> bool:
+        """Flush outstanding writes and stop the writer thread; returns False
+        if queued writes could not be committed"""
+        if self._closed:
+            return self._write_stranded()
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        atexit.unregister(self.close)
+        return self._write_stranded()
+
+    def _write_stranded(self) -> bool:
+        """Commit the writes a writer thread that is gone left in the queue, from
+        the calling thread; returns whether none remain uncommitted"""
+        with self._drain_lock:
+            batch = []
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(entry, _FlushMarker):
+                    entry.done.set()
+                elif entry is not _STOP:
+                    batch.append(entry)
+            if not batch:
+                return True
+
+            METRICS.increment("db.outbox.sync_fallback")
+            logger.error("Outbox writer is gone; committing %d queued writes synchronously",
+                         len(batch))
+            try:
+                conn = self._connect()
+            except Exception as e:
+                logger.error("Outbox left %d writes uncommitted: %s", len(batch), e)
+                for entry in batch:
+                    self._queue.put(entry)
+                return False
+            try:
+                self._commit(conn, conn.cursor(), batch)
+            finally:
+                conn.close()
+            return True
+
+    def _run(self) -> None:
+        try:
+            conn = self._connect()
+        except Exception as e:
+            logger.error("Outbox writer could not connect: %s", e)
+            return
+        cursor = conn.cursor()
+        stopping = False
+        try:
+            while not stopping:
+                entry = self._queue.get()
+                batch = []
+                markers = []
+                deadline = time.monotonic() + self.flush_interval
+
+                # Gather a group: until the batch is full, the interval elapses,
+                # or a flush/stop request arrives
+                while True:
+                    if entry is _STOP:
+                        stopping = True
+                        break
+                    if isinstance(entry, _FlushMarker):
+                        markers.append(entry)
+                        break
+                    batch.append(entry)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        entry = self._queue.get(timeout=remaining) if remaining > 0 \
+                            else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    self._commit(conn, cursor, batch)
+                for marker in markers:
+                    marker.done.set()
+                METRICS.set_gauge("db.outbox.queue_depth", self._queue.qsize())
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, cursor: sqlite3.Cursor, batch: list) -> None:
+        """Apply a batch in one transaction, falling back to row-by-row on failure"""
+        with METRICS.span("db.outbox.commit"):
+            try:
+                for kind, item, _ in batch:
+                    self._apply(cursor, (kind, item))
+                conn.commit()
+            except Exception as e:
+                # Also non-database errors, e.g. an item that cannot be
+                # serialized; they must not take the writer thread down
+                conn.rollback()
+                logger.warning("Group commit of %d rows failed (%s); retrying individually",
+                               len(batch), e)
+                for kind, item, _ in batch:
+                    try:
+                        self._apply(cursor, (kind, item))
+                        conn.commit()
+                    except Exception as row_error:
+                        conn.rollback()
+                        METRICS.increment("db.outbox.dropped")
+                        logger.error("Dropping queued %s write: %s", kind, row_error)
+
+        METRICS.increment("db.outbox.rows", len(batch))
+        METRICS.increment("db.outbox.commits")
+        with self._pending_lock:
+            for _, _, notification_id in batch:
+                if notification_id is not None:
+                    self._pending_notifications.pop(notification_id, None)
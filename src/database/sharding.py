@@ -0,0 +1,495 @@
+"""User-sharded storage across multiple SQLite databases
+
+Users are hash-partitioned across N shard files, each a regular
+DatabaseManager database, so writes for different users take different
+SQLite write locks. A small directory database (the configured db_path)
+allocates globally unique user and task IDs and records which shard owns
+each of them, which lets ``split_shard`` move users without renumbering.
+
+Shard files live next to the directory: ``scroll_breaker.db`` ->
+``scroll_breaker.shard0.db``, ``scroll_breaker.shard1.db``, ...
+"""
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from src.config import DB_BUSY_TIMEOUT
+from src.database.archive import NotificationArchive
+from src.database.manager import DatabaseManager, INITIAL_USER, INITIAL_TASKS
+from src.instrumentation.metrics import instrumented
+from src.models.models import Task, GeneratedNotification, NotificationResponse
+
+logger = logging.getLogger(__name__)
+
+# Notifications remembered for routing responses without a fan-out lookup
+NOTIFICATION_ROUTE_CACHE_SIZE = 100_000
+
+# Keys of export_state a warm start needs
+_WARM_KEYS = {'shard_paths', 'shards', 'user_routes', 'task_routes'}
+
+# Task a legacy_notification_ids row belongs to, read from its
+# notif_<task>_<time>[_<random>] text ID, so mappings of archived
+# notifications move as well
+LEGACY_ID_TASK = "CAST(substr(text_id, 7, instr(substr(text_id, 7), '_') - 1) AS INTEGER)"
+
+# Tables moved with a user when splitting a shard: (table, key column, keeps its id).
+# Tables that keep ids hold globally unique IDs; the rest get fresh row ids.
+USER_TABLES = [
+    ('users', 'id', True),
+    ('tasks', 'user_id', True),
+    ('stats_rollup_hourly', 'user_id', True),
+    ('stats_rollup_totals', 'user_id', True),
+]
+TASK_TABLES = [
+    ('generated_notifications', 'task_id', False),
+    ('notification_responses', 'task_id', False),
+    ('task_engagement', 'task_id', False),
+    ('task_response_counts', 'task_id', True),
+    ('task_bandit_posteriors', 'task_id', True),
+    # Sequence numbers move along so task_engagement.event_seq stays meaningful
+    # (the target of a split is always a new, empty shard)
+    ('engagement_events', 'task_id', True),
+    ('legacy_notification_ids', LEGACY_ID_TASK, True),
+]
+
+
+def shard_for_user(user_id: int, num_shards: int) -> int:
+    """Stable hash partitioning of users (independent of PYTHONHASHSEED)"""
+    return zlib.crc32(str(user_id).encode()) % num_shards
+
+
+@instrumented("shards")
+class ShardedDatabaseManager:
+    """Routes DatabaseManager operations to the shard owning the user or task"""
+
+    def __init__(self, db_path: str = "scroll_breaker.db", num_shards: int = 4,
+                 durability: str = None, in_memory: bool = None, warm_state: Dict = None):
+        """Open (or create) a sharded store whose directory lives at db_path;
+        ``warm_state`` is export_state of the store as it was last closed"""
+        self.db_path = db_path
+        self.durability = durability
+        if warm_state is not None and not _WARM_KEYS <= warm_state.keys():
+            logger.warning("Ignoring warm state without a shard layout")
+            warm_state = None
+        if warm_state is None:
+            self._init_directory(num_shards)
+            shard_paths = self._shard_paths()
+        else:
+            shard_paths = warm_state['shard_paths']
+
+        self.shards: Dict[int, DatabaseManager] = {}
+        for shard_id, path in shard_paths.items():
+            self.shards[shard_id] = DatabaseManager(
+                path, durability=durability, seed=False, in_memory=in_memory,
+                warm_state=warm_state['shards'].get(shard_id) if warm_state else None
+            )
+        self.durability = next(iter(self.shards.values())).durability
+        self.in_memory = next(iter(self.shards.values())).in_memory
+
+        self._user_routes: Dict[int, int] = {}
+        self._task_routes: Dict[int, int] = {}
+        self._notification_routes: "OrderedDict[str, int]" = OrderedDict()
+        self._routes_lock = threading.Lock()
+
+        if warm_state is None:
+            self.seed_initial_data()
+        else:
+            self._user_routes.update(warm_state['user_routes'])
+            self._task_routes.update(warm_state['task_routes'])
+
+    # Directory
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT)
+
+    def _init_directory(self, num_shards: int) -> None:
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS shards (
+                shard_id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_shards (
+                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                shard_id INTEGER
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS task_shards (
+                task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                shard_id INTEGER NOT NULL
+            )
+        ''')
+
+        cursor.execute("SELECT COUNT(*) FROM shards")
+        if cursor.fetchone()[0] == 0:
+            for shard_id in range(num_shards):
+                cursor.execute("INSERT INTO shards (shard_id, path) VALUES (?, ?)",
+                               (shard_id, self._default_shard_path(shard_id)))
+        conn.commit()
+        conn.close()
+
+    def _default_shard_path(self, shard_id: int) -> str:
+        stem, extension = os.path.splitext(self.db_path)
+        return f"{stem}.shard{shard_id}{extension or '.db'}"
+
+    def _shard_paths(self) -> Dict[int, str]:
+        conn = self._connect()
+        rows = conn.execute("SELECT shard_id, path FROM shards ORDER BY shard_id").fetchall()
+        conn.close()
+        return dict(rows)
+
+    @property
+    def db_paths(self) -> List[str]:
+        """Every database file of the store, directory first"""
+        return [self.db_path] + [shard.db_path for shard in self.shards.values()]
+
+    def seed_initial_data(self) -> None:
+        """Seed the initial user and tasks if the store is empty"""
+        conn = self._connect()
+        has_users = conn.execute("SELECT EXISTS(SELECT 1 FROM user_shards)").fetchone()[0]
+        conn.close()
+        if has_users:
+            return
+
+        user_id = self.create_user(INITIAL_USER["username"], INITIAL_USER["email"],
+                                   INITIAL_USER["preferences"])
+        for task_data in INITIAL_TASKS:
+            self.create_task(user_id, **task_data)
+        logger.info("Seeded sharded store with 1 user and %d tasks", len(INITIAL_TASKS))
+
+    # Routing
+
+    def _shard_id_for_user(self, user_id: int) -> int:
+        with self._routes_lock:
+            shard_id = self._user_routes.get(user_id)
+        if shard_id is not None:
+            return shard_id
+
+        conn = self._connect()
+        row = conn.execute("SELECT shard_id FROM user_shards WHERE user_id = ?",
+                           (user_id,)).fetchone()
+        conn.close()
+        if row is None or row[0] is None:
+            return self._assign_shard(user_id)
+        with self._routes_lock:
+            self._user_routes[user_id] = row[0]
+        return row[0]
+
+    def _assign_shard(self, user_id: int) -> int:
+        """Hash placement of a user that has no directory entry yet"""
+        shard_ids = sorted(self.shards)
+        return shard_ids[shard_for_user(user_id, len(shard_ids))]
+
+    def shard_for_user(self, user_id: int) -> DatabaseManager:
+        return self.shards[self._shard_id_for_user(user_id)]
+
+    def _shard_id_for_task(self, task_id: int) -> Optional[int]:
+        with self._routes_lock:
+            shard_id = self._task_routes.get(task_id)
+        if shard_id is not None:
+            return shard_id
+
+        conn = self._connect()
+        row = conn.execute("SELECT shard_id FROM task_shards WHERE task_id = ?",
+                           (task_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        with self._routes_lock:
+            self._task_routes[task_id] = row[0]
+        return row[0]
+
+    def shard_for_task(self, task_id: int) -> DatabaseManager:
+        shard_id = self._shard_id_for_task(task_id)
+        # Unknown tasks have no data anywhere; any shard answers with defaults
+        return self.shards[shard_id if shard_id is not None else 0]
+
+    def _remember_notification(self, notification_id: int, shard_id: int) -> None:
+        with self._routes_lock:
+            self._notification_routes[notification_id] = shard_id
+            self._notification_routes.move_to_end(notification_id)
+            if len(self._notification_routes) > NOTIFICATION_ROUTE_CACHE_SIZE:
+                self._notification_routes.popitem(last=False)
+
+    def _invalidate_routes(self) -> None:
+        with self._routes_lock:
+            self._user_routes.clear()
+            self._task_routes.clear()
+            self._notification_routes.clear()
+
+    # DatabaseManager interface
+
+    def create_user(self, username: str, email: str, preferences: Dict = None) -> int:
+        """Allocate a global user ID, assign it to a shard and create the user there"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO user_shards (shard_id) VALUES (NULL)")
+        user_id = cursor.lastrowid
+        shard_id = self._assign_shard(user_id)
+        cursor.execute("UPDATE user_shards SET shard_id = ? WHERE user_id = ?",
+                       (shard_id, user_id))
+        conn.commit()
+        conn.close()
+
+        self.shards[shard_id].create_user(username, email, preferences, user_id=user_id)
+        return user_id
+
+    def create_task(self, user_id: int, title: str, category: str, importance: int,
+                    notes: str = "", task_type: str = "simple") -> int:
+        """Allocate a global task ID on the user's shard and create the task there"""
+        shard_id = self._shard_id_for_user(user_id)
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO task_shards (shard_id) VALUES (?)", (shard_id,))
+        task_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+
+        self.shards[shard_id].create_task(user_id, title, category, importance, notes,
+                                          task_type, task_id=task_id)
+        with self._routes_lock:
+            self._task_routes[task_id] = shard_id
+        return task_id
+
+    def get_user_tasks(self, user_id: int) -> List[Task]:
+        return self.shard_for_user(user_id).get_user_tasks(user_id)
+
+    def save_notification(self, notification: GeneratedNotification) -> Optional[int]:
+        shard_id = self._shard_id_for_task(notification.task_id)
+        if shard_id is None:
+            shard_id = 0
+        self._remember_notification(notification.notification_id, shard_id)
+        return self.shards[shard_id].save_notification(notification)
+
+    def save_response(self, response: NotificationResponse) -> Optional[int]:
+        if not response.task_id:
+            response.task_id = self.get_task_id_for_notification(response.notification_id)
+        return self.shard_for_task(response.task_id).save_response(response)
+
+    def update_task_engagement(self, task_id: int, user_action: str) -> None:
+        self.shard_for_task(task_id).update_task_engagement(task_id, user_action)
+
+    def get_task_engagement(self, task_id: int) -> Dict:
+        return self.shard_for_task(task_id).get_task_engagement(task_id)
+
+    def get_bandit_arms(self, task_ids: List[int], context_key: str) -> Dict[int, Dict]:
+        by_shard: Dict[int, List[int]] = {}
+        for task_id in task_ids:
+            shard_id = self._shard_id_for_task(task_id)
+            by_shard.setdefault(shard_id if shard_id is not None else 0, []).append(task_id)
+        arms = {}
+        for shard_id, shard_task_ids in by_shard.items():
+            arms.update(self.shards[shard_id].get_bandit_arms(shard_task_ids, context_key))
+        return arms
+
+    def get_task_performance(self, task_id: int) -> Dict:
+        return self.shard_for_task(task_id).get_task_performance(task_id)
+
+    def get_cooldown_remaining(self, task_id: int) -> float:
+        return self.shard_for_task(task_id).get_cooldown_remaining(task_id)
+
+    def resolve_legacy_notification_id(self, text_id: str) -> Optional[int]:
+        """Integer a pre-migration text notification ID was converted to, from
+        whichever shard converted it"""
+        for shard in self.shards.values():
+            notification_id = shard.resolve_legacy_notification_id(text_id)
+            if notification_id is not None:
+                return notification_id
+        return None
+
+    def get_task_id_for_notification(self, notification_id: int) -> int:
+        """Resolve a notification's task, asking every shard if it is not cached"""
+        with self._routes_lock:
+            shard_id = self._notification_routes.get(notification_id)
+        if shard_id is not None:
+            task_id = self.shards[shard_id].get_task_id_for_notification(notification_id)
+            if task_id:
+                return task_id
+
+        for shard_id, shard in self.shards.items():
+            task_id = shard.get_task_id_for_notification(notification_id)
+            if task_id:
+                self._remember_notification(notification_id, shard_id)
+                return task_id
+        return 0
+
+    def get_system_stats(self, user_id: int = None, window: str = None) -> Dict:
+        """Per-user stats from the owning shard, or all users aggregated across shards"""
+        if user_id is not None:
+            return self.shard_for_user(user_id).get_system_stats(user_id, window)
+
+        merged = {
+            'window': window,
+            'active_tasks': 0,
+            'total_notifications': 0,
+            'total_responses': 0,
+            'category_performance': {},
+        }
+        positives: Dict[str, float] = {}
+        for shard in self.shards.values():
+            stats = shard.get_system_stats(None, window)
+            merged['active_tasks'] += stats['active_tasks']
+            merged['total_notifications'] += stats['total_notifications']
+            merged['total_responses'] += stats['total_responses']
+            for category, perf in stats['category_performance'].items():
+                entry = merged['category_performance'].setdefault(
+                    category, {'total_responses': 0, 'success_rate': 0})
+                entry['total_responses'] += perf['total_responses']
+                positives[category] = (positives.get(category, 0)
+                                       + perf['success_rate'] * perf['total_responses'])
+
+        for category, entry in merged['category_performance'].items():
+            total = entry['total_responses']
+            entry['success_rate'] = (positives[category] / total) if total > 0 else 0
+        merged['category_performance'] = dict(sorted(merged['category_performance'].items()))
+        merged['response_rate'] = (merged['total_responses'] / merged['total_notifications']
+                                   if merged['total_notifications'] > 0 else 0)
+        return merged
+
+    def backfill_rollups(self) -> None:
+        for shard in self.shards.values():
+            shard.backfill_rollups()
+
+    def flush(self, timeout: float = None) -> bool:
+        return all([shard.flush(timeout) for shard in self.shards.values()])
+
+    def checkpoint(self) -> bool:
+        return any([shard.checkpoint() for shard in self.shards.values()])
+
+    def export_state(self) -> Dict:
+        """Shard layout, route caches and each shard's state, for a warm start"""
+        with self._routes_lock:
+            user_routes, task_routes = dict(self._user_routes), dict(self._task_routes)
+        return {
+            'shard_paths': {shard_id: shard.db_path for shard_id, shard in self.shards.items()},
+            'shards': {shard_id: shard.export_state() for shard_id, shard in self.shards.items()},
+            'user_routes': user_routes,
+            'task_routes': task_routes,
+        }
+
+    def close(self) -> None:
+        for shard in self.shards.values():
+            shard.close()
+
+    # Rebalancing
+
+    def split_shard(self, shard_id: int) -> int:
+        """Move about half of a shard's users into a new shard; returns the new shard ID.
+
+        Run while no other process writes to the store.
+        """
+        if shard_id not in self.shards:
+            raise ValueError(f"Unknown shard {shard_id}")
+        if self.in_memory:
+            # Users are copied and deleted in the shard files directly
+            raise RuntimeError("Split shards opened on disk, not in memory")
+        self.flush()
+
+        new_shard_id = max(self.shards) + 1
+        new_path = self._default_shard_path(new_shard_id)
+        new_shard = DatabaseManager(new_path, durability=self.durability, seed=False)
+
+        conn = self._connect()
+        user_ids = [row[0] for row in conn.execute(
+            "SELECT user_id FROM user_shards WHERE shard_id = ?", (shard_id,))]
+        conn.close()
+        # Every other user moves, so the split is even regardless of placement history
+        moving = sorted(user_ids)[1::2]
+
+        source = self.shards[shard_id]
+        task_ids = []
+        if moving:
+            self._copy_users(source.db_path, new_path, moving)
+            new_shard.rebuild_engagement()
+            task_ids = self._task_ids_for_users(new_path, moving)
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO shards (shard_id, path) VALUES (?, ?)",
+                       (new_shard_id, new_path))
+        for user_id in moving:
+            cursor.execute("UPDATE user_shards SET shard_id = ? WHERE user_id = ?",
+                           (new_shard_id, user_id))
+        if moving:
+            cursor.executemany("UPDATE task_shards SET shard_id = ? WHERE task_id = ?",
+                               [(new_shard_id, task_id) for task_id in task_ids])
+        conn.commit()
+        conn.close()
+
+        if moving:
+            self._delete_users(source.db_path, moving)
+            # The source's projections still hold the moved tasks
+            source.rebuild_engagement()
+            # Archived history follows its tasks into the new shard's segments
+            NotificationArchive(source.db_path).move_tasks(new_path, task_ids)
+
+        self.shards[new_shard_id] = new_shard
+        self._invalidate_routes()
+        logger.info("Split shard %d: moved %d of %d users to shard %d",
+                    shard_id, len(moving), len(user_ids), new_shard_id)
+        return new_shard_id
+
+    @staticmethod
+    def _task_ids_for_users(db_path: str, user_ids: List[int]) -> List[int]:
+        conn = sqlite3.connect(db_path, timeout=DB_BUSY_TIMEOUT)
+        placeholders = ", ".join("?" * len(user_ids))
+        rows = conn.execute(f"SELECT id FROM tasks WHERE user_id IN ({placeholders})",
+                            user_ids).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _copy_users(source_path: str, target_path: str, user_ids: List[int]) -> None:
+        """Copy every row belonging to the users from the source shard into the target"""
+        conn = sqlite3.connect(source_path, timeout=DB_BUSY_TIMEOUT)
+        cursor = conn.cursor()
+        cursor.execute("ATTACH DATABASE ? AS target", (target_path,))
+        cursor.execute("CREATE TEMP TABLE moving_users (user_id INTEGER PRIMARY KEY)")
+        cursor.executemany("INSERT INTO moving_users VALUES (?)", [(u,) for u in user_ids])
+        try:
+            moving_tasks = ("SELECT id FROM main.tasks "
+                            "WHERE user_id IN (SELECT user_id FROM moving_users)")
+            tables = ([(table, key, keeps_id, "SELECT user_id FROM moving_users")
+                       for table, key, keeps_id in USER_TABLES]
+                      + [(table, key, keeps_id, moving_tasks)
+                         for table, key, keeps_id in TASK_TABLES])
+            for table, key, keeps_id, owners in tables:
+                columns = [row[1] for row in cursor.execute(f"PRAGMA main.table_info({table})")]
+                if not keeps_id:
+                    columns = [column for column in columns if column != 'id']
+                column_list = ", ".join(columns)
+                condition = f"{key} IN ({owners})"
+                cursor.execute(f'''
+                    INSERT INTO target.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table} WHERE {condition}
+                ''')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _delete_users(db_path: str, user_ids: List[int]) -> None:
+        """Remove moved users' rows from their old shard"""
+        conn = sqlite3.connect(db_path, timeout=DB_BUSY_TIMEOUT)
+        cursor = conn.cursor()
+        placeholders = ", ".join("?" * len(user_ids))
+        task_filter = f"SELECT id FROM tasks WHERE user_id IN ({placeholders})"
+        # Task-keyed rows first, while the tasks still identify them
+        for table, key, _ in TASK_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({task_filter})", user_ids)
+        for table, key, _ in reversed(USER_TABLES):
+            cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({placeholders})", user_ids)
+        conn.commit()
+        conn.close()
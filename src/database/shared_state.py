@@ -0,0 +1,324 @@
+"""Engagement state shared between worker processes (ENGAGEMENT_SHARED)
+
+A fixed-layout ``multiprocessing.shared_memory`` segment holds one slot per
+task id: engagement score, consecutive dismissals, cooldown deadline,
+response counters and the bandit posterior counts of every selection
+context. Selection reads a slot without locks or database queries; writers
+update it after committing to SQLite.
+
+Each slot starts with a sequence counter (a seqlock). A writer makes it odd,
+rewrites the slot and makes it even again; a reader retries until it sees the
+same even value before and after copying the fields. Writers in all
+processes serialize on an flock on ``<db>.engagement.lock``. A writer that
+died mid-write leaves its slot odd: readers give up after MAX_READ_RETRIES
+and the caller falls back to the database, and the next writer (holding the
+lock, so no write can be in progress) rounds the sequence up to even first.
+
+The segment lives as long as some process has it open, tracked by shared
+flocks on ``<db>.engagement.users``. The first process to open it, finding
+no other users, (re)creates it from the database; the last one to close it
+removes it. Locks die with their process, so a segment left behind by a
+crash is rebuilt instead of trusted.
+"""
+import logging
+import os
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Iterable, Optional, Tuple
+
+from src.config import ENGAGEMENT_SHARED_CAPACITY
+from src.instrumentation.metrics import METRICS
+from src.models.engagement import EngagementState
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('<8sQQ')  # magic, capacity, contexts
+HEADER_SIZE = 64
+MAGIC = b'SBENG001'
+
+SEQ = struct.Struct('<Q')
+# flags, engagement score, consecutive dismissals, cooldown deadline (epoch
+# seconds, 0 = none), responses, positive responses, dismissals
+CORE = struct.Struct('<qdqdqqq')
+CORE_OFFSET = SEQ.size
+ARM = struct.Struct('<qq')  # successes, failures
+ARMS_OFFSET = CORE_OFFSET + CORE.size
+
+HAS_ENGAGEMENT = 1
+
+# Attempts of a reader to find a slot not being written before it gives up
+MAX_READ_RETRIES = 1000
+
+# What the loader returns: engagement states, (task_id, total, positive,
+# negative) counters and (task_id, context_key, successes, failures) arms
+SharedRows = Tuple[Iterable[Tuple[int, EngagementState]],
+                   Iterable[Tuple[int, int, int, int]],
+                   Iterable[Tuple[int, str, int, int]]]
+
+
+class SharedEngagementStore:
+    """Per-task engagement slots in shared memory, read lock-free"""
+
+    def __init__(self, db_path: str, load: Callable[[], SharedRows], capacity: int = None):
+        """
+        Args:
+            db_path: Database the segment mirrors; names the segment and lock files
+            load: Reads the mirrored state from the database
+            capacity: Number of task id slots (ids 0 to capacity - 1)
+        """
+        if fcntl is None:
+            raise RuntimeError("Shared engagement state needs POSIX file locks")
+        # Late import: src.core imports the database package
+        from src.core.selection import CONTEXT_KEYS
+
+        self.capacity = capacity or ENGAGEMENT_SHARED_CAPACITY
+        self._load = load
+        self._contexts = {key: index for index, key in enumerate(CONTEXT_KEYS)}
+        self._slot_size = ARMS_OFFSET + ARM.size * len(CONTEXT_KEYS)
+        self._size = HEADER_SIZE + self.capacity * self._slot_size
+
+        path = os.path.abspath(db_path)
+        self.name = f"sb_engagement_{zlib.crc32(path.encode()):08x}"
+        self._lock_path = f"{path}.engagement.lock"
+        self._users_path = f"{path}.engagement.users"
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._buf = None
+        self._users_fd: Optional[int] = None
+        self._open()
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive across processes and threads (each call opens its own
+        file description, so flock also excludes other threads)"""
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _open(self) -> None:
+        with self._locked():
+            users_fd = os.open(self._users_path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(users_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                first = True
+            except OSError:
+                first = False
+
+            if first:
+                self._attach(create=True)
+                HEADER.pack_into(self._buf, 0, MAGIC, self.capacity, len(self._contexts))
+                self._fill()
+                logger.info("Created shared engagement segment %s (%d slots)",
+                            self.name, self.capacity)
+            else:
+                self._attach(create=False)
+                magic, capacity, contexts = HEADER.unpack_from(self._buf, 0)
+                if (magic, capacity, contexts) != (MAGIC, self.capacity, len(self._contexts)):
+                    self._buf.release()
+                    self._shm.close()
+                    self._buf = self._shm = None
+                    os.close(users_fd)
+                    raise RuntimeError(f"Shared engagement segment {self.name} has a different "
+                                       "layout; all processes need the same "
+                                       "ENGAGEMENT_SHARED_CAPACITY")
+            fcntl.flock(users_fd, fcntl.LOCK_SH)
+            self._users_fd = users_fd
+
+    def _attach(self, create: bool) -> None:
+        if create:
+            try:
+                shm = shared_memory.SharedMemory(self.name, create=True, size=self._size)
+            except FileExistsError:
+                # Left behind by processes that exited without closing it
+                stale = shared_memory.SharedMemory(self.name)
+                stale.unlink()
+                stale.close()
+                shm = shared_memory.SharedMemory(self.name, create=True, size=self._size)
+        else:
+            shm = shared_memory.SharedMemory(self.name)
+        # Outlive this process: the users lock, not the resource tracker, decides
+        # when the segment goes away
+        resource_tracker.unregister(shm._name, "shared_memory")
+        self._shm = shm
+        self._buf = shm.buf
+
+    def close(self) -> None:
+        """Detach, removing the segment if no other process uses it"""
+        if self._shm is None:
+            return
+        with self._locked():
+            if self._users_fd is not None:
+                os.close(self._users_fd)
+                self._users_fd = None
+            fd = os.open(self._users_path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                last = True
+            except OSError:
+                last = False
+            finally:
+                os.close(fd)
+            self._buf.release()
+            self._buf = None
+            if last:
+                resource_tracker.register(self._shm._name, "shared_memory")
+                self._shm.unlink()
+            self._shm.close()
+            self._shm = None
+
+    def reload(self) -> None:
+        """Reread everything from the database (after a backfill or rebuild)"""
+        with self._locked():
+            self._fill()
+
+    def _fill(self) -> None:
+        """Clear every slot and load the database state; the lock must be held"""
+        engagement, counts, arms = self._load()
+        with METRICS.span("engagement.shared.load"):
+            zero = bytes(self._slot_size - SEQ.size)
+            for task_id in range(self.capacity):
+                with self._writing(task_id) as base:
+                    self._buf[base + CORE_OFFSET:base + self._slot_size] = zero
+            for task_id, state in engagement:
+                if self.covers(task_id):
+                    self._write_engagement(task_id, state)
+            for task_id, total, positive, negative in counts:
+                if self.covers(task_id):
+                    self._add_counts(task_id, total, positive, negative)
+            for task_id, context_key, successes, failures in arms:
+                if self.covers(task_id) and context_key in self._contexts:
+                    self._add_arm(task_id, self._contexts[context_key], successes, failures)
+
+    def covers(self, task_id: int) -> bool:
+        return 0 <= task_id < self.capacity
+
+    # Readers
+
+    def _read(self, task_id: int, layout: struct.Struct, offset: int) -> Optional[tuple]:
+        """Consistent copy of a slot's fields, or None if it stayed mid-write"""
+        buf = self._buf
+        base = HEADER_SIZE + task_id * self._slot_size
+        for _ in range(MAX_READ_RETRIES):
+            seq = SEQ.unpack_from(buf, base)[0]
+            if not seq & 1:
+                values = layout.unpack_from(buf, base + offset)
+                if SEQ.unpack_from(buf, base)[0] == seq:
+                    return values
+            METRICS.increment("engagement.shared.read_retries")
+            time.sleep(0)
+        METRICS.increment("engagement.shared.read_fallbacks")
+        return None
+
+    def engagement(self, task_id: int) -> Optional[EngagementState]:
+        """Current engagement of a task (defaults when it has none); None if
+        the slot cannot be read, and the database must be asked instead"""
+        values = self._read(task_id, CORE, CORE_OFFSET)
+        if values is None:
+            return None
+        flags, score, dismissals, cooldown, *_ = values
+        if not flags & HAS_ENGAGEMENT:
+            return EngagementState()
+        return EngagementState(
+            consecutive_dismissals=dismissals,
+            engagement_score=score,
+            cooldown_until=datetime.fromtimestamp(cooldown) if cooldown else None,
+        )
+
+    def counts(self, task_id: int) -> Optional[Tuple[int, int, int]]:
+        """Responses, positive responses and dismissals of a task (None if
+        the slot cannot be read)"""
+        values = self._read(task_id, CORE, CORE_OFFSET)
+        return values[4:] if values is not None else None
+
+    def arm(self, task_id: int, context_key: str) -> Optional[Tuple[int, int, float]]:
+        """Posterior successes and failures in a context, and the cooldown
+        deadline (epoch seconds, 0 = none); None if the slot cannot be read"""
+        index = self._contexts.get(context_key)
+        if index is None:
+            values = self._read(task_id, CORE, CORE_OFFSET)
+            return (0, 0, values[3]) if values is not None else None
+        buf = self._buf
+        base = HEADER_SIZE + task_id * self._slot_size
+        for _ in range(MAX_READ_RETRIES):
+            seq = SEQ.unpack_from(buf, base)[0]
+            if not seq & 1:
+                cooldown = CORE.unpack_from(buf, base + CORE_OFFSET)[3]
+                successes, failures = ARM.unpack_from(buf, base + ARMS_OFFSET + index * ARM.size)
+                if SEQ.unpack_from(buf, base)[0] == seq:
+                    return successes, failures, cooldown
+            METRICS.increment("engagement.shared.read_retries")
+            time.sleep(0)
+        METRICS.increment("engagement.shared.read_fallbacks")
+        return None
+
+    # Writers
+
+    def update_engagement(self, task_id: int,
+                          compute: Callable[[], EngagementState]) -> EngagementState:
+        """Run ``compute`` (which persists the new state) under the writer lock
+        and mirror its result, so processes publish states in commit order"""
+        with self._locked():
+            state = compute()
+            self._write_engagement(task_id, state)
+        return state
+
+    def add_response(self, task_id: int, context_key: Optional[str],
+                     positive: int, negative: int) -> None:
+        """Count a saved response and credit the context it was selected in"""
+        with self._locked():
+            self._add_counts(task_id, 1, positive, negative)
+            if context_key in self._contexts:
+                self._add_arm(task_id, self._contexts[context_key], positive, 1 - positive)
+
+    @contextmanager
+    def _writing(self, task_id: int):
+        """Make the slot's sequence odd while it is rewritten; yields its offset.
+        The writer lock must be held."""
+        base = HEADER_SIZE + task_id * self._slot_size
+        seq = SEQ.unpack_from(self._buf, base)[0]
+        if seq & 1:
+            # Left odd by a writer that died mid-write; with the lock held no
+            # write is in progress, so restore the parity before writing
+            METRICS.increment("engagement.shared.repaired")
+            logger.warning("Repairing shared engagement slot %d left mid-write", task_id)
+            seq += 1
+        SEQ.pack_into(self._buf, base, seq + 1)
+        try:
+            yield base
+        finally:
+            SEQ.pack_into(self._buf, base, seq + 2)
+
+    def _write_engagement(self, task_id: int, state: EngagementState) -> None:
+        with self._writing(task_id) as base:
+            flags, _, _, _, total, positive, negative = CORE.unpack_from(self._buf,
+                                                                         base + CORE_OFFSET)
+            cooldown = state.cooldown_until.timestamp() if state.cooldown_until else 0.0
+            CORE.pack_into(self._buf, base + CORE_OFFSET, flags | HAS_ENGAGEMENT,
+                           state.engagement_score, state.consecutive_dismissals, cooldown,
+                           total, positive, negative)
+
+    def _add_counts(self, task_id: int, total: int, positive: int, negative: int) -> None:
+        with self._writing(task_id) as base:
+            values = list(CORE.unpack_from(self._buf, base + CORE_OFFSET))
+            values[4] += total
+            values[5] += positive
+            values[6] += negative
+            CORE.pack_into(self._buf, base + CORE_OFFSET, *values)
+
+    def _add_arm(self, task_id: int, index: int, successes: int, failures: int) -> None:
+        with self._writing(task_id) as base:
+            offset = base + ARMS_OFFSET + index * ARM.size
+            current_successes, current_failures = ARM.unpack_from(self._buf, offset)
+            ARM.pack_into(self._buf, offset, current_successes + successes,
+                          current_failures + failures)
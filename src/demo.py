@@ -1,5 +1,6 @@
 """Demo of notification generation with LLM"""
 
+import logging
 import random
 import time
 from datetime import datetime
@@ -117,5 +118,6 @@ def test_notification_generation():
         print("-" * 50)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     demo_enhanced_system()
     test_notification_generation()
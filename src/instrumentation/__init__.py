@@ -0,0 +1,4 @@
+from .metrics import METRICS, MetricsRegistry, timed, instrumented
+from .profiling import capture_profile
+
+__all__ = ['METRICS', 'MetricsRegistry', 'timed', 'instrumented', 'capture_profile']
@@ -0,0 +1,231 @@
+"""In-process timing spans, histograms and counters
+
+Spans are recorded into fixed-bucket histograms keyed by name
+(``db.get_user_tasks``, ``llm.build_prompt``, ...). Recording is off unless
+METRICS_ENABLED is set in the environment or ``METRICS.enable()`` is called;
+when off, an instrumented call costs one attribute check.
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+from src.config import METRICS_ENABLED
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+METRIC_PREFIX = "scroll_breaker"
+
+
+class Histogram:
+    """Fixed-bucket histogram of observed values"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket containing it"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of named histograms, counters and gauges"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Drop all recorded values"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a value (seconds for spans) into the named histogram"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """Increase the named counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set the named gauge to its current value"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def span(self, name: str) -> "Span":
+        """Context manager timing the enclosed block"""
+        return Span(self, name)
+
+    def snapshot(self) -> Dict:
+        """Return a point-in-time copy of all metrics"""
+        with self._lock:
+            return {
+                'spans': {name: h.to_dict() for name, h in sorted(self._histograms.items())},
+                'counters': dict(sorted(self._counters.items())),
+                'gauges': dict(sorted(self._gauges.items())),
+            }
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+            if histograms:
+                metric = f"{METRIC_PREFIX}_span_seconds"
+                lines.append(f"# HELP {metric} Time spent in instrumented spans")
+                lines.append(f"# TYPE {metric} histogram")
+                for name, histogram in histograms:
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{span="{name}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{span="{name}"}} {histogram.count}')
+
+            if counters:
+                metric = f"{METRIC_PREFIX}_events_total"
+                lines.append(f"# HELP {metric} Counted events")
+                lines.append(f"# TYPE {metric} counter")
+                for name, value in counters:
+                    lines.append(f'{metric}{{name="{name}"}} {value}')
+
+            if gauges:
+                metric = f"{METRIC_PREFIX}_gauge"
+                lines.append(f"# HELP {metric} Current values")
+                lines.append(f"# TYPE {metric} gauge")
+                for name, value in gauges:
+                    lines.append(f'{metric}{{name="{name}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Dump metrics to a file; ``.json`` paths get JSON, anything else Prometheus text"""
+        content = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        with open(path, 'w') as f:
+            f.write(content)
+
+
+class Span:
+    """Times a block of code into a registry histogram"""
+
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry: MetricsRegistry, name: str):
+        self.registry = registry
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        if self.registry.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.registry.enabled and self.start:
+            self.registry.observe(self.name, time.perf_counter() - self.start)
+            if exc_type is not None:
+                self.registry.increment(f"{self.name}.errors")
+        return False
+
+
+METRICS = MetricsRegistry(enabled=METRICS_ENABLED)
+
+
+def timed(name: str, registry: MetricsRegistry = METRICS):
+    """Decorator recording each call of the wrapped function as a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                registry.increment(f"{name}.errors")
+                raise
+            finally:
+                registry.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def instrumented(prefix: str, registry: MetricsRegistry = METRICS):
+    """Class decorator timing every method defined on the class as ``prefix.method``"""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith('__') or not inspect.isfunction(value):
+                continue
+            setattr(cls, attr, timed(f"{prefix}.{attr.lstrip('_')}", registry)(value))
+        return cls
+    return decorator
@@ -0,0 +1,52 @@
+"""Opt-in cProfile and tracemalloc capture"""
+import cProfile
+import io
+import logging
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+
+@contextmanager
+def capture_profile(mode: str, output_path: str, top: int = 25):
+    """Profile the enclosed block and write a report to output_path.
+
+    ``cprofile`` writes raw pstats data (load with ``pstats.Stats``) plus a
+    ``.txt`` summary; ``tracemalloc`` writes the top allocation sites.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of {PROFILE_MODES}")
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output_path)
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(top)
+            with open(f"{output_path}.txt", 'w') as f:
+                f.write(summary.getvalue())
+            logger.info("Wrote cProfile stats to %s", output_path)
+    else:
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(10)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not already_tracing:
+                tracemalloc.stop()
+            with open(output_path, 'w') as f:
+                f.write(f"current={current} bytes peak={peak} bytes\n\n")
+                for stat in snapshot.statistics('lineno')[:top]:
+                    f.write(f"{stat}\n")
+            logger.info("Wrote tracemalloc report to %s", output_path)
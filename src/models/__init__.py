@@ -1,3 +1,3 @@
-from src.models.models import User, Task, GeneratedNotification, NotificationResponse
+from src.models.models import User, Task, GeneratedNotification, NotificationResponse, task_from_row
 
-__all__ = ['User', 'Task', 'GeneratedNotification', 'NotificationResponse']
+__all__ = ['User', 'Task', 'GeneratedNotification', 'NotificationResponse', 'task_from_row']
@@ -0,0 +1,47 @@
+"""Task engagement state and how a user response changes it
+
+Shared by DatabaseManager, which persists the state in task_engagement,
+and the offline replay engine, which rebuilds it from history.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+@dataclass(slots=True)
+class EngagementState:
+    consecutive_dismissals: int = 0
+    engagement_score: float = 1.0
+    last_success: Optional[datetime] = None
+    cooldown_until: Optional[datetime] = None
+
+    def is_cooling_down(self, now: datetime) -> bool:
+        return self.cooldown_until is not None and self.cooldown_until > now
+
+    def cooldown_remaining(self, now: datetime) -> float:
+        """Remaining cooldown in minutes"""
+        if self.cooldown_until is None:
+            return 0
+        return max(0, (self.cooldown_until - now).total_seconds() / 60)
+
+
+def apply_response(state: EngagementState, user_action: str, now: datetime) -> EngagementState:
+    """Engagement after a user responds to a notification at ``now``"""
+    if user_action == 'dismissed':
+        consecutive_dismissals = state.consecutive_dismissals + 1
+        engagement_score = state.engagement_score * 0.8  # Reduce score by 20%
+
+        # Set cooldown period based on consecutive dismissals
+        cooldown_minutes = min(30 * consecutive_dismissals, 240)  # Max 4 hours
+        cooldown_until = now + timedelta(minutes=cooldown_minutes)
+    else:
+        consecutive_dismissals = 0
+        engagement_score = min(state.engagement_score * 1.2, 1.0)  # Increase score up to max 1.0
+        cooldown_until = None
+
+    return EngagementState(
+        consecutive_dismissals=consecutive_dismissals,
+        engagement_score=engagement_score,
+        last_success=now if user_action in ['acted', 'expanded'] else None,
+        cooldown_until=cooldown_until,
+    )
@@ -0,0 +1,201 @@
+"""Compact, collision-free notification IDs
+
+IDs are 63-bit integers laid out Snowflake-style, so they sort by creation
+time and are stored as SQLite INTEGER keys:
+
+    41 bits  milliseconds since ID_EPOCH (good until 2089)
+    10 bits  worker id, unique among the processes generating IDs
+    12 bits  sequence within the millisecond (4096 IDs/ms per worker)
+
+Clients see the textual form, 13 characters of Crockford base32 that sort
+like the integers. Worker ids are leased per process from lock files, so
+processes on one host never share one; forked children lease their own.
+Without advisory file locks (Windows) ID_WORKER_ID must be set instead; a
+fixed id belongs to the process it was configured for, so a child forked
+from that process cannot generate IDs.
+Worker id 1023 is reserved for IDs converted from the text IDs issued
+before this scheme, which keep the millisecond they embed.
+"""
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from src.config import ID_WORKER_ID, ID_LEASE_DIR
+
+ID_EPOCH_MS = int(datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+TIMESTAMP_BITS = 41
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+LEGACY_WORKER_ID = (1 << WORKER_BITS) - 1
+
+LEGACY_PREFIX = 'notif_'
+TEXT_LENGTH = 13
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+_DECODE.update({char.lower(): value for char, value in list(_DECODE.items())})
+_DECODE.update({'O': 0, 'o': 0, 'I': 1, 'i': 1, 'L': 1, 'l': 1})
+
+
+def compose_id(ms: int, worker_id: int, sequence: int) -> int:
+    """Integer ID from its parts; ``ms`` counts from ID_EPOCH_MS"""
+    return (ms << (WORKER_BITS + SEQUENCE_BITS)) | (worker_id << SEQUENCE_BITS) | sequence
+
+
+def id_timestamp(notification_id: int) -> datetime:
+    """Creation time embedded in an ID"""
+    ms = (notification_id >> (WORKER_BITS + SEQUENCE_BITS)) + ID_EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+def format_notification_id(notification_id: int) -> str:
+    """Textual form of an ID as shown to clients"""
+    chars = []
+    for _ in range(TEXT_LENGTH):
+        notification_id, digit = divmod(notification_id, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def parse_notification_id(text: str,
+                          resolve_legacy: Callable[[str], Optional[int]] = None) -> int:
+    """Integer ID from its textual form, or from a pre-migration text ID.
+
+    A text ID is looked up with ``resolve_legacy`` (the mapping the database
+    migration recorded, which may have probed past a collision) when given,
+    and computed with legacy_notification_id when it is not or finds nothing.
+    Raises ValueError for anything else.
+    """
+    if text.startswith(LEGACY_PREFIX):
+        mapped = resolve_legacy(text) if resolve_legacy is not None else None
+        return mapped if mapped is not None else legacy_notification_id(text)
+    if len(text) != TEXT_LENGTH:
+        raise ValueError(f"Invalid notification ID: {text!r}")
+    value = 0
+    try:
+        for char in text:
+            value = value * 32 + _DECODE[char]
+    except KeyError:
+        raise ValueError(f"Invalid notification ID: {text!r}") from None
+    if value >> 63:
+        raise ValueError(f"Invalid notification ID: {text!r}")
+    return value
+
+
+def legacy_notification_id(text: str) -> int:
+    """Integer ID for a pre-migration ``notif_<task>_<time>[_<random>]`` text ID.
+
+    Deterministic, so the same text maps to the same integer in every table,
+    archive segment and shard. The database migration resolves the rare
+    collisions within one database by probing the following sequence numbers
+    and records every conversion in legacy_notification_ids.
+    """
+    parts = text.split('_')
+    ms = 0
+    if len(parts) >= 3 and parts[2].isdigit():
+        stamp = int(parts[2])
+        # Older simple notifications used seconds, later ones milliseconds
+        ms = stamp if stamp >= 10 ** 11 else stamp * 1000
+    ms = min(max(ms - ID_EPOCH_MS, 0), (1 << TIMESTAMP_BITS) - 1)
+    return compose_id(ms, LEGACY_WORKER_ID, zlib.crc32(text.encode()) & MAX_SEQUENCE)
+
+
+class NotificationIdGenerator:
+    """Thread-safe, monotonic ID source for one worker id"""
+
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id < LEGACY_WORKER_ID:
+            raise ValueError(f"Worker id must be in [0, {LEGACY_WORKER_ID}), got {worker_id}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            # Never step back, even if the wall clock does
+            ms = max(time.time_ns() // 1_000_000 - ID_EPOCH_MS, self._last_ms)
+            if ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Millisecond exhausted: borrow the next one instead of sleeping
+                    ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = ms
+            return compose_id(ms, self.worker_id, self._sequence)
+
+
+_generator: Optional[NotificationIdGenerator] = None
+_generator_lock = threading.Lock()
+_lease_fd: Optional[int] = None
+# Set in forked children, which must not use the parent's ID_WORKER_ID
+_forked = False
+
+
+def _lease_worker_id() -> int:
+    """Worker id held by this process until it exits"""
+    global _lease_fd
+    if ID_WORKER_ID is not None:
+        if _forked:
+            raise RuntimeError(f"ID_WORKER_ID {ID_WORKER_ID} belongs to the parent of this "
+                               "forked process; start workers with their own ID_WORKER_ID "
+                               "or unset it to lease worker ids")
+        return ID_WORKER_ID
+    try:
+        import fcntl
+    except ImportError:
+        # Without advisory locks nothing keeps two processes off one worker id
+        raise RuntimeError("Notification ID worker ids cannot be leased without fcntl; "
+                           "set a distinct ID_WORKER_ID per process") from None
+
+    os.makedirs(ID_LEASE_DIR, exist_ok=True)
+    start = os.getpid() % LEGACY_WORKER_ID
+    for offset in range(LEGACY_WORKER_ID):
+        worker_id = (start + offset) % LEGACY_WORKER_ID
+        fd = os.open(os.path.join(ID_LEASE_DIR, f"worker-{worker_id}.lock"),
+                     os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        _lease_fd = fd
+        return worker_id
+    raise RuntimeError(f"All notification ID worker ids in {ID_LEASE_DIR} are leased; "
+                       "set ID_WORKER_ID")
+
+
+def _after_fork() -> None:
+    """Children must not reuse the parent's worker id"""
+    global _generator, _generator_lock, _lease_fd, _forked
+    _forked = True
+    if _lease_fd is not None:
+        os.close(_lease_fd)
+        _lease_fd = None
+    _generator = None
+    _generator_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def next_notification_id() -> int:
+    """New unique notification ID from this process's generator"""
+    generator = _generator
+    if generator is None:
+        generator = _process_generator()
+    return generator.next_id()
+
+
+def _process_generator() -> NotificationIdGenerator:
+    global _generator
+    with _generator_lock:
+        if _generator is None:
+            _generator = NotificationIdGenerator(_lease_worker_id())
+        return _generator
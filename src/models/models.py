@@ -2,7 +2,41 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Optional
 
-@dataclass
+
+class _LazyTimestamp:
+    """Wraps a slot so ISO timestamp strings from SQLite are parsed on first access"""
+    __slots__ = ('slot',)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj, owner)
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+            self.slot.__set__(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+    def __delete__(self, obj):
+        self.slot.__delete__(obj)
+
+
+def _lazy_timestamps(*names):
+    """Class decorator making the named slot fields accept raw timestamp strings"""
+    def wrap(cls):
+        for name in names:
+            setattr(cls, name, _LazyTimestamp(cls.__dict__[name]))
+        return cls
+    return wrap
+
+
+@_lazy_timestamps('created_at')
+@dataclass(slots=True)
 class User:
     id: int
     username: str
@@ -10,7 +44,8 @@ class User:
     created_at: datetime
     preferences: Dict
 
-@dataclass
+@_lazy_timestamps('created_at', 'updated_at')
+@dataclass(slots=True)
 class Task:
     id: Optional[int]
     user_id: int
@@ -22,11 +57,12 @@ class Task:
     created_at: datetime
     updated_at: datetime
     is_active: bool = True
-    
-@dataclass
+
+@_lazy_timestamps('timestamp')
+@dataclass(slots=True)
 class GeneratedNotification:
     id: Optional[int]
-    notification_id: str
+    notification_id: int  # see src.models.ids for the textual form
     task_id: int
     hook_message: str
     expanded_content: Optional[str]
@@ -36,14 +72,24 @@ class GeneratedNotification:
     timestamp: datetime
     llm_prompt_used: Optional[str] = None
     llm_response_raw: Optional[str] = None
+    context_key: Optional[str] = None  # selection context, see src.core.selection
+    context: Optional[Dict] = None  # context the task was selected in
+    selection_propensity: Optional[float] = None  # probability the policy chose this task
 
-@dataclass
+@_lazy_timestamps('timestamp')
+@dataclass(slots=True)
 class NotificationResponse:
     id: Optional[int]
-    notification_id: str
+    notification_id: int
     task_id: int
     user_action: str  # dismissed, clicked, expanded, acted
     response_time: float
     was_expanded: bool
     timestamp: datetime
     context: Dict
+
+
+def task_from_row(cursor, row: tuple) -> Task:
+    """Row factory for cursors selecting task columns in field order; timestamps stay
+    as strings until read"""
+    return Task(*row[:9], bool(row[9]))
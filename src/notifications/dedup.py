@@ -0,0 +1,182 @@
+"""Near-duplicate detection for generated notifications
+
+Each notification is reduced to a 64-bit SimHash over the words and word
+pairs of its hook message and next step; rewordings that keep most of the
+text land within a few bits of each other. Every task keeps the
+fingerprints of its last ``window`` served notifications.
+
+A fingerprint is split into ``max_distance + 1`` bands and each stored
+fingerprint is filed under every band value. Two fingerprints within
+``max_distance`` bits agree on at least one band, so a query only compares
+against the entries sharing a band with it, independent of the window size.
+"""
+import hashlib
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from src.config import DEDUP_WINDOW, DEDUP_MAX_DISTANCE
+from src.instrumentation.metrics import METRICS
+from src.models.models import GeneratedNotification
+
+FINGERPRINT_BITS = 64
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# Bit i of a feature hash becomes lane i of a wide integer, so summing the
+# spread hashes counts every bit position at once (lanes hold up to 65535)
+LANE_BITS = 16
+_BYTE_LANES = [[sum(1 << (LANE_BITS * (8 * position + i)) for i in range(8) if byte >> i & 1)
+                for byte in range(256)]
+               for position in range(FINGERPRINT_BITS // 8)]
+
+
+@lru_cache(maxsize=65536)
+def _spread_feature(feature: str) -> int:
+    digest = hashlib.blake2b(feature.encode(), digest_size=FINGERPRINT_BITS // 8).digest()
+    return sum(lanes[byte] for lanes, byte in zip(_BYTE_LANES, digest))
+
+
+@lru_cache(maxsize=4096)
+def simhash(text: str) -> int:
+    """64-bit SimHash of the words and word pairs of a text"""
+    words = WORD_PATTERN.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts = sum(map(_spread_feature, features))
+    half = len(features) // 2
+    lane = (1 << LANE_BITS) - 1
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if (counts >> (LANE_BITS * bit)) & lane > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def fingerprint(notification: GeneratedNotification) -> int:
+    """Fingerprint of the user-visible text of a notification"""
+    return simhash(f"{notification.hook_message}\n{notification.next_step or ''}")
+
+
+class _TaskWindow:
+    """Recent fingerprints of one task, filed by band"""
+    __slots__ = ('entries', 'buckets', 'seq')
+
+    def __init__(self):
+        self.entries: Deque[Tuple[int, int]] = deque()  # (seq, fingerprint), oldest first
+        self.buckets: Dict[Tuple[int, int], Dict[int, int]] = {}  # (band, value) -> {seq: fp}
+        self.seq = 0
+
+
+class NearDuplicateIndex:
+    """Per-task bounded index of recently served notification fingerprints"""
+
+    def __init__(self, window: int = None, max_distance: int = None):
+        """
+        Args:
+            window: Notifications remembered per task
+            max_distance: Largest Hamming distance treated as a near-duplicate
+        """
+        self.window = DEDUP_WINDOW if window is None else window
+        self.max_distance = DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+        if not 0 <= self.max_distance < FINGERPRINT_BITS:
+            raise ValueError(f"max_distance must be in [0, {FINGERPRINT_BITS})")
+        bands = self.max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands: List[Tuple[int, int]] = [
+            (band * width, (1 << (width if band < bands - 1
+                                  else FINGERPRINT_BITS - band * width)) - 1)
+            for band in range(bands)
+        ]
+        self._lock = threading.Lock()
+        self._tasks: Dict[int, _TaskWindow] = {}
+
+    def _keys(self, fp: int):
+        return [(band, (fp >> shift) & mask) for band, (shift, mask) in enumerate(self._bands)]
+
+    def last_seen(self, task_id: int, fp: int) -> Optional[int]:
+        """How many notifications ago the task was last served a near-duplicate
+        (0 = the latest one), None if not within the window"""
+        with self._lock:
+            return self._last_seen(task_id, fp)
+
+    def _last_seen(self, task_id: int, fp: int) -> Optional[int]:
+        window = self._tasks.get(task_id)
+        if window is None:
+            return None
+        latest = None
+        for key in self._keys(fp):
+            for seq, other in window.buckets.get(key, {}).items():
+                if (latest is None or seq > latest) and \
+                        (fp ^ other).bit_count() <= self.max_distance:
+                    latest = seq
+        return None if latest is None else window.seq - latest
+
+    def is_duplicate(self, task_id: int, fp: int) -> bool:
+        return self.last_seen(task_id, fp) is not None
+
+    def add(self, task_id: int, fp: int) -> None:
+        """Remember a served fingerprint, forgetting the oldest beyond the window"""
+        with self._lock:
+            self._add(task_id, fp)
+
+    def _add(self, task_id: int, fp: int) -> None:
+        window = self._tasks.get(task_id)
+        if window is None:
+            window = self._tasks[task_id] = _TaskWindow()
+        window.seq += 1
+        window.entries.append((window.seq, fp))
+        for key in self._keys(fp):
+            window.buckets.setdefault(key, {})[window.seq] = fp
+        while len(window.entries) > self.window:
+            seq, old = window.entries.popleft()
+            for key in self._keys(old):
+                bucket = window.buckets[key]
+                del bucket[seq]
+                if not bucket:
+                    del window.buckets[key]
+
+    def export_state(self) -> Dict[int, List[int]]:
+        """Remembered fingerprints per task, oldest first"""
+        with self._lock:
+            return {task_id: [fp for _, fp in window.entries]
+                    for task_id, window in self._tasks.items()}
+
+    def import_state(self, state: Dict[int, List[int]]) -> None:
+        """Remember the fingerprints of export_state again"""
+        for task_id, fingerprints in state.items():
+            for fp in fingerprints:
+                self.add(task_id, fp)
+
+    def choose(self, task_id: int,
+               candidates: Iterable[GeneratedNotification]) -> Optional[GeneratedNotification]:
+        """Serve the first candidate that is not a near-duplicate of the task's
+        recent notifications and remember it
+
+        Candidates are drawn lazily, so later (costlier) alternatives are only
+        produced when earlier ones are rejected. When every candidate is a
+        near-duplicate, the one whose duplicate was served longest ago wins.
+        A candidate is checked and remembered under one lock acquisition, so
+        concurrent requests for a task cannot both serve the same one; the lock
+        is not held while the next candidate is produced.
+        """
+        best, best_fp, best_age = None, None, -1
+        for position, candidate in enumerate(candidates):
+            fp = fingerprint(candidate)
+            with self._lock:
+                age = self._last_seen(task_id, fp)
+                if age is None:
+                    self._add(task_id, fp)
+            if age is None:
+                if position:
+                    METRICS.increment("dedup.alternative")
+                return candidate
+            METRICS.increment("dedup.rejected")
+            if age > best_age:
+                best, best_fp, best_age = candidate, fp, age
+        if best is None:
+            return None
+        METRICS.increment("dedup.exhausted")
+        self.add(task_id, best_fp)
+        return best
@@ -1,102 +1,114 @@
 """LLM-powered notification generator with fallback templates"""
+import logging
 import random
 import json
+import re
+import threading
 from datetime import datetime
-from typing import Dict, Optional
-import requests
-import google.generativeai as genai
+from typing import Callable, Dict, Iterator, List, Optional
 
+from src.instrumentation.metrics import METRICS, timed
+from src.models.ids import next_notification_id
 from src.models.models import Task, GeneratedNotification
+from src.notifications.providers import NotificationProvider, ProviderRateLimited, create_provider
 from src.notifications.templates import FALLBACK_TEMPLATES
-from src.config import (
-    GEMINI_API_KEY, OLLAMA_HOST, OLLAMA_MODEL,
-    ACTIVE_LLM, LLMProvider
+from src.config import ACTIVE_LLM, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+# Fixed part of every LLM prompt. It is sent as the system prompt and never
+# changes between requests, so providers taking it separately (Ollama) can
+# reuse its evaluated prefix; only the short per-task section is evaluated
+# for each request.
+SYSTEM_PROMPT = """You are a notification generator for a focus app. Generate a compelling notification to help break scrolling habits.
+
+INSTRUCTIONS:
+1. Generate a notification that's relevant to the user's progress level
+2. Connect the task to real-world applications or interesting facts
+3. Make it personally relevant and timely
+4. Use emojis sparingly
+
+RESPONSE FORMAT:
+Return ONLY a JSON object with these fields:
+{
+  "hook": "Brief attention-grabbing message (max 100 chars)",
+  "next_step": "Clear call-to-action (max 50 chars)",
+  "expanded_content": "Optional detailed motivation (max 300 chars)",
+  "confidence": 0.85
+}
+
+EXAMPLE RESPONSE:
+{
+  "hook": "Ready to level up your coding skills? 🚀",
+  "next_step": "Complete the next tutorial chapter",
+  "expanded_content": "Did you know programmers spend 50% of their time debugging? Master these skills now to save time later!",
+  "confidence": 0.85
+}"""
+
+# Progress keywords by level, checked in this order of precedence
+PROGRESS_KEYWORDS = {
+    'advanced': ['almost done', 'finishing', 'advanced', 'mastering'],
+    'intermediate': ['halfway', 'currently', 'working on', 'understanding'],
+    'beginner': ['just started', 'beginning', 'new to', 'learning basics'],
+}
+# One case-insensitive pass over the notes finds every keyword of every level
+PROGRESS_PATTERN = re.compile(
+    '|'.join(f"(?P<{level}>{'|'.join(map(re.escape, keywords))})"
+             for level, keywords in PROGRESS_KEYWORDS.items()),
+    re.IGNORECASE
 )
+PROGRESS_RANK = {level: rank for rank, level in enumerate(PROGRESS_KEYWORDS)}
+
+# Per-task prompt sections kept in memory, keyed on (task id, task version)
+PROMPT_CACHE_SIZE = 4096
 
 class LLMNotificationGenerator:
     """LLM-powered notification generator with fallback templates"""
     
-    def __init__(self, llm_provider: str = None, api_key: str = None):
-        """Initialize the notification generator"""
+    def __init__(self, llm_provider: str = None, api_key: str = None, warm_state: Dict = None,
+                 seed: Optional[int] = None):
+        """Initialize the notification generator; with ``warm_state`` from a
+        previous process, the prompt cache is restored and a provider that was
+        healthy is probed in the background instead of before serving.
+        Template choices come from ``rng``, seeded with ``seed``."""
         self.provider = llm_provider or ACTIVE_LLM
-        self.api_key = api_key or GEMINI_API_KEY
-        self.model = None
-        self.ollama_url = f"{OLLAMA_HOST}/api/generate"
+        self.rng = random.Random(seed)
+        # Called when the provider rejects a request for quota/rate reasons
+        self.on_rate_limit: Optional[Callable[[], None]] = None
+        # (task id, updated_at) -> static per-task prompt section, oldest first
+        self._prompt_cache: Dict[tuple, str] = {}
+        self._prompt_cache_lock = threading.Lock()
+        if warm_state is not None:
+            self._prompt_cache.update(warm_state['prompts'][-PROMPT_CACHE_SIZE:])
         
-        if self.provider == LLMProvider.GEMINI.value:
-            self._init_gemini()
-        elif self.provider == LLMProvider.LOCAL.value:
-            self._test_ollama_connection()
+        options = {'api_key': api_key} if api_key and self.provider == LLMProvider.GEMINI.value else {}
+        self.backend: Optional[NotificationProvider] = create_provider(self.provider, **options)
+        if self.backend is None:
+            logger.info("Using fallback templates only.")
+        elif (warm_state is not None and warm_state['provider'] == self.provider
+              and warm_state['healthy']):
+            threading.Thread(target=self._probe, name="llm-health-probe", daemon=True).start()
         else:
-            print("Using fallback templates only.")
+            self._probe()
         
         self.fallback_templates = FALLBACK_TEMPLATES
     
-    def _init_gemini(self):
-        """Initialize Gemini API"""
-        if not self.api_key:
-            print("No Gemini API key provided. Using fallback templates.")
-            return
-        
-        try:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
-            response = self.model.generate_content("Hello!")
-            print(f"Successfully initialized Gemini API")
-        except Exception as e:
-            print(f"Error initializing Gemini API: {e}")
-            self.model = None
-            print("Falling back to templates.")
+    def _probe(self) -> bool:
+        """Check the provider, falling back to templates if it cannot serve"""
+        if self.backend.health(SYSTEM_PROMPT):
+            return True
+        self.backend = None
+        logger.warning("Falling back to templates.")
+        return False
     
-    def _test_ollama_connection(self):
-        """Test connection to Ollama server"""
-        try:
-            # Test with a simple prompt
-            response = requests.post(
-                self.ollama_url,
-                json={
-                    "model": OLLAMA_MODEL,
-                    "prompt": "Hello!",
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,  # for consistent responses
-                        "num_predict": 50    # limit initial response length
-                    }
-                }
-            )
-            response.raise_for_status()
-            print(f"Successfully connected to Ollama server using model: {OLLAMA_MODEL}")
-            self.model = True
-        except requests.RequestException as e:
-            print(f"Error connecting to Ollama server: {e}")
-            print("Make sure Ollama is running and the model is pulled.")
-            self.model = None
-            print("Falling back to templates.")
+    def export_state(self) -> Dict:
+        """Provider health and the prompt cache, for a warm start"""
+        with self._prompt_cache_lock:
+            prompts = list(self._prompt_cache.items())
+        return {'provider': self.provider, 'healthy': self.backend is not None,
+                'prompts': prompts}
     
-    def _generate_with_ollama(self, prompt: str) -> str:
-        """Generate text using Ollama"""
-        try:
-            response = requests.post(
-                self.ollama_url,
-                json={
-                    "model": OLLAMA_MODEL,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,    # for more focused responses
-                        "top_p": 0.9,         # slightly increased for better creativity
-                        "top_k": 40,          # keep top 40 tokens
-                        "num_predict": 200,    # limit response length
-                        "stop": ["}"],        # stop at the end of JSON
-                        "repeat_penalty": 1.1  # reduce repetition
-                    }
-                }
-            )
-            response.raise_for_status()
-            return response.json()["response"]
-        except Exception as e:
-            print(f"Error generating with Ollama: {e}")
-            raise    
+    @timed("llm.generate_notification")
     def generate_notification(self, task: Task, context: Dict, 
                             user_performance: Dict = None) -> GeneratedNotification:
         """Generate contextual notification using LLM or fallback.
@@ -111,11 +123,11 @@ class LLMNotificationGenerator:
         """
         # Input validation and normalization
         if not isinstance(task, Task):
-            print("Warning: Invalid task object provided")
+            logger.warning("Invalid task object provided")
             return self._generate_fallback_notification(task, context or {})
             
         if not hasattr(task, 'id') or not task.id:
-            print("Warning: Task missing ID")
+            logger.warning("Task missing ID")
             task.id = 0
             
         if not context:
@@ -129,19 +141,41 @@ class LLMNotificationGenerator:
             else:
                 return self._generate_complex_notification(task, context, user_performance)
         except Exception as e:
-            print(f"Error generating notification: {str(e)}")
+            logger.error("Error generating notification: %s", e)
             return self._generate_fallback_notification(task, context)
     
-    def _generate_simple_notification(self, task: Task, context: Dict) -> GeneratedNotification:
+    def uses_llm(self, task: Task) -> bool:
+        """Whether generating for this task calls the LLM provider"""
+        return getattr(task, 'task_type', 'simple') != 'simple' and self.backend is not None
+
+    def generate_template_notification(self, task: Task, context: Dict) -> GeneratedNotification:
+        """Template notification without calling the LLM (deadline or quota exhausted)"""
+        return self._generate_fallback_notification(task, context or {})
+
+    def template_alternatives(self, task: Task, context: Dict) -> Iterator[GeneratedNotification]:
+        """Every template notification for the task, in random order and built
+        lazily (alternatives to a rejected notification, without the LLM)"""
+        build = (self._generate_simple_notification
+                 if getattr(task, 'task_type', 'simple') == 'simple'
+                 else self._build_fallback_notification)
+        templates = list(self._templates(task))
+        self.rng.shuffle(templates)
+        for hook_message in templates:
+            yield build(task, context or {}, hook_message)
+
+    def _templates(self, task: Task) -> List[str]:
+        return self.fallback_templates['simple'].get(task.category,
+                                                     self.fallback_templates['simple']['work'])
+
+    def _generate_simple_notification(self, task: Task, context: Dict,
+                                      hook_message: str = None) -> GeneratedNotification:
         """Generate simple notification with templates"""
-        templates = self.fallback_templates['simple'].get(task.category, 
-                                                        self.fallback_templates['simple']['work'])
-        hook_message = random.choice(templates)
+        hook_message = hook_message or self.rng.choice(self._templates(task))
         next_step = f"Ready to {task.title.lower()}?"
         
         return GeneratedNotification(
             id=None,
-            notification_id=f"notif_{task.id}_{int(datetime.now().timestamp())}",
+            notification_id=next_notification_id(),
             task_id=task.id,
             hook_message=hook_message,
             expanded_content=None,
@@ -151,64 +185,32 @@ class LLMNotificationGenerator:
             timestamp=datetime.now()
         )
     
-    def _generate_notification_id(self, task_id: int) -> str:
-        """Generate a unique notification ID"""
-        timestamp = int(datetime.now().timestamp() * 1000)  # millisecond precision
-        random_suffix = ''.join([str(random.randint(0, 9)) for _ in range(4)])
-        return f"notif_{task_id}_{timestamp}_{random_suffix}"
-
     def _generate_complex_notification(self, task: Task, context: Dict, 
                                     user_performance: Dict = None) -> GeneratedNotification:
         """Generate complex notification using LLM"""
         
-        if not self.model:
+        # Read once: a background health probe may disable the backend meanwhile
+        backend = self.backend
+        if backend is None:
             return self._generate_fallback_notification(task, context)
         
         try:
             # Prepare context for LLM
             prompt = self._build_llm_prompt(task, context, user_performance)
             
-            if self.provider == LLMProvider.GEMINI.value:
-                return self._generate_with_gemini(task, prompt)
-            elif self.provider == LLMProvider.LOCAL.value:
-                return self._generate_with_local(task, prompt)
-            else:
-                return self._generate_fallback_notification(task, context)
+            with METRICS.span(f"llm.{backend.name}_request"):
+                llm_response = backend.generate(prompt, SYSTEM_PROMPT)
+            return self._create_notification(task, prompt, llm_response, backend.strategy)
                 
         except Exception as e:
-            print(f"Error during LLM generation: {e}")
+            logger.error("Error during LLM generation: %s", e)
+            if isinstance(e, ProviderRateLimited):
+                METRICS.increment("llm.rate_limited")
+                if self.on_rate_limit is not None:
+                    self.on_rate_limit()
             return self._generate_fallback_notification(task, context)
-    
-    def _generate_with_gemini(self, task: Task, prompt: str) -> GeneratedNotification:
-        """Generate notification using Gemini"""
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    'temperature': 0.7,
-                    'top_p': 0.8,
-                    'top_k': 40,
-                    'max_output_tokens': 150,
-                }
-            )
-            llm_response = response.text
-            
-        except Exception as e:
-            print(f"Gemini generation error: {e}")
-            raise
-            
-        return self._create_notification(task, prompt, llm_response, "gemini_generated")
-    
-    def _generate_with_local(self, task: Task, prompt: str) -> GeneratedNotification:
-        """Generate notification using local Ollama"""
-        try:
-            llm_response = self._generate_with_ollama(prompt)
-            return self._create_notification(task, prompt, llm_response, "ollama_generated")
-            
-        except Exception as e:
-            print(f"Ollama generation error: {e}")
-            raise
 
+    @timed("llm.parse_response")
     def _parse_llm_response(self, response_text: str) -> dict:
         """Parse LLM response text into notification data"""
         try:
@@ -225,6 +227,9 @@ class LLMNotificationGenerator:
             end_idx = json_text.rfind('}')
             if end_idx != -1:
                 json_text = json_text[:end_idx + 1]
+            elif json_text.lstrip().startswith('{'):
+                # Ollama drops the "}" stop sequence from its output
+                json_text = json_text.rstrip() + '}'
             
             # Parse the cleaned JSON
             data = json.loads(json_text)
@@ -240,8 +245,9 @@ class LLMNotificationGenerator:
             return notification_data
             
         except (json.JSONDecodeError, KeyError) as e:
-            print(f"Error parsing LLM response: {e}")
-            print(f"Raw response: {response_text}")
+            logger.warning("Error parsing LLM response: %s", e)
+            logger.debug("Raw response: %s", response_text)
+            METRICS.increment("llm.parse_errors")
             
             # Extract information from raw text as fallback
             lines = response_text.split('\n')
@@ -269,7 +275,7 @@ class LLMNotificationGenerator:
         
         return GeneratedNotification(
             id=None,
-            notification_id=self._generate_notification_id(task.id),
+            notification_id=next_notification_id(),
             task_id=task.id,
             hook_message=notification_data['hook'],
             expanded_content=notification_data.get('expanded_content'),
@@ -281,11 +287,9 @@ class LLMNotificationGenerator:
             llm_response_raw=llm_response
         )
 
+    @timed("llm.build_prompt")
     def _build_llm_prompt(self, task: Task, context: Dict, user_performance: Dict = None) -> str:
-        """Build prompt for LLM"""
-        
-        # Analyze task progress from notes
-        progress_level = self._analyze_progress_level(task.notes)
+        """Build the variable part of the LLM prompt, sent after SYSTEM_PROMPT"""
         
         # Build performance context
         performance_context = ""
@@ -297,77 +301,64 @@ class LLMNotificationGenerator:
         hour = context.get('hour', datetime.now().hour)
         time_context = "morning" if 6 <= hour <= 11 else "afternoon" if 12 <= hour <= 17 else "evening"
         
-        prompt = f"""You are a notification generator for a focus app. Generate a compelling notification to help break scrolling habits.
+        # Only the per-task section; SYSTEM_PROMPT carries the fixed instructions
+        return f"""{self._task_prompt(task)}Time of day: {time_context}
+Scrolling duration: {context.get('scrolling_time', 30)} seconds{performance_context}
+
+YOUR RESPONSE (JSON only, no other text):
+"""
+
+    def _task_prompt(self, task: Task) -> str:
+        """Prompt section that depends only on the task, cached per task version"""
+        key = (task.id, task.updated_at)
+        prompt = self._prompt_cache.get(key)
+        if prompt is not None:
+            return prompt
 
-CONTEXT:
+        METRICS.increment("llm.prompt_cache.miss")
+        prompt = f"""CONTEXT:
 Task: {task.title}
 Category: {task.category}
 Importance: {task.importance}/10
-Progress Level: {progress_level}
+Progress Level: {self._analyze_progress_level(task.notes)}
 User's Notes: "{task.notes}"
-Time of day: {time_context}
-Scrolling duration: {context.get('scrolling_time', 30)} seconds{performance_context}
-
-INSTRUCTIONS:
-1. Generate a notification that's relevant to the user's progress level
-2. Connect the task to real-world applications or interesting facts
-3. Make it personally relevant and timely
-4. Use emojis sparingly
-
-RESPONSE FORMAT:
-Return ONLY a JSON object with these fields:
-{{
-  "hook": "Brief attention-grabbing message (max 100 chars)",
-  "next_step": "Clear call-to-action (max 50 chars)",
-  "expanded_content": "Optional detailed motivation (max 300 chars)",
-  "confidence": 0.85
-}}
-
-EXAMPLE RESPONSE:
-{{
-  "hook": "Ready to level up your coding skills? 🚀",
-  "next_step": "Complete the next tutorial chapter",
-  "expanded_content": "Did you know programmers spend 50% of their time debugging? Master these skills now to save time later!",
-  "confidence": 0.85
-}}
-
-YOUR RESPONSE (JSON only, no other text):
 """
-        
+        # Tasks not stored yet have no stable identity to cache under
+        if task.id and task.updated_at is not None:
+            with self._prompt_cache_lock:
+                if len(self._prompt_cache) >= PROMPT_CACHE_SIZE:
+                    # Evict the oldest entry; readers never hold the lock
+                    del self._prompt_cache[next(iter(self._prompt_cache))]
+                self._prompt_cache[key] = prompt
         return prompt
 
     def _analyze_progress_level(self, notes: str) -> str:
         """Analyze progress level from task notes"""
-        notes_lower = notes.lower()
-        
-        beginner_keywords = ['just started', 'beginning', 'new to', 'learning basics']
-        intermediate_keywords = ['halfway', 'currently', 'working on', 'understanding']
-        advanced_keywords = ['almost done', 'finishing', 'advanced', 'mastering']
-        
-        for keyword in advanced_keywords:
-            if keyword in notes_lower:
-                return 'advanced'
-        
-        for keyword in intermediate_keywords:
-            if keyword in notes_lower:
-                return 'intermediate'
-        
-        for keyword in beginner_keywords:
-            if keyword in notes_lower:
-                return 'beginner'
-        
-        return 'beginner'
+        best = 'beginner'
+        for match in PROGRESS_PATTERN.finditer(notes):
+            level = match.lastgroup
+            if level == 'advanced':
+                return level
+            if PROGRESS_RANK[level] < PROGRESS_RANK[best]:
+                best = level
+        return best
 
-    def _generate_fallback_notification(self, task: Task, context: Dict) -> GeneratedNotification:
+    def _generate_fallback_notification(self, task: Task, context: Dict,
+                                        hook_message: str = None) -> GeneratedNotification:
         """Generate fallback notification when LLM is not available"""
-        templates = self.fallback_templates['simple'].get(task.category, 
-                                                    self.fallback_templates['simple']['work'])
-        hook_message = random.choice(templates)
+        METRICS.increment("llm.fallback")
+        return self._build_fallback_notification(task, context, hook_message)
+
+    def _build_fallback_notification(self, task: Task, context: Dict,
+                                     hook_message: str = None) -> GeneratedNotification:
+        """Fallback template notification; unlike _generate_fallback_notification
+        not counted as an LLM fallback (e.g. an alternative that may be rejected)"""
+        hook_message = hook_message or self.rng.choice(self._templates(task))
         next_step = f"Ready to work on {task.title}?"
         
         return GeneratedNotification(
             id=None,
-            notification_id=self._generate_notification_id(task.id),
+            notification_id=next_notification_id(),
             task_id=task.id,
             hook_message=hook_message,
             expanded_content=f"You've been working on: {task.title}. {task.notes[:100]}...",
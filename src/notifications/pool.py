@@ -0,0 +1,113 @@
+"""Pool of pre-generated LLM notifications per task
+
+Live requests for a complex task take a pooled notification when one is
+available and fresh, so the user does not wait on the LLM. Every take tops
+the task's pool back up with background REFILL requests, which the
+generation queue runs behind live work. Pooled content was generated with
+the context of its refill, and is discarded once the task is edited or the
+entry is older than the maximum age. With a near-duplicate index, refills
+repeating a recently served or already pooled notification are dropped.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional, Tuple
+
+from src.config import NOTIFICATION_POOL_SIZE, NOTIFICATION_POOL_MAX_AGE
+from src.instrumentation.metrics import METRICS
+from src.models.models import Task, GeneratedNotification
+from src.notifications.dedup import NearDuplicateIndex, fingerprint
+from src.notifications.queue import GenerationQueue, RequestKind
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationPool:
+    """Per-task pools of pre-generated notifications, refilled in the background"""
+
+    def __init__(self, queue: GenerationQueue, size: int = None, max_age: float = None,
+                 dedup: NearDuplicateIndex = None):
+        self.queue = queue
+        self.dedup = dedup
+        self.size = NOTIFICATION_POOL_SIZE if size is None else size
+        self.max_age = NOTIFICATION_POOL_MAX_AGE if max_age is None else max_age
+        self._lock = threading.Lock()
+        # task_id -> (created, task version, notification, fingerprint), oldest first
+        self._entries: Dict[int, Deque[Tuple[float, str, GeneratedNotification, int]]] = {}
+        self._pending: Dict[int, int] = {}
+
+    def take(self, task: Task, context: Dict, performance: Dict = None,
+             refill: bool = True) -> Optional[GeneratedNotification]:
+        """Pop a fresh pooled notification for the task and schedule refills"""
+        version = str(task.updated_at)
+        oldest_allowed = time.monotonic() - self.max_age
+        notification = None
+        with self._lock:
+            entries = self._entries.get(task.id)
+            while entries:
+                created, entry_version, candidate, _ = entries.popleft()
+                if entry_version == version and created >= oldest_allowed:
+                    notification = candidate
+                    break
+                METRICS.increment("pool.expired")
+            missing = (self.size - len(entries or ()) - self._pending.get(task.id, 0)
+                       if refill else 0)
+            if missing > 0:
+                self._pending[task.id] = self._pending.get(task.id, 0) + missing
+
+        for _ in range(max(missing, 0)):
+            future = self.queue.submit(task, context, performance, kind=RequestKind.REFILL)
+            future.add_done_callback(
+                lambda f, task_id=task.id: self._refilled(task_id, version, f)
+            )
+
+        if notification is None:
+            METRICS.increment("pool.miss")
+            return None
+        METRICS.increment("pool.hit")
+        notification.timestamp = datetime.now()
+        return notification
+
+    def _refilled(self, task_id: int, version: str, future) -> None:
+        with self._lock:
+            self._pending[task_id] -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            notification = future.result()
+            # Dropped refills and template fallbacks are not worth pooling
+            if notification is None or notification.generation_strategy == "fallback_template":
+                return
+            entries = self._entries.setdefault(task_id, deque())
+            fp = fingerprint(notification)
+            if self.dedup is not None and (
+                    self.dedup.is_duplicate(task_id, fp) or
+                    any((fp ^ other).bit_count() <= self.dedup.max_distance
+                        for *_, other in entries)):
+                METRICS.increment("dedup.pool_rejected")
+                return
+            entries.append((time.monotonic(), version, notification, fp))
+
+    def export_state(self) -> Dict[int, list]:
+        """Pooled entries per task with wall-clock creation times, so their age
+        keeps counting while no process holds them"""
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            return {task_id: [(created + offset, version, notification, fp)
+                              for created, version, notification, fp in entries]
+                    for task_id, entries in self._entries.items() if entries}
+
+    def import_state(self, state: Dict[int, list]) -> None:
+        """Restore entries from export_state; stale ones expire as usual on take"""
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            for task_id, entries in state.items():
+                self._entries[task_id] = deque(
+                    (created - offset, version, notification, fp)
+                    for created, version, notification, fp in entries[-self.size:]
+                )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
@@ -0,0 +1,39 @@
+"""LLM providers behind a common interface, selected by ACTIVE_LLM"""
+import logging
+from typing import Dict, Optional, Type
+
+from src.config import LLMProvider
+from src.notifications.providers.base import (
+    NotificationProvider, ProviderCapabilities, ProviderError, ProviderRateLimited
+)
+from src.notifications.providers.gemini import GeminiProvider
+from src.notifications.providers.ollama import OllamaProvider
+from src.notifications.providers.stub import StubProvider
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS: Dict[str, Type[NotificationProvider]] = {
+    LLMProvider.GEMINI.value: GeminiProvider,
+    LLMProvider.LOCAL.value: OllamaProvider,
+    LLMProvider.STUB.value: StubProvider,
+}
+
+
+def create_provider(name: str, **options) -> Optional[NotificationProvider]:
+    """Instantiate a provider by LLMProvider value; None for 'none' or when
+    the provider cannot be configured"""
+    if name == LLMProvider.NONE.value:
+        return None
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}', "
+                         f"expected one of {[provider.value for provider in LLMProvider]}")
+    try:
+        return PROVIDERS[name](**options)
+    except ProviderError as e:
+        logger.warning("%s provider unavailable: %s", name, e)
+        return None
+
+
+__all__ = ['NotificationProvider', 'ProviderCapabilities', 'ProviderError',
+           'ProviderRateLimited', 'GeminiProvider', 'OllamaProvider', 'StubProvider',
+           'PROVIDERS', 'create_provider']
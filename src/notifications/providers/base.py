@@ -0,0 +1,48 @@
+"""Interface every LLM provider implements"""
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+
+class ProviderError(Exception):
+    """A provider failed to produce a completion"""
+
+
+class ProviderRateLimited(ProviderError):
+    """The provider rejected the request for quota or rate reasons"""
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderCapabilities:
+    system_prompt: bool = False  # takes the system prompt separately (prefix reuse)
+    batching: bool = False  # can complete several prompts in one request
+    native_async: bool = False  # agenerate does not tie up a thread
+
+
+class NotificationProvider(ABC):
+    """A text completion backend used by LLMNotificationGenerator.
+
+    ``name`` labels metrics (``llm.<name>_request``) and ``strategy`` is the
+    generation_strategy recorded on the notifications it produces. Errors are
+    raised as ProviderError, quota and rate errors as ProviderRateLimited.
+    """
+    name: str = None
+    strategy: str = None
+    capabilities = ProviderCapabilities()
+
+    @abstractmethod
+    def generate(self, prompt: str, system: str) -> str:
+        """Raw completion of ``prompt`` under the ``system`` instructions"""
+
+    async def agenerate(self, prompt: str, system: str) -> str:
+        """Completion without blocking the event loop; runs ``generate`` in a
+        thread unless the provider has a native async client"""
+        return await asyncio.to_thread(self.generate, prompt, system)
+
+    def health(self, system: str = None) -> bool:
+        """Whether the provider can serve requests; may send a small request,
+        preloading the ``system`` instructions where the provider caches them"""
+        return True
+
+    def close(self) -> None:
+        """Release connections"""
@@ -0,0 +1,64 @@
+"""Google Gemini"""
+import logging
+
+import google.generativeai as genai
+
+from src.config import GEMINI_API_KEY
+from src.notifications.providers.base import (
+    NotificationProvider, ProviderCapabilities, ProviderError, ProviderRateLimited
+)
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CONFIG = {
+    'temperature': 0.7,
+    'top_p': 0.8,
+    'top_k': 40,
+    'max_output_tokens': 150,
+}
+
+
+def _translate(error: Exception) -> ProviderError:
+    """Quota errors surface as ResourceExhausted (HTTP 429)"""
+    if type(error).__name__ in ('ResourceExhausted', 'TooManyRequests'):
+        return ProviderRateLimited(str(error))
+    return ProviderError(str(error))
+
+
+class GeminiProvider(NotificationProvider):
+    """Gemini through the google.generativeai client"""
+    name = "gemini"
+    strategy = "gemini_generated"
+    capabilities = ProviderCapabilities(native_async=True)
+
+    def __init__(self, api_key: str = None, model: str = 'gemini-pro'):
+        api_key = api_key or GEMINI_API_KEY
+        if not api_key:
+            raise ProviderError("No Gemini API key provided")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+
+    def generate(self, prompt: str, system: str) -> str:
+        try:
+            response = self.model.generate_content(f"{system}\n\n{prompt}",
+                                                   generation_config=GENERATION_CONFIG)
+            return response.text
+        except Exception as e:
+            raise _translate(e) from e
+
+    async def agenerate(self, prompt: str, system: str) -> str:
+        try:
+            response = await self.model.generate_content_async(
+                f"{system}\n\n{prompt}", generation_config=GENERATION_CONFIG)
+            return response.text
+        except Exception as e:
+            raise _translate(e) from e
+
+    def health(self, system: str = None) -> bool:
+        try:
+            self.model.generate_content("Hello!")
+        except Exception as e:
+            logger.error("Error initializing Gemini API: %s", e)
+            return False
+        logger.info("Successfully initialized Gemini API")
+        return True
@@ -0,0 +1,99 @@
+"""Local models served by Ollama"""
+import logging
+from typing import Dict
+
+import requests
+
+from src.config import OLLAMA_HOST, OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, OLLAMA_TIMEOUT
+from src.instrumentation.metrics import METRICS
+from src.notifications.providers.base import (
+    NotificationProvider, ProviderCapabilities, ProviderError, ProviderRateLimited
+)
+
+logger = logging.getLogger(__name__)
+
+# Sampling options for notification requests; kept identical across requests
+OLLAMA_OPTIONS = {
+    "temperature": 0.7,    # for more focused responses
+    "top_p": 0.9,         # slightly increased for better creativity
+    "top_k": 40,          # keep top 40 tokens
+    "num_predict": 200,    # limit response length
+    "stop": ["}"],        # stop at the end of JSON
+    "repeat_penalty": 1.1  # reduce repetition
+}
+
+
+class OllamaProvider(NotificationProvider):
+    """Ollama /api/generate with the model kept loaded between requests"""
+    name = "ollama"
+    strategy = "ollama_generated"
+    capabilities = ProviderCapabilities(system_prompt=True)
+
+    def __init__(self, host: str = None, model: str = None, keep_alive: str = None,
+                 timeout: float = None):
+        self.url = f"{host or OLLAMA_HOST}/api/generate"
+        self.model = model or OLLAMA_MODEL
+        self.keep_alive = keep_alive or OLLAMA_KEEP_ALIVE
+        self.timeout = timeout or OLLAMA_TIMEOUT
+        # Reuse HTTP connections to the Ollama server across requests
+        self.session = requests.Session()
+
+    def _post(self, prompt: str, system: str, options: Dict) -> Dict:
+        try:
+            response = self.session.post(
+                self.url,
+                json={
+                    "model": self.model,
+                    "system": system,
+                    "prompt": prompt,
+                    "stream": False,
+                    "keep_alive": self.keep_alive,
+                    "options": options
+                },
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 429:
+                raise ProviderRateLimited(str(e)) from e
+            raise ProviderError(str(e)) from e
+        except requests.RequestException as e:
+            raise ProviderError(str(e)) from e
+        return response.json()
+
+    def generate(self, prompt: str, system: str) -> str:
+        result = self._post(prompt, system, OLLAMA_OPTIONS)
+        self._record_timings(result)
+        return result["response"]
+
+    def health(self, system: str = None) -> bool:
+        """Load the model with a one-token request; this also warms the
+        server's cache of the evaluated system prompt"""
+        try:
+            self._post("Hello!", system, {**OLLAMA_OPTIONS, "num_predict": 1})
+        except ProviderError as e:
+            logger.error("Error connecting to Ollama server: %s", e)
+            logger.error("Make sure Ollama is running and the model is pulled.")
+            return False
+        logger.info("Successfully connected to Ollama server using model: %s", self.model)
+        return True
+
+    def close(self) -> None:
+        self.session.close()
+
+    @staticmethod
+    def _record_timings(result: Dict) -> None:
+        """Record the server-side phases reported by Ollama (durations are in ns)"""
+        for phase, duration_field, count_field in (
+            ('load', 'load_duration', None),
+            ('prompt_eval', 'prompt_eval_duration', 'prompt_eval_count'),
+            ('eval', 'eval_duration', 'eval_count'),
+        ):
+            if result.get(duration_field) is not None:
+                METRICS.observe(f"llm.ollama.{phase}", result[duration_field] / 1e9)
+            if count_field and result.get(count_field) is not None:
+                METRICS.increment(f"llm.ollama.{phase}_tokens", result[count_field])
+        logger.debug("Ollama: %s prompt tokens in %.0f ms, %s generated in %.0f ms",
+                     result.get('prompt_eval_count'),
+                     (result.get('prompt_eval_duration') or 0) / 1e6,
+                     result.get('eval_count'), (result.get('eval_duration') or 0) / 1e6)
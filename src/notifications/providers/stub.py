@@ -0,0 +1,142 @@
+"""Offline stand-in for an LLM, for load and failure testing
+
+Answers with notification JSON built from the task in the prompt after a
+log-normally distributed delay, and fails or returns unparseable output at
+configured rates. Set ACTIVE_LLM=stub (or --provider stub) to run the whole
+pipeline without a Gemini key or an Ollama server.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+from src.config import (
+    STUB_LATENCY_MS, STUB_LATENCY_SIGMA, STUB_ERROR_RATE, STUB_RATE_LIMIT_RATE,
+    STUB_MALFORMED_RATE, STUB_SEED
+)
+from src.notifications.providers.base import (
+    NotificationProvider, ProviderCapabilities, ProviderError, ProviderRateLimited
+)
+
+TASK_PATTERN = re.compile(r"^Task: (.*)$", re.MULTILINE)
+PROGRESS_PATTERN = re.compile(r"^Progress Level: (\w+)", re.MULTILINE)
+
+HOOKS = [
+    "{title} won't finish itself - {minutes} minutes is enough to move it {emoji}",
+    "Your {progress} streak on {title} is worth more than this feed {emoji}",
+    "Quick swap: {minutes} minutes of {title} instead of scrolling? {emoji}",
+    "Future you is cheering for {title} right now {emoji}",
+    "{minutes} focused minutes on {title} beat an hour of scrolling {emoji}",
+]
+NEXT_STEPS = [
+    "Open {title} for {minutes} minutes",
+    "Do one small piece of {title}",
+    "Set a {minutes}-minute timer and start",
+]
+DETAILS = [
+    "Small sessions compound: {minutes} minutes a day adds up to hours every month.",
+    "Starting is the hardest part. Once you begin, momentum does the rest.",
+    "You are at the {progress} stage - this is where consistency pays off most.",
+]
+EMOJIS = ["🚀", "🎯", "📚", "💪", "⚡", "🌟"]
+
+
+class StubProvider(NotificationProvider):
+    """Canned notification JSON with injected latency, errors and malformed output"""
+    name = "stub"
+    strategy = "stub_generated"
+    capabilities = ProviderCapabilities(system_prompt=True, native_async=True)
+
+    def __init__(self, latency_ms: float = None, latency_sigma: float = None,
+                 error_rate: float = None, rate_limit_rate: float = None,
+                 malformed_rate: float = None, seed: Optional[int] = None):
+        """
+        Args:
+            latency_ms: Median response time in milliseconds
+            latency_sigma: Spread of the log-normal latency (0 = constant)
+            error_rate: Fraction of requests failing with ProviderError
+            rate_limit_rate: Fraction of requests rejected with ProviderRateLimited
+            malformed_rate: Fraction of answers that are not valid JSON
+            seed: Seed for reproducible runs
+        """
+        self.latency_ms = STUB_LATENCY_MS if latency_ms is None else latency_ms
+        self.latency_sigma = STUB_LATENCY_SIGMA if latency_sigma is None else latency_sigma
+        self.error_rate = STUB_ERROR_RATE if error_rate is None else error_rate
+        self.rate_limit_rate = STUB_RATE_LIMIT_RATE if rate_limit_rate is None else rate_limit_rate
+        self.malformed_rate = STUB_MALFORMED_RATE if malformed_rate is None else malformed_rate
+        self._rng = random.Random(STUB_SEED if seed is None else seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, system: str) -> str:
+        delay, outcome = self._draw(prompt)
+        time.sleep(delay)
+        return self._finish(outcome)
+
+    async def agenerate(self, prompt: str, system: str) -> str:
+        delay, outcome = self._draw(prompt)
+        await asyncio.sleep(delay)
+        return self._finish(outcome)
+
+    def health(self, system: str = None) -> bool:
+        """Takes one request's latency, like the probe of a real provider"""
+        with self._lock:
+            delay = self._latency(self._rng)
+        time.sleep(delay)
+        return True
+
+    def _latency(self, rng: random.Random) -> float:
+        return (self.latency_ms / 1000 *
+                math.exp(rng.gauss(0, self.latency_sigma) if self.latency_sigma else 0))
+
+    def _draw(self, prompt: str) -> tuple:
+        """Latency in seconds and the response (or exception) for one request"""
+        with self._lock:
+            rng = self._rng
+            delay = self._latency(rng)
+            roll = rng.random()
+            if roll < self.rate_limit_rate:
+                return delay, ProviderRateLimited("Stub provider quota exceeded (429)")
+            roll -= self.rate_limit_rate
+            if roll < self.error_rate:
+                return delay, ProviderError("Stub provider failure (500)")
+            roll -= self.error_rate
+            text = self._response(prompt, rng)
+            if roll < self.malformed_rate:
+                text = self._malform(text, rng)
+            return delay, text
+
+    @staticmethod
+    def _finish(outcome) -> str:
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    @staticmethod
+    def _response(prompt: str, rng: random.Random) -> str:
+        task = TASK_PATTERN.search(prompt)
+        progress = PROGRESS_PATTERN.search(prompt)
+        values = {
+            'title': task.group(1).strip() if task else "your task",
+            'progress': progress.group(1) if progress else "beginner",
+            'minutes': rng.choice((5, 10, 15, 20, 25)),
+            'emoji': rng.choice(EMOJIS),
+        }
+        return json.dumps({
+            "hook": rng.choice(HOOKS).format(**values),
+            "next_step": rng.choice(NEXT_STEPS).format(**values),
+            "expanded_content": rng.choice(DETAILS).format(**values),
+            "confidence": round(rng.uniform(0.6, 0.95), 2),
+        }, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def _malform(text: str, rng: random.Random) -> str:
+        """Failure modes seen from real models: output cut off mid-string, or
+        prose with the fields but no JSON"""
+        if rng.random() < 0.5:
+            return text[:rng.randint(10, max(11, len(text) // 2))]
+        data = json.loads(text)
+        return f"Here's a notification for you!\nHook - {data['hook']}\nNext: {data['next_step']}"
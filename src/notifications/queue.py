@@ -0,0 +1,239 @@
+"""Priority- and deadline-aware queue in front of the LLM generator
+
+Requests are ordered live-first, then by task importance. Background pool
+refills never occupy the last worker and, with a burst above one, never take
+the last rate-limit token, so a live request waits at most for one in-flight generation. Each
+request has a deadline: live requests past it (or unable to get a
+rate-limit token before it) are served from templates, refills are dropped.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from enum import IntEnum
+from typing import Dict, Optional
+
+from src.config import (
+    GENERATION_WORKERS, GENERATION_TIMEOUT, REFILL_TIMEOUT,
+    PROVIDER_RATE_LIMITS, RATE_LIMIT_BACKOFF
+)
+from src.instrumentation.metrics import METRICS
+from src.models.models import Task, GeneratedNotification
+from src.notifications.generator import LLMNotificationGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class RequestKind(IntEnum):
+    """Request classes in priority order"""
+    LIVE = 0    # a user is waiting for this notification
+    REFILL = 1  # background pool refill
+
+
+class TokenBucket:
+    """Thread-safe token bucket; a rate of 0 means unlimited"""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, deadline: float, reserve: float = 0.0) -> bool:
+        """Take a token, waiting until ``deadline`` (monotonic) at the latest.
+
+        ``reserve`` tokens are left in the bucket for other callers, as far as
+        the burst allows: a bucket holding a single token cannot reserve any.
+        """
+        if self.rate <= 0:
+            return True
+        reserve = min(reserve, self.burst - 1)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1 + reserve:
+                    self._tokens -= 1
+                    return True
+                wait = max(self._blocked_until - now,
+                           (1 + reserve - self._tokens) / self.rate)
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        """Hand out no tokens for a while, e.g. after the provider reported a quota error"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class GenerationRequest:
+    """A queued generation with its priority, deadline and result future"""
+    __slots__ = ('kind', 'task', 'context', 'performance', 'deadline', 'enqueued', 'future')
+
+    def __init__(self, kind: RequestKind, task: Task, context: Dict,
+                 performance: Optional[Dict], deadline: float):
+        self.kind = kind
+        self.task = task
+        self.context = context
+        self.performance = performance
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.future: Future = Future()
+
+
+class GenerationQueue:
+    """Worker pool running LLM generations in priority order under provider rate limits"""
+
+    def __init__(self, generator: LLMNotificationGenerator, workers: int = None,
+                 rate: float = None, burst: float = None):
+        self.generator = generator
+        self.workers = max(workers or GENERATION_WORKERS, 2)
+        # One worker is always left for live requests
+        self.max_refill_workers = self.workers - 1
+
+        default_rate, default_burst = PROVIDER_RATE_LIMITS.get(generator.provider, (0, 1))
+        self.bucket = TokenBucket(default_rate if rate is None else rate,
+                                  default_burst if burst is None else burst)
+        generator.on_rate_limit = self._on_rate_limit
+
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._active_refills = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"llm-generation-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, task: Task, context: Dict, performance: Dict = None,
+               kind: RequestKind = RequestKind.LIVE, timeout: float = None) -> Future:
+        """Queue a generation; the future resolves to a notification (None if dropped)"""
+        if timeout is None:
+            timeout = GENERATION_TIMEOUT if kind == RequestKind.LIVE else REFILL_TIMEOUT
+        request = GenerationRequest(kind, task, context, performance,
+                                    time.monotonic() + timeout)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Generation queue is closed")
+            heapq.heappush(self._heap,
+                           (kind, -task.importance, next(self._sequence), request))
+            METRICS.set_gauge(f"generation.queue_depth.{kind.name.lower()}",
+                              self._count(kind))
+            self._condition.notify()
+        return request.future
+
+    def generate(self, task: Task, context: Dict, performance: Dict = None,
+                 timeout: float = None) -> GeneratedNotification:
+        """Generate a live notification, falling back to a template at the deadline"""
+        timeout = GENERATION_TIMEOUT if timeout is None else timeout
+        future = self.submit(task, context, performance, RequestKind.LIVE, timeout)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # The worker may still finish; its result is discarded
+            METRICS.increment("generation.downgraded.deadline")
+            return self.generator.generate_template_notification(task, context)
+
+    def depth(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def _count(self, kind: RequestKind) -> int:
+        return sum(1 for entry in self._heap if entry[0] == kind)
+
+    def close(self) -> None:
+        """Stop the workers; queued requests are dropped"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            dropped = [entry[-1] for entry in self._heap]
+            self._heap.clear()
+            self._condition.notify_all()
+        for request in dropped:
+            request.future.cancel()
+        for thread in self._threads:
+            thread.join()
+
+    def _on_rate_limit(self) -> None:
+        logger.warning("LLM provider rate limited; pausing generation for %.0fs",
+                       RATE_LIMIT_BACKOFF)
+        self.bucket.penalize(RATE_LIMIT_BACKOFF)
+
+    def _take(self) -> Optional[GenerationRequest]:
+        """Next request this worker may run, or None when closing"""
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if self._heap:
+                    kind = self._heap[0][0]
+                    if kind == RequestKind.LIVE or self._active_refills < self.max_refill_workers:
+                        request = heapq.heappop(self._heap)[-1]
+                        if kind == RequestKind.REFILL:
+                            self._active_refills += 1
+                        METRICS.set_gauge(f"generation.queue_depth.{kind.name.lower()}",
+                                          self._count(kind))
+                        return request
+                self._condition.wait()
+
+    def _run(self) -> None:
+        while True:
+            request = self._take()
+            if request is None:
+                return
+            try:
+                if request.future.set_running_or_notify_cancel():
+                    self._process(request)
+            except Exception as e:
+                logger.error("Generation failed: %s", e)
+                if not request.future.done():
+                    request.future.set_exception(e)
+            finally:
+                if request.kind == RequestKind.REFILL:
+                    with self._condition:
+                        self._active_refills -= 1
+                        self._condition.notify()
+
+    def _process(self, request: GenerationRequest) -> None:
+        kind = request.kind.name.lower()
+        METRICS.observe(f"generation.wait.{kind}", time.monotonic() - request.enqueued)
+
+        if time.monotonic() >= request.deadline:
+            request.future.set_result(self._expired(request, "deadline"))
+            return
+
+        if self.generator.uses_llm(request.task):
+            # Refills leave one token for live requests
+            reserve = 1.0 if request.kind == RequestKind.REFILL else 0.0
+            if not self.bucket.acquire(request.deadline, reserve):
+                request.future.set_result(self._expired(request, "rate_limit"))
+                return
+
+        with METRICS.span(f"generation.run.{kind}"):
+            notification = self.generator.generate_notification(
+                request.task, request.context, request.performance
+            )
+        request.future.set_result(notification)
+
+    def _expired(self, request: GenerationRequest,
+                 reason: str) -> Optional[GeneratedNotification]:
+        """Template for a live request that cannot be served in time; refills are dropped"""
+        if request.kind == RequestKind.REFILL:
+            METRICS.increment(f"generation.dropped.{reason}")
+            return None
+        METRICS.increment(f"generation.downgraded.{reason}")
+        return self.generator.generate_template_notification(request.task, request.context)
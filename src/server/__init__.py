@@ -0,0 +1,3 @@
+from .app import NotificationServer
+
+__all__ = ['NotificationServer']
@@ -0,0 +1,3 @@
+from src.server.app import main
+
+main()
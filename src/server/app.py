@@ -0,0 +1,377 @@
+"""Asyncio HTTP service around a shared ScrollBreakerAI
+
+One long-lived ScrollBreakerAI (and its database, generation queue and LLM
+client) serves every request. Its blocking calls run on a thread pool; an
+asyncio semaphore caps requests in flight and each request has a timeout.
+On SIGINT/SIGTERM the server stops accepting connections, lets in-flight
+requests finish within the grace period and then closes the AI system,
+which flushes queued database writes.
+
+Endpoints (JSON in and out):
+    POST /notifications      {"user_id": 1, "context": {...}}
+    POST /responses          {"notification_id": "...", "user_action": "acted",
+                              "response_time": 4.2, "context": {...}}
+    POST /responses/batch    {"responses": [<response>, ...]}
+    POST /events             {"events": [{"user_id": 1, "timestamp": 1700000000.5,
+                                          "kind": "scroll"}, ...]}
+    GET  /stats?user_id=1&window=24h
+    GET  /health
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from src.config import (
+    SERVER_HOST, SERVER_PORT, SERVER_MAX_CONCURRENCY, SERVER_REQUEST_TIMEOUT,
+    SERVER_SHUTDOWN_GRACE
+)
+from src.core.ingestion import EVENT_KINDS
+from src.core.scroll_breaker import ScrollBreakerAI
+from src.instrumentation.metrics import METRICS
+from src.models.ids import format_notification_id, parse_notification_id
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_SIZE = 1000
+MAX_EVENT_BATCH_SIZE = 10_000
+USER_ACTIONS = ('dismissed', 'clicked', 'expanded', 'acted')
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+}
+
+
+class HTTPError(Exception):
+    """Error returned to the client as a JSON body with the given status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _notification_payload(notification) -> Dict:
+    payload = asdict(notification)
+    for field in ('llm_prompt_used', 'llm_response_raw', 'context_key'):
+        payload.pop(field, None)
+    payload['notification_id'] = format_notification_id(notification.notification_id)
+    if isinstance(payload['timestamp'], datetime):
+        payload['timestamp'] = payload['timestamp'].isoformat()
+    return payload
+
+
+def _require(body: Dict, field: str, kind):
+    value = body.get(field)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise HTTPError(400, f"'{field}' is required")
+    return value
+
+
+class NotificationServer:
+    """HTTP/1.1 keep-alive server exposing ScrollBreakerAI"""
+
+    def __init__(self, ai_system: ScrollBreakerAI, host: str = None, port: int = None,
+                 max_concurrency: int = None, request_timeout: float = None):
+        self.ai_system = ai_system
+        self.host = host or SERVER_HOST
+        self.port = SERVER_PORT if port is None else port
+        self.max_concurrency = max_concurrency or SERVER_MAX_CONCURRENCY
+        self.request_timeout = request_timeout or SERVER_REQUEST_TIMEOUT
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix="server-worker")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._in_flight = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._routes = {
+            ('POST', '/notifications'): self._generate,
+            ('POST', '/responses'): self._respond,
+            ('POST', '/responses/batch'): self._respond_batch,
+            ('POST', '/events'): self._events,
+            ('GET', '/stats'): self._stats,
+            ('GET', '/health'): self._health,
+        }
+
+    async def start(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._server = await asyncio.start_server(self._handle_connection,
+                                                  self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Serving on http://%s:%d", self.host, self.port)
+
+    async def shutdown(self, grace: float = None) -> None:
+        """Stop accepting, wait for in-flight requests, then release the AI system"""
+        grace = SERVER_SHUTDOWN_GRACE if grace is None else grace
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        try:
+            await asyncio.wait_for(self._idle.wait(), grace)
+        except asyncio.TimeoutError:
+            logger.warning("Shutting down with %d requests still in flight", self._in_flight)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.ai_system.close)
+        self._executor.shutdown(wait=False)
+
+    async def serve_forever(self) -> None:
+        """Run until SIGINT/SIGTERM, then shut down gracefully"""
+        await self.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await stop.wait()
+        logger.info("Shutting down")
+        await self.shutdown()
+
+    # HTTP plumbing
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._write_response(writer, e.status, {'error': e.message}, False)
+                    break
+                if request is None:
+                    break
+                method, target, keep_alive, body = request
+                status, payload = await self._dispatch(method, target, body)
+                await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader
+                            ) -> Optional[Tuple[str, str, bool, bytes]]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise HTTPError(400, "Incomplete request")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request head too large")
+
+        lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method, target, keep_alive, body
+
+    async def _write_response(self, writer: asyncio.StreamWriter, status: int,
+                              payload: Dict, keep_alive: bool) -> None:
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict]:
+        url = urlsplit(target)
+        handler = self._routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self._routes):
+                return 405, {'error': f"{method} not allowed on {url.path}"}
+            return 404, {'error': f"No route for {url.path}"}
+
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            with METRICS.span(f"server.{handler.__name__.lstrip('_')}"):
+                try:
+                    data = json.loads(body) if body else {}
+                    if not isinstance(data, dict):
+                        raise HTTPError(400, "Request body must be a JSON object")
+                    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                    return 200, await asyncio.wait_for(
+                        self._call(handler, data, query), self.request_timeout
+                    )
+                except json.JSONDecodeError:
+                    return 400, {'error': "Request body is not valid JSON"}
+                except HTTPError as e:
+                    return e.status, {'error': e.message}
+                except asyncio.TimeoutError:
+                    METRICS.increment("server.timeouts")
+                    return 504, {'error': "Request timed out"}
+                except Exception as e:
+                    logger.exception("Request to %s failed", url.path)
+                    return 500, {'error': str(e)}
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    async def _call(self, handler, data: Dict, query: Dict) -> Dict:
+        """Run a blocking handler on the worker pool once a concurrency slot is free"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, handler, data, query)
+
+    # Handlers (run on worker threads)
+
+    def _generate(self, data: Dict, query: Dict) -> Dict:
+        user_id = data.get('user_id')
+        if user_id is not None and (not isinstance(user_id, int) or isinstance(user_id, bool)):
+            raise HTTPError(400, "'user_id' must be an integer")
+        context = data.get('context')
+        if context is not None and not isinstance(context, dict):
+            raise HTTPError(400, "'context' must be an object")
+        notification = self.ai_system.generate_smart_notification(context, user_id=user_id)
+        if notification is None:
+            raise HTTPError(404, "User has no active tasks")
+        return _notification_payload(notification)
+
+    def _record(self, data: Dict) -> Dict:
+        notification_text = _require(data, 'notification_id', str)
+        try:
+            notification_id = parse_notification_id(
+                notification_text, self.ai_system.db.resolve_legacy_notification_id
+            )
+        except ValueError:
+            raise HTTPError(400, "'notification_id' is not a valid notification ID") from None
+        user_action = _require(data, 'user_action', str)
+        if user_action not in USER_ACTIONS:
+            raise HTTPError(400, f"'user_action' must be one of {list(USER_ACTIONS)}")
+        response_time = _require(data, 'response_time', (int, float))
+        context = data.get('context') or {}
+        result = self.ai_system.process_user_response(notification_id, user_action,
+                                                      float(response_time), context)
+        return {'notification_id': notification_text, **result}
+
+    def _respond(self, data: Dict, query: Dict) -> Dict:
+        return self._record(data)
+
+    def _respond_batch(self, data: Dict, query: Dict) -> Dict:
+        responses = data.get('responses')
+        if not isinstance(responses, list) or not responses:
+            raise HTTPError(400, "'responses' must be a non-empty list")
+        if len(responses) > MAX_BATCH_SIZE:
+            raise HTTPError(413, f"At most {MAX_BATCH_SIZE} responses per batch")
+        results = []
+        for response in responses:
+            try:
+                if not isinstance(response, dict):
+                    raise HTTPError(400, "Each response must be an object")
+                results.append(self._record(response))
+            except HTTPError as e:
+                results.append({'status': 'error', 'error': e.message})
+            except Exception as e:
+                # One failing item must not discard the results of the others
+                logger.exception("Response in batch failed")
+                METRICS.increment("server.batch_item_errors")
+                results.append({'status': 'error', 'error': str(e)})
+        return {'results': results}
+
+    def _events(self, data: Dict, query: Dict) -> Dict:
+        """Ingest scroll/app-usage events; the reply carries the notifications
+        they triggered, and the triggers beyond INGEST_MAX_NOTIFICATIONS (or the
+        request timeout) with the context to request them with. Malformed events
+        are skipped and counted."""
+        deadline = time.monotonic() + self.request_timeout
+        events = data.get('events')
+        if not isinstance(events, list) or not events:
+            raise HTTPError(400, "'events' must be a non-empty list")
+        if len(events) > MAX_EVENT_BATCH_SIZE:
+            raise HTTPError(413, f"At most {MAX_EVENT_BATCH_SIZE} events per batch")
+        now = time.time()
+        accepted = []
+        for event in events:
+            if not isinstance(event, dict):
+                continue
+            user_id = event.get('user_id')
+            timestamp = event.get('timestamp', now)
+            kind = event.get('kind', 'scroll')
+            if (isinstance(user_id, int) and not isinstance(user_id, bool)
+                    and isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool)
+                    and kind in EVENT_KINDS):
+                accepted.append((user_id, float(timestamp), kind))
+        notifications, deferred = self.ai_system.ingest_events(accepted, deadline=deadline)
+        return {'accepted': len(accepted), 'rejected': len(events) - len(accepted),
+                'notifications': [_notification_payload(n) for n in notifications],
+                'triggers': [{'user_id': user_id, 'context': context}
+                             for user_id, context in deferred]}
+
+    def _stats(self, data: Dict, query: Dict) -> Dict:
+        user_id = query.get('user_id')
+        try:
+            return self.ai_system.get_system_stats(
+                int(user_id) if user_id is not None else None, query.get('window')
+            )
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    def _health(self, data: Dict, query: Dict) -> Dict:
+        return {'status': 'ok', 'in_flight': self._in_flight,
+                'generation_queue_depth': self.ai_system.generation_queue.depth()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ScrollBreakerAI over HTTP")
+    parser.add_argument('--host', default=None, help="bind address")
+    parser.add_argument('--port', type=int, default=None, help="port (0 picks a free port)")
+    parser.add_argument('--db', default="scroll_breaker.db", help="database path")
+    parser.add_argument('--provider', default=None, help="LLM provider to use")
+    parser.add_argument('--durability', choices=['sync', 'batched'], default=None,
+                        help="database durability mode")
+    parser.add_argument('--in-memory', action='store_true', default=None,
+                        help="work on an in-memory copy of the database, written back "
+                             "every DB_CHECKPOINT_INTERVAL seconds")
+    parser.add_argument('--warm-start', action='store_true', default=None,
+                        help="restore state from the snapshot of the previous shutdown "
+                             "and write one on shutdown")
+    parser.add_argument('--max-concurrency', type=int, default=None,
+                        help="requests processed at once")
+    parser.add_argument('--timeout', type=float, default=None, help="per-request timeout (s)")
+    parser.add_argument('--log-level', default="INFO", help="logging level")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(message)s")
+    ai_system = ScrollBreakerAI(db_path=args.db, llm_provider=args.provider,
+                                durability=args.durability, in_memory=args.in_memory,
+                                warm_start=args.warm_start)
+    server = NotificationServer(ai_system, host=args.host, port=args.port,
+                                max_concurrency=args.max_concurrency,
+                                request_timeout=args.timeout)
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from .simulator import UserSimulator, SimulationConfig, UserProfile
+
+__all__ = ['UserSimulator', 'SimulationConfig', 'UserProfile']
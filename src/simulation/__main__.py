@@ -0,0 +1,3 @@
+from src.simulation.simulator import main
+
+main()
@@ -0,0 +1,303 @@
+"""Offline replay of notification history for off-policy evaluation
+
+Streams generated_notifications (archive segments first, then the hot
+database) in timestamp order together with the first response to each.
+Engagement, task counters and bandit posteriors are rebuilt in memory as
+the live system would have built them: a response is applied once the
+replay reaches the time it was given, so decisions logged before it do not
+see it. At every logged decision each candidate policy picks a task from
+the user's active tasks created by then. When the
+candidate agrees with the logged choice, the logged reward is reweighted by
+the logged propensity (inverse propensity scoring), which estimates the
+positive-response rate the candidate would have achieved.
+
+Memory is bounded by the number of tasks and contexts and the responses
+still to come, not by history size. Tasks deactivated since are never
+candidates, as the history does not record when that happened. A response
+stored in a different archive segment than its notification counts as no
+response.
+
+Usage:
+    python -m src.simulation.replay --db scroll_breaker.db --policy heuristic --policy thompson
+"""
+import argparse
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.core.selection import SELECTION_POLICIES, create_policy
+from src.database.archive import NotificationArchive
+from src.database.manager import POSITIVE_ACTIONS
+from src.models.engagement import EngagementState, apply_response
+from src.models.models import Task, task_from_row
+
+logger = logging.getLogger(__name__)
+
+# Policy options used when replaying; target propensities are not needed
+REPLAY_POLICY_OPTIONS = {
+    'thompson': {'propensity_samples': 0},
+}
+
+
+class ReplayStore:
+    """In-memory stand-in for the DatabaseManager reads that policies make"""
+
+    def __init__(self):
+        self.now: Optional[datetime] = None
+        self.engagement: Dict[int, EngagementState] = {}
+        self.performance: Dict[int, List[int]] = {}  # task_id -> [total, positive, negative]
+        self.posteriors: Dict[Tuple[int, str], List[int]] = {}  # -> [successes, failures]
+
+    def record_response(self, task_id: int, key: Optional[str], user_action: str,
+                        at: datetime) -> None:
+        """Apply a response the way saving it and update_task_engagement would"""
+        state = self.engagement.get(task_id) or EngagementState()
+        self.engagement[task_id] = apply_response(state, user_action, at)
+
+        positive = 1 if user_action in POSITIVE_ACTIONS else 0
+        counts = self.performance.setdefault(task_id, [0, 0, 0])
+        counts[0] += 1
+        counts[1] += positive
+        counts[2] += 1 if user_action == 'dismissed' else 0
+
+        if key is not None:
+            posterior = self.posteriors.setdefault((task_id, key), [0, 0])
+            posterior[0] += positive
+            posterior[1] += 1 - positive
+
+    def get_task_engagement(self, task_id: int) -> Dict:
+        state = self.engagement.get(task_id)
+        if state is None:
+            return {'consecutive_dismissals': 0, 'engagement_score': 1.0,
+                    'is_cooling_down': False}
+        return {
+            'consecutive_dismissals': state.consecutive_dismissals,
+            'engagement_score': state.engagement_score,
+            'is_cooling_down': state.is_cooling_down(self.now),
+        }
+
+    def get_task_performance(self, task_id: int) -> Dict:
+        total, positive, negative = self.performance.get(task_id, (0, 0, 0))
+        return {'total': total, 'positive': positive, 'negative': negative}
+
+    def get_cooldown_remaining(self, task_id: int) -> float:
+        state = self.engagement.get(task_id)
+        return state.cooldown_remaining(self.now) if state else 0
+
+    def get_bandit_arms(self, task_ids: List[int], key: str) -> Dict[int, Dict]:
+        arms = {}
+        for task_id in task_ids:
+            successes, failures = self.posteriors.get((task_id, key), (0, 0))
+            state = self.engagement.get(task_id)
+            arms[task_id] = {
+                'successes': successes,
+                'failures': failures,
+                'is_cooling_down': state.is_cooling_down(self.now) if state else False,
+            }
+        return arms
+
+
+class PolicyEstimate:
+    """Running inverse propensity estimate for one candidate policy"""
+    __slots__ = ('name', 'decisions', 'matches', 'weighted_reward', 'weight')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.decisions = 0
+        self.matches = 0
+        self.weighted_reward = 0.0
+        self.weight = 0.0
+
+    def add(self, matched: bool, reward: int, propensity: float) -> None:
+        self.decisions += 1
+        if matched:
+            self.matches += 1
+            self.weighted_reward += reward / propensity
+            self.weight += 1 / propensity
+
+    def to_dict(self) -> Dict:
+        return {
+            'decisions': self.decisions,
+            'match_rate': self.matches / self.decisions if self.decisions else 0.0,
+            # Unbiased; high variance when propensities are small
+            'ips': self.weighted_reward / self.decisions if self.decisions else 0.0,
+            # Self-normalized: slightly biased, much lower variance
+            'snips': self.weighted_reward / self.weight if self.weight else 0.0,
+        }
+
+
+class ReplayEngine:
+    """Replays logged decisions against candidate selection policies"""
+
+    def __init__(self, db_path: str = "scroll_breaker.db", policies: List[str] = None,
+                 batch_size: int = 10_000, include_archives: bool = True, seed: int = 42):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.include_archives = include_archives
+        self.seed = seed
+        self.store = ReplayStore()
+        self.policies = {
+            name: create_policy(name, self.store, seed=seed,
+                                **REPLAY_POLICY_OPTIONS.get(name, {}))
+            for name in (policies or list(SELECTION_POLICIES))
+        }
+
+    def _load_tasks(self) -> Tuple[Dict[int, List[Tuple[str, Task]]], Dict[int, int]]:
+        """Active tasks per user in get_user_tasks order, and the owner of every task"""
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        cursor = conn.execute('''
+            SELECT id, user_id, title, category, importance, notes, task_type,
+                   created_at, updated_at, is_active
+            FROM tasks
+            ORDER BY importance DESC, created_at DESC
+        ''')
+        user_tasks: Dict[int, List[Tuple[str, Task]]] = {}
+        task_users: Dict[int, int] = {}
+        for row in cursor:
+            task = task_from_row(cursor, row)
+            task_users[task.id] = task.user_id
+            if task.is_active:
+                # Raw created_at string (row[7]) compares like the logged timestamps
+                user_tasks.setdefault(task.user_id, []).append((row[7], task))
+        conn.close()
+        return user_tasks, task_users
+
+    def _sources(self) -> List[str]:
+        """Database files holding history, oldest first"""
+        sources = []
+        if self.include_archives:
+            archive = NotificationArchive(self.db_path)
+            sources = [path for _, path in archive.segments() if os.path.exists(path)]
+        return sources + [self.db_path]
+
+    def _decisions(self) -> Iterator[tuple]:
+        """Logged decisions with their first response, in timestamp order"""
+        for source in self._sources():
+            conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+            try:
+                columns = {row[1] for row in
+                           conn.execute("PRAGMA table_info(generated_notifications)")}
+                if not columns:
+                    continue
+                logged = ", ".join(
+                    f"gn.{column}" if column in columns else "NULL"
+                    for column in ('context', 'context_key', 'selection_propensity')
+                )
+                cursor = conn.execute(f'''
+                    SELECT gn.task_id, gn.timestamp, {logged}, nr.user_action, nr.timestamp
+                    FROM generated_notifications gn
+                    LEFT JOIN notification_responses nr ON nr.id = (
+                        SELECT MIN(id) FROM notification_responses
+                        WHERE notification_id = gn.notification_id
+                    )
+                    ORDER BY gn.timestamp, gn.id
+                ''')
+                while True:
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                conn.close()
+
+    def run(self) -> Dict:
+        """Replay the full history and return the estimates"""
+        # Every run draws the same sequence
+        for policy in self.policies.values():
+            policy.rng.seed(self.seed)
+        user_tasks, task_users = self._load_tasks()
+        estimates = {name: PolicyEstimate(name) for name in self.policies}
+        store = self.store
+
+        decisions = 0
+        positive = 0
+        unlogged = 0
+        # Responses not given yet at the current decision: (responded at, order,
+        # task_id, context key, action)
+        pending: List[tuple] = []
+        started = time.perf_counter()
+
+        for (task_id, timestamp, context_json, key, propensity,
+             user_action, responded_at) in self._decisions():
+            decisions += 1
+            reward = 1 if user_action in POSITIVE_ACTIONS else 0
+            positive += reward
+            now = datetime.fromisoformat(timestamp)
+            while pending and pending[0][0] <= now:
+                store.now, _, responded_task, responded_key, action = heapq.heappop(pending)
+                store.record_response(responded_task, responded_key, action, store.now)
+            store.now = now
+
+            user_id = task_users.get(task_id)
+            if propensity and user_id is not None:
+                if context_json:
+                    context = json.loads(context_json)
+                else:
+                    context = {'hour': now.hour, 'day_of_week': now.weekday()}
+                candidates = [task for created_at, task in user_tasks.get(user_id, ())
+                              if created_at <= timestamp]
+                if candidates:
+                    for name, policy in self.policies.items():
+                        chosen, _ = policy.select(candidates, context)
+                        estimates[name].add(chosen.id == task_id, reward, propensity)
+            else:
+                unlogged += 1
+
+            if user_action is not None:
+                heapq.heappush(pending, (datetime.fromisoformat(responded_at), decisions,
+                                         task_id, key, user_action))
+
+        elapsed = time.perf_counter() - started
+        return {
+            'decisions': decisions,
+            'unlogged_decisions': unlogged,
+            'logged_positive_rate': positive / decisions if decisions else 0.0,
+            'elapsed_s': elapsed,
+            'decisions_per_s': decisions / elapsed if elapsed > 0 else 0.0,
+            'policies': {name: estimate.to_dict() for name, estimate in estimates.items()},
+        }
+
+
+def print_report(report: Dict) -> None:
+    """Print a human-readable replay report"""
+    print("=== Replay Report ===")
+    print(f"Decisions: {report['decisions']} "
+          f"({report['unlogged_decisions']} without a logged propensity)")
+    print(f"Throughput: {report['decisions_per_s']:.0f} decisions/s "
+          f"({report['elapsed_s']:.2f}s elapsed)")
+    print(f"Logged policy positive rate: {report['logged_positive_rate']:.1%}")
+    print("\nEstimated positive rate per policy:")
+    for name, estimate in report['policies'].items():
+        print(f"- {name}: IPS={estimate['ips']:.1%} SNIPS={estimate['snips']:.1%} "
+              f"(agreed with log on {estimate['match_rate']:.1%} of decisions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay notification history offline")
+    parser.add_argument('--db', default="scroll_breaker.db", help="database to replay")
+    parser.add_argument('--policy', action='append', choices=sorted(SELECTION_POLICIES),
+                        help="candidate policy (repeatable; default: all)")
+    parser.add_argument('--batch-size', type=int, default=10_000, help="rows fetched at a time")
+    parser.add_argument('--no-archives', action='store_true', help="skip archive segments")
+    parser.add_argument('--seed', type=int, default=42, help="random seed for the policies")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--log-level', default="WARNING", help="logging level")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(message)s")
+    engine = ReplayEngine(args.db, policies=args.policy, batch_size=args.batch_size,
+                          include_archives=not args.no_archives, seed=args.seed)
+    report = engine.run()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
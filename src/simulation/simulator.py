@@ -0,0 +1,465 @@
+"""Deterministic load generator and user-behavior simulator
+
+Models a population of users with their own tasks, daily scrolling patterns
+and per-category response propensities, drives ScrollBreakerAI against a
+scratch database at a target request rate and reports throughput, latency
+percentiles, database growth and engagement outcomes.
+
+Run with:
+    python -m src.simulation --users 20 --requests 2000 --rate 100
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from src.core.scroll_breaker import ScrollBreakerAI
+from src.core.selection import SELECTION_POLICIES
+from src.instrumentation.metrics import METRICS
+from src.instrumentation.profiling import PROFILE_MODES, capture_profile
+
+USER_ACTIONS = ['acted', 'clicked', 'expanded', 'dismissed']
+POSITIVE_ACTIONS = ['acted', 'clicked', 'expanded']
+
+# Files SQLite and the warm start keep next to a database
+SIDECAR_SUFFIXES = ('-wal', '-shm', '-journal', '.warm', '.warm.tmp')
+
+TASK_LIBRARY = {
+    'learning': [
+        ("Learn Computer Vision with OpenCV", "Just started learning basic concepts."),
+        ("Master React Hooks and Context API", "Halfway through - understanding useEffect."),
+        ("Read a chapter of Designing Data-Intensive Applications", "Currently on chapter 5."),
+        ("Practice Spanish vocabulary", "New to the language, learning basics."),
+    ],
+    'work': [
+        ("Write the quarterly report", "Working on the summary section."),
+        ("Review open pull requests", "Almost done with the backlog."),
+        ("Prepare slides for Monday", "Just started the outline."),
+    ],
+    'health': [
+        ("Go for a 20 minute walk", ""),
+        ("Do a stretching routine", "Currently doing it every other day."),
+        ("Drink a glass of water", ""),
+    ],
+    'personal': [
+        ("Call a friend", ""),
+        ("Plan the weekend trip", "Halfway through booking."),
+        ("Tidy up the desk", ""),
+    ],
+}
+
+# Relative scrolling intensity for each hour of the day
+EVENING_SCROLLER = [1, 0, 0, 0, 0, 0, 1, 2, 2, 1, 1, 1, 2, 2, 1, 1, 2, 3, 4, 6, 8, 8, 6, 3]
+COMMUTE_SCROLLER = [0, 0, 0, 0, 0, 1, 3, 8, 8, 3, 1, 1, 4, 3, 1, 1, 2, 6, 8, 4, 2, 2, 1, 0]
+NIGHT_OWL = [6, 5, 3, 1, 0, 0, 0, 0, 1, 1, 1, 1, 2, 1, 1, 1, 1, 2, 2, 3, 4, 5, 7, 8]
+
+
+@dataclass
+class UserProfile:
+    """Behavioral model shared by a segment of the simulated population"""
+    name: str
+    share: float  # fraction of the population using this profile
+    task_count: int
+    category_weights: Dict[str, float]
+    hourly_scrolling: List[float]  # relative scrolling intensity per hour
+    response_propensity: Dict[str, Dict[str, float]]  # category -> action -> weight
+    mean_scrolling_time: float = 60.0  # seconds of continuous scrolling
+    fatigue: float = 0.15  # positive propensity lost per repeat of the same task
+
+
+@dataclass
+class SimulationConfig:
+    """Configuration of a simulation run"""
+    users: int = 10
+    requests: int = 500
+    target_rps: float = 0.0  # 0 means as fast as possible
+    seed: int = 42
+    db_path: str = "simulation.db"
+    llm_provider: str = "none"
+    tasks_per_user: Optional[int] = None  # overrides the profile task counts
+    durability: Optional[str] = None  # database durability mode, see DatabaseManager
+    in_memory: Optional[bool] = None  # work on an in-memory copy, see DatabaseManager
+    shards: Optional[int] = None  # user shards, see ShardedDatabaseManager
+    selection_policy: Optional[str] = None  # see src.core.selection
+    profiles: List[UserProfile] = field(default_factory=lambda: list(DEFAULT_PROFILES))
+
+
+DEFAULT_PROFILES = [
+    UserProfile(
+        name="student",
+        share=0.5,
+        task_count=5,
+        category_weights={'learning': 5, 'personal': 2, 'health': 2, 'work': 1},
+        hourly_scrolling=EVENING_SCROLLER,
+        response_propensity={
+            'learning': {'acted': 3, 'clicked': 2, 'expanded': 2, 'dismissed': 3},
+            'health': {'acted': 2, 'clicked': 1, 'expanded': 1, 'dismissed': 6},
+            'personal': {'acted': 2, 'clicked': 2, 'expanded': 1, 'dismissed': 5},
+            'work': {'acted': 1, 'clicked': 1, 'expanded': 1, 'dismissed': 7},
+        },
+        mean_scrolling_time=90.0,
+    ),
+    UserProfile(
+        name="commuter",
+        share=0.3,
+        task_count=7,
+        category_weights={'work': 4, 'learning': 2, 'health': 2, 'personal': 2},
+        hourly_scrolling=COMMUTE_SCROLLER,
+        response_propensity={
+            'learning': {'acted': 1, 'clicked': 2, 'expanded': 2, 'dismissed': 5},
+            'health': {'acted': 2, 'clicked': 2, 'expanded': 1, 'dismissed': 5},
+            'personal': {'acted': 1, 'clicked': 1, 'expanded': 1, 'dismissed': 7},
+            'work': {'acted': 4, 'clicked': 2, 'expanded': 1, 'dismissed': 3},
+        },
+        mean_scrolling_time=45.0,
+    ),
+    UserProfile(
+        name="night_owl",
+        share=0.2,
+        task_count=3,
+        category_weights={'personal': 3, 'health': 3, 'learning': 2, 'work': 1},
+        hourly_scrolling=NIGHT_OWL,
+        response_propensity={
+            'learning': {'acted': 1, 'clicked': 1, 'expanded': 2, 'dismissed': 6},
+            'health': {'acted': 3, 'clicked': 1, 'expanded': 1, 'dismissed': 5},
+            'personal': {'acted': 2, 'clicked': 2, 'expanded': 2, 'dismissed': 4},
+            'work': {'acted': 1, 'clicked': 0, 'expanded': 1, 'dismissed': 8},
+        },
+        mean_scrolling_time=150.0,
+        fatigue=0.25,
+    ),
+]
+
+
+@dataclass
+class SimulatedUser:
+    """A simulated user bound to a database user and its tasks"""
+    user_id: int
+    profile: UserProfile
+    task_categories: Dict[int, str]
+    last_task_id: Optional[int] = None
+    repeat_count: int = 0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def _database_size(db) -> int:
+    """Size of every file of a (possibly sharded) database including write-ahead logs"""
+    paths = getattr(db, 'db_paths', [db.db_path])
+    return sum(os.path.getsize(path + suffix) for path in paths for suffix in ('', '-wal')
+               if os.path.exists(path + suffix))
+
+
+def _latency_summary(samples: List[float]) -> Dict:
+    """Summarize latency samples (seconds) in milliseconds"""
+    return {
+        'count': len(samples),
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p90_ms': percentile(samples, 90) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': (max(samples) if samples else 0.0) * 1000,
+    }
+
+
+class UserSimulator:
+    """Drives ScrollBreakerAI with a seeded, simulated user population"""
+
+    def __init__(self, config: SimulationConfig = None, ai_system: ScrollBreakerAI = None):
+        """Create the simulator; a fresh database is used unless ai_system is given"""
+        self.config = config or SimulationConfig()
+        self.rng = random.Random(self.config.seed)
+        self.ai_system = ai_system
+        self.users: List[SimulatedUser] = []
+        # Simulated wall clock used to build request contexts
+        self.clock = datetime(2024, 1, 1)
+
+    def setup(self) -> None:
+        """Create the system under test and populate users and tasks"""
+        if self.ai_system is None:
+            # Only the database, its shards and their sidecar files
+            stem, extension = os.path.splitext(self.config.db_path)
+            shard_file = re.compile(re.escape(stem) + r'\.shard\d+'
+                                    + re.escape(extension or '.db') + r'(-wal|-shm|-journal)?$')
+            paths = [self.config.db_path + suffix for suffix in ('',) + SIDECAR_SUFFIXES]
+            paths += [path for path in glob.glob(glob.escape(stem) + '.shard*')
+                      if shard_file.match(path)]
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.ai_system = ScrollBreakerAI(
+                db_path=self.config.db_path, llm_provider=self.config.llm_provider,
+                durability=self.config.durability, shards=self.config.shards,
+                selection_policy=self.config.selection_policy, in_memory=self.config.in_memory,
+                selection_seed=self.config.seed
+            )
+
+        db = self.ai_system.db
+        profiles = self.config.profiles
+        shares = [profile.share for profile in profiles]
+
+        for index in range(self.config.users):
+            profile = self.rng.choices(profiles, weights=shares)[0]
+            user_id = db.create_user(
+                f"sim_{profile.name}_{index}", f"sim_{index}@example.com",
+                {"simulated": True, "profile": profile.name}
+            )
+            task_count = self.config.tasks_per_user or profile.task_count
+            categories = list(profile.category_weights)
+            weights = list(profile.category_weights.values())
+            task_categories = {}
+            for _ in range(task_count):
+                category = self.rng.choices(categories, weights=weights)[0]
+                title, notes = self.rng.choice(TASK_LIBRARY[category])
+                task_id = db.create_task(
+                    user_id, title, category,
+                    importance=self.rng.randint(3, 10),
+                    notes=notes,
+                    task_type=self.rng.choice(['simple', 'complex'])
+                )
+                task_categories[task_id] = category
+            self.users.append(SimulatedUser(user_id, profile, task_categories))
+
+    def _next_request(self):
+        """Pick the next scrolling user and build its context"""
+        # Advance the simulated clock and let users scroll according to their habits
+        self.clock += timedelta(seconds=self.rng.expovariate(1 / 30.0))
+        hour = self.clock.hour
+        weights = [user.profile.hourly_scrolling[hour] + 0.01 for user in self.users]
+        user = self.rng.choices(self.users, weights=weights)[0]
+
+        context = {
+            'scrolling_time': int(self.rng.expovariate(1 / user.profile.mean_scrolling_time)) + 5,
+            'hour': hour,
+            'day_of_week': self.clock.weekday()
+        }
+        return user, context
+
+    def _simulate_action(self, user: SimulatedUser, task_id: int):
+        """Draw the user's reaction to a notification about a task"""
+        category = user.task_categories.get(task_id, 'work')
+        propensity = user.profile.response_propensity.get(category, {})
+
+        if task_id == user.last_task_id:
+            user.repeat_count += 1
+        else:
+            user.last_task_id = task_id
+            user.repeat_count = 0
+        damping = max(0.0, 1 - user.profile.fatigue * user.repeat_count)
+
+        weights = [
+            propensity.get(action, 1) * (damping if action in POSITIVE_ACTIONS else 1)
+            for action in USER_ACTIONS
+        ]
+        if sum(weights) <= 0:
+            weights = [0, 0, 0, 1]
+        action = self.rng.choices(USER_ACTIONS, weights=weights)[0]
+        response_time = self.rng.uniform(1.0, 20.0)
+        return category, action, response_time
+
+    def run(self) -> Dict:
+        """Run the simulation and return a report"""
+        # A caller-supplied system still needs its simulated users
+        if not self.users:
+            self.setup()
+
+        self.ai_system.db.flush()
+        # An in-memory database is written to its file so the size is comparable
+        self.ai_system.db.checkpoint()
+        db_size_before = _database_size(self.ai_system.db)
+
+        generate_latencies = []
+        respond_latencies = []
+        actions = {action: 0 for action in USER_ACTIONS}
+        by_category: Dict[str, Dict[str, int]] = {}
+        empty = 0
+
+        interval = 1.0 / self.config.target_rps if self.config.target_rps > 0 else 0.0
+        started = time.perf_counter()
+        next_due = started
+
+        for _ in range(self.config.requests):
+            if interval:
+                # Open-loop pacing: hold the schedule even if a request ran late
+                delay = next_due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_due += interval
+
+            user, context = self._next_request()
+
+            t0 = time.perf_counter()
+            notification = self.ai_system.generate_smart_notification(context, user_id=user.user_id)
+            generate_latencies.append(time.perf_counter() - t0)
+
+            if notification is None:
+                empty += 1
+                continue
+
+            category, action, response_time = self._simulate_action(user, notification.task_id)
+            t0 = time.perf_counter()
+            self.ai_system.process_user_response(
+                notification.notification_id, action, response_time,
+                {'was_expanded': action == 'expanded', **context}
+            )
+            respond_latencies.append(time.perf_counter() - t0)
+
+            actions[action] += 1
+            stats = by_category.setdefault(category, {'total': 0, 'positive': 0})
+            stats['total'] += 1
+            if action in POSITIVE_ACTIONS:
+                stats['positive'] += 1
+
+        elapsed = time.perf_counter() - started
+        self.ai_system.db.flush()
+        self.ai_system.db.checkpoint()
+        db_size_after = _database_size(self.ai_system.db)
+        responded = sum(actions.values())
+
+        return {
+            'config': {
+                'users': len(self.users),
+                'requests': self.config.requests,
+                'target_rps': self.config.target_rps,
+                'seed': self.config.seed,
+                'llm_provider': self.config.llm_provider,
+                'durability': self.ai_system.db.durability,
+                'in_memory': self.ai_system.db.in_memory,
+                'selection_policy': self.ai_system.selection_policy.name,
+            },
+            'throughput': {
+                'elapsed_s': elapsed,
+                'requests_per_s': self.config.requests / elapsed if elapsed > 0 else 0.0,
+            },
+            'latency': {
+                'generate': _latency_summary(generate_latencies),
+                'respond': _latency_summary(respond_latencies),
+            },
+            'database': {
+                'size_before_bytes': db_size_before,
+                'size_after_bytes': db_size_after,
+                'growth_bytes': db_size_after - db_size_before,
+                'bytes_per_request': ((db_size_after - db_size_before) / self.config.requests
+                                      if self.config.requests else 0.0),
+            },
+            'engagement': {
+                'actions': actions,
+                'no_notification': empty,
+                'positive_rate': (sum(actions[a] for a in POSITIVE_ACTIONS) / responded
+                                  if responded else 0.0),
+                'by_category': {
+                    category: {
+                        'total': stats['total'],
+                        'positive_rate': stats['positive'] / stats['total'],
+                    }
+                    for category, stats in sorted(by_category.items())
+                },
+            },
+        }
+
+
+def print_report(report: Dict) -> None:
+    """Print a human-readable simulation report"""
+    print("=== Simulation Report ===")
+    config = report['config']
+    print(f"Users: {config['users']}, requests: {config['requests']}, "
+          f"target rate: {config['target_rps'] or 'unthrottled'}, seed: {config['seed']}")
+    print(f"Selection policy: {config['selection_policy']}")
+
+    throughput = report['throughput']
+    print(f"\nThroughput: {throughput['requests_per_s']:.1f} req/s "
+          f"({throughput['elapsed_s']:.2f}s elapsed)")
+
+    print("\nLatency (ms):")
+    for name, summary in report['latency'].items():
+        print(f"- {name}: p50={summary['p50_ms']:.2f} p90={summary['p90_ms']:.2f} "
+              f"p99={summary['p99_ms']:.2f} max={summary['max_ms']:.2f} (n={summary['count']})")
+
+    database = report['database']
+    print(f"\nDatabase: {database['size_before_bytes']} -> {database['size_after_bytes']} bytes "
+          f"({database['bytes_per_request']:.0f} bytes/request)")
+
+    engagement = report['engagement']
+    print(f"\nPositive response rate: {engagement['positive_rate']:.1%}")
+    print(f"Actions: {engagement['actions']}")
+    for category, stats in engagement['by_category'].items():
+        print(f"- {category}: {stats['positive_rate']:.1%} positive ({stats['total']} responses)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate user load against ScrollBreakerAI")
+    parser.add_argument('--users', type=int, default=10, help="number of simulated users")
+    parser.add_argument('--requests', type=int, default=500, help="notifications to request")
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help="target requests per second (0 = unthrottled)")
+    parser.add_argument('--seed', type=int, default=42, help="random seed")
+    parser.add_argument('--tasks', type=int, default=None, help="tasks per user override")
+    parser.add_argument('--db', default="simulation.db", help="scratch database path")
+    parser.add_argument('--provider', default="none", help="LLM provider to use")
+    parser.add_argument('--durability', choices=['sync', 'batched'], default=None,
+                        help="database durability mode")
+    parser.add_argument('--in-memory', action='store_true', default=None,
+                        help="work on an in-memory copy of the database")
+    parser.add_argument('--shards', type=int, default=None, help="number of user shards")
+    parser.add_argument('--policy', choices=sorted(SELECTION_POLICIES), default=None,
+                        help="task selection policy")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--metrics', default=None,
+                        help="write span metrics to this path (.json or Prometheus text)")
+    parser.add_argument('--profile', choices=PROFILE_MODES, default=None,
+                        help="capture a cProfile or tracemalloc report of the run")
+    parser.add_argument('--profile-output', default="simulation.prof",
+                        help="where to write the profile report")
+    parser.add_argument('--log-level', default="WARNING", help="logging level")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
+    if args.metrics:
+        METRICS.enable()
+
+    config = SimulationConfig(
+        users=args.users,
+        requests=args.requests,
+        target_rps=args.rate,
+        seed=args.seed,
+        db_path=args.db,
+        llm_provider=args.provider,
+        tasks_per_user=args.tasks,
+        durability=args.durability,
+        in_memory=args.in_memory,
+        shards=args.shards,
+        selection_policy=args.policy,
+    )
+    simulator = UserSimulator(config)
+    simulator.setup()
+    if args.profile:
+        with capture_profile(args.profile, args.profile_output):
+            report = simulator.run()
+    else:
+        report = simulator.run()
+
+    simulator.ai_system.close()
+    if args.metrics:
+        METRICS.write(args.metrics)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Shared fixtures: every test works on databases in its own temporary directory"""
+import pytest
+
+from src.database.manager import DatabaseManager
+from src.instrumentation.metrics import METRICS
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture
+def db(db_path):
+    manager = DatabaseManager(db_path, durability='sync', engagement='table',
+                              shared_engagement=False, in_memory=False)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def metrics():
+    """Recorded metrics, reset before and after the test"""
+    enabled = METRICS.enabled
+    METRICS.reset()
+    METRICS.enable()
+    yield METRICS
+    METRICS.reset()
+    METRICS.enabled = enabled
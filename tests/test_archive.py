@@ -0,0 +1,55 @@
+import os
+import sqlite3
+from argparse import Namespace
+from datetime import datetime, timedelta, timezone
+
+from src.database import maintenance
+from src.database.archive import NotificationArchive
+from src.models.ids import NotificationIdGenerator
+from src.models.models import GeneratedNotification
+
+IDS = NotificationIdGenerator(9)
+
+
+def notify(store, task_id, count=3):
+    for _ in range(count):
+        store.save_notification(GeneratedNotification(
+            None, IDS.next_id(), task_id, "hook", None, "step", 0.5, 'template',
+            datetime.now()))
+
+
+def archive_all(db_path, archive_dir):
+    # Everything written so far lies beyond a one-day horizon two days from now
+    later = datetime.now(timezone.utc) + timedelta(days=2)
+    return NotificationArchive(db_path, archive_dir, horizon_days=1).archive(now=later)
+
+
+def test_segments_are_named_per_database(tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    first = NotificationArchive(str(tmp_path / "shard_0.db"), archive_dir)
+    second = NotificationArchive(str(tmp_path / "shard_1.db"), archive_dir)
+    assert first.segment_path('2024-05') != second.segment_path('2024-05')
+    assert first.segment_path('2024-05').endswith("shard_0.history_2024_05.db")
+
+
+def test_archived_rows_stay_queryable(db, tmp_path):
+    task_id = db.get_user_tasks(1)[0].id
+    notify(db, task_id)
+    moved = archive_all(db.db_path, str(tmp_path / "archive"))
+    assert moved['generated_notifications'] == 3
+
+    archive = NotificationArchive(db.db_path)
+    [(month, path)] = archive.segments()
+    assert os.path.exists(path)
+    with archive.history() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM history_generated_notifications").fetchone()
+    assert count[0] == 3
+
+
+def test_maintenance_archive_seeds_nothing(tmp_path):
+    db_path = str(tmp_path / "empty.db")
+    maintenance.archive(Namespace(db=db_path, archive_dir=str(tmp_path / "archive"),
+                                  horizon_days=1, vacuum=False))
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from src.models.models import GeneratedNotification, Task
+from src.notifications.dedup import NearDuplicateIndex, fingerprint, simhash
+from src.notifications.generator import LLMNotificationGenerator
+
+
+def _notification(hook, next_step="Open the notes for five minutes"):
+    return GeneratedNotification(None, 1, 1, hook, None, next_step, 0.8, 'template',
+                                 datetime(2024, 5, 1))
+
+
+def test_rewordings_are_near_duplicates():
+    index = NearDuplicateIndex(window=5, max_distance=10)
+    original = simhash("Your essay draft is waiting, finish the introduction tonight")
+    reworded = simhash("Your essay draft is waiting, finish the introduction today")
+    unrelated = simhash("Time for a ten minute walk before dinner with the dog")
+    index.add(1, original)
+    assert index.is_duplicate(1, reworded)
+    assert not index.is_duplicate(1, unrelated)
+    assert not index.is_duplicate(2, original)
+
+
+def test_window_forgets_the_oldest_notifications():
+    index = NearDuplicateIndex(window=2, max_distance=3)
+    prints = [simhash(f"completely different message number {word}")
+              for word in ("alpha", "bravo", "charlie")]
+    for fp in prints:
+        index.add(1, fp)
+    assert index.last_seen(1, prints[0]) is None
+    assert index.last_seen(1, prints[2]) == 0
+    assert index.export_state() == {1: prints[1:]}
+
+
+def test_choose_skips_duplicates_and_remembers_the_choice():
+    index = NearDuplicateIndex(window=5, max_distance=3)
+    served = _notification("Finish the chapter you started")
+    index.add(1, fingerprint(served))
+    fresh = _notification("Call the dentist about Thursday", "Dial the number now")
+    drawn = []
+
+    def candidates():
+        for candidate in (served, fresh, _notification("never drawn")):
+            drawn.append(candidate)
+            yield candidate
+
+    assert index.choose(1, candidates()) is fresh
+    assert len(drawn) == 2
+    assert index.is_duplicate(1, fingerprint(fresh))
+    # The same candidate is not served twice in a row
+    assert index.choose(1, iter([fresh, served])) is served
+
+
+def test_choose_falls_back_to_the_oldest_duplicate():
+    index = NearDuplicateIndex(window=5, max_distance=3)
+    older, newer = _notification("Finish the chapter"), _notification("Book the flight", "Go")
+    index.add(1, fingerprint(older))
+    index.add(1, fingerprint(newer))
+    assert index.choose(1, iter([newer, older])) is older
+
+
+def test_state_round_trips():
+    index = NearDuplicateIndex(window=3, max_distance=3)
+    for word in ("one", "two", "three", "four"):
+        index.add(7, simhash(f"message {word} of the day"))
+    restored = NearDuplicateIndex(window=3, max_distance=3)
+    restored.import_state(index.export_state())
+    assert restored.export_state() == index.export_state()
+
+
+def test_template_alternatives_are_not_counted_as_llm_fallbacks(metrics):
+    generator = LLMNotificationGenerator('none')
+    task = Task(1, 1, "Write report", "work", 4, "", "complex", None, None, True)
+    alternatives = list(generator.template_alternatives(task, {'scrolling_time': 300}))
+    assert alternatives
+    assert 'llm.fallback' not in metrics.snapshot()['counters']
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.engagement_log import EngagementLog
+from src.database.manager import DatabaseManager
+
+ACTIONS = ['dismissed', 'dismissed', 'clicked', 'acted', 'dismissed']
+
+
+@pytest.fixture
+def events_db(db_path):
+    manager = DatabaseManager(db_path, durability='sync', engagement='events',
+                              shared_engagement=False, in_memory=False)
+    yield manager
+    manager.close()
+
+
+def test_event_log_cannot_back_shared_engagement(db_path):
+    with pytest.raises(ValueError):
+        DatabaseManager(db_path, engagement='events', shared_engagement=True)
+
+
+def _record(log, tasks=(1, 2, 3)):
+    now = datetime(2024, 5, 1, 12, 0)
+    for step, action in enumerate(ACTIONS):
+        for task_id in tasks:
+            log.append(task_id, action, now + timedelta(minutes=step))
+
+
+def test_rebuild_matches_the_live_projection(events_db):
+    log = events_db._engagement_log
+    _record(log)
+    live = log.states()
+    assert live[1].consecutive_dismissals == 1
+
+    assert log.rebuild(from_snapshot=False) == len(ACTIONS) * 3
+    assert log.states() == live
+
+
+def test_snapshot_and_tail_are_not_applied_twice(events_db):
+    log = events_db._engagement_log
+    _record(log)
+    log.snapshot()
+    log.append(2, 'dismissed', datetime(2024, 5, 1, 13, 0))
+    live = log.states()
+
+    assert log.rebuild() == 1
+    assert log.states() == live
+    fresh = EngagementLog(events_db._connect)
+    assert fresh.states() == live
+
+
+def test_exported_state_restores_without_reading_the_log(events_db):
+    log = events_db._engagement_log
+    _record(log, tasks=(4,))
+
+    def refuse():
+        raise AssertionError("warm state must not touch the database")
+
+    restored = EngagementLog(refuse, state=log.export_state())
+    assert restored.states() == log.states()
+    assert restored.get(4) == log.get(4)
@@ -0,0 +1,79 @@
+import glob
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from src.database.export import WATERMARK_FILE, HistoryExporter
+from src.models.ids import NotificationIdGenerator
+from src.models.models import GeneratedNotification, NotificationResponse
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+IDS = NotificationIdGenerator(7)
+
+
+def _respond(db, task_id, action, context):
+    notification_id = IDS.next_id()
+    db.save_notification(GeneratedNotification(
+        None, notification_id, task_id, "hook", None, "step", 0.5, 'template', datetime.now(),
+        llm_prompt_used="prompt"))
+    db.save_response(NotificationResponse(None, notification_id, task_id, action, 1.5,
+                                          action == 'expanded', datetime.now(), context))
+    return notification_id
+
+
+def _read(output_dir, table):
+    [path] = glob.glob(os.path.join(output_dir, table, "*.parquet"))
+    rows = pq.read_table(path).to_pylist()
+    os.remove(path)
+    return rows
+
+
+def test_parquet_output_flattens_the_response_context(db, tmp_path):
+    task_id = db.get_user_tasks(1)[0].id
+    notification_id = _respond(db, task_id, 'expanded',
+                               {'scrolling_time': 120, 'hour': 21, 'app': 'feed'})
+    output = str(tmp_path / "export")
+    written = HistoryExporter(db.db_path, output).export()
+    assert written['generated_notifications'] == written['notification_responses'] == 1
+
+    [notification] = _read(output, 'generated_notifications')
+    assert notification['notification_id'] == notification_id
+    assert 'llm_prompt_used' not in notification
+    assert isinstance(notification['timestamp'], datetime)
+
+    [response] = _read(output, 'notification_responses')
+    assert (response['user_action'], response['was_expanded']) == ('expanded', True)
+    assert (response['context_scrolling_time'], response['context_hour']) == (120, 21)
+    assert response['context_day_of_week'] is None
+    assert json.loads(response['context_extra']) == {'app': 'feed'}
+
+
+def test_incremental_runs_export_only_new_rows(db, tmp_path):
+    task_id = db.get_user_tasks(1)[0].id
+    output = str(tmp_path / "export")
+    exporter = HistoryExporter(db.db_path, output, batch_size=1)
+    tables = ['generated_notifications', 'notification_responses']
+
+    first = [_respond(db, task_id, 'clicked', {}) for _ in range(3)]
+    assert exporter.export(tables, incremental=True) == {table: 3 for table in tables}
+    assert [row['notification_id'] for row in _read(output, tables[0])] == first
+    watermarks = exporter.load_watermarks()
+    assert os.path.exists(os.path.join(output, WATERMARK_FILE))
+
+    second = [_respond(db, task_id, 'dismissed', {}) for _ in range(2)]
+    assert exporter.export(tables, incremental=True) == {table: 2 for table in tables}
+    assert [row['notification_id'] for row in _read(output, tables[0])] == second
+    assert exporter.load_watermarks()[tables[0]] > watermarks[tables[0]]
+
+    assert exporter.export(tables, incremental=True) == {table: 0 for table in tables}
+    assert exporter.export(tables) == {table: 5 for table in tables}
+
+
+def test_unknown_tables_and_formats_are_rejected(db, tmp_path):
+    with pytest.raises(ValueError):
+        HistoryExporter(db.db_path, str(tmp_path), file_format='csv')
+    with pytest.raises(ValueError):
+        HistoryExporter(db.db_path, str(tmp_path)).export(['users'])
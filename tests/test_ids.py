@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+from src.database.manager import DatabaseManager
+from src.models import ids
+from src.models.ids import (
+    LEGACY_WORKER_ID, NotificationIdGenerator, format_notification_id, id_timestamp,
+    legacy_notification_id, parse_notification_id
+)
+
+# Two pre-migration text IDs of the same millisecond whose hashed sequence
+# numbers collide
+COLLIDING = ("notif_1_1700000000000_81", "notif_1_1700000000000_340")
+
+
+def test_generated_ids_are_unique_and_increasing():
+    generator = NotificationIdGenerator(5)
+    generated = [generator.next_id() for _ in range(10_000)]
+    assert generated == sorted(generated)
+    assert len(set(generated)) == len(generated)
+
+
+def test_worker_ids_keep_ids_apart():
+    first, second = NotificationIdGenerator(1), NotificationIdGenerator(2)
+    assert not {first.next_id() for _ in range(1000)} & {second.next_id() for _ in range(1000)}
+
+
+def test_legacy_worker_id_is_reserved():
+    with pytest.raises(ValueError):
+        NotificationIdGenerator(LEGACY_WORKER_ID)
+
+
+def test_text_form_round_trips_and_sorts_like_the_integers():
+    generator = NotificationIdGenerator(3)
+    generated = [generator.next_id() for _ in range(100)]
+    texts = [format_notification_id(value) for value in generated]
+    assert [parse_notification_id(text) for text in texts] == generated
+    assert texts == sorted(texts)
+    assert parse_notification_id(texts[0].lower()) == generated[0]
+
+
+def test_invalid_text_is_rejected():
+    with pytest.raises(ValueError):
+        parse_notification_id("not-an-id")
+
+
+def test_legacy_ids_keep_their_millisecond():
+    assert id_timestamp(legacy_notification_id(COLLIDING[0])).year == 2023
+    assert legacy_notification_id(COLLIDING[0]) == legacy_notification_id(COLLIDING[1])
+
+
+def test_leasing_requires_a_worker_id_without_file_locks(monkeypatch):
+    monkeypatch.setattr(ids, 'ID_WORKER_ID', None)
+    monkeypatch.setitem(sys.modules, 'fcntl', None)
+    with pytest.raises(RuntimeError, match="ID_WORKER_ID"):
+        ids._lease_worker_id()
+    monkeypatch.setattr(ids, 'ID_WORKER_ID', 12)
+    assert ids._lease_worker_id() == 12
+
+
+def _forked_worker_id() -> str:
+    """Worker id a forked child generates IDs with, or its error"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            message = str(ids._process_generator().worker_id)
+        except RuntimeError as e:
+            message = f"error: {e}"
+        os.write(write_fd, message.encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        message = pipe.read()
+    os.waitpid(pid, 0)
+    return message
+
+
+@pytest.fixture
+def fresh_generator(monkeypatch, tmp_path):
+    """This process's ID generator, leased from a private lease directory"""
+    monkeypatch.setattr(ids, 'ID_LEASE_DIR', str(tmp_path / "leases"))
+    monkeypatch.setattr(ids, '_generator', None)
+    monkeypatch.setattr(ids, '_lease_fd', None)
+    yield
+    if ids._lease_fd is not None:
+        os.close(ids._lease_fd)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_forked_children_lease_their_own_worker_id(monkeypatch, fresh_generator):
+    monkeypatch.setattr(ids, 'ID_WORKER_ID', None)
+    parent = ids._process_generator().worker_id
+    child = _forked_worker_id()
+    assert child.isdigit() and int(child) != parent
+    assert ids._process_generator().worker_id == parent
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_forked_children_refuse_a_fixed_worker_id(monkeypatch, fresh_generator):
+    monkeypatch.setattr(ids, 'ID_WORKER_ID', 12)
+    assert ids._process_generator().worker_id == 12
+    assert _forked_worker_id().startswith("error: ID_WORKER_ID 12")
+
+
+def test_migration_resolves_collisions_through_the_recorded_mapping(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE generated_notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            notification_id TEXT UNIQUE NOT NULL,
+            task_id INTEGER NOT NULL,
+            hook_message TEXT NOT NULL,
+            expanded_content TEXT,
+            next_step TEXT NOT NULL,
+            confidence_score REAL NOT NULL,
+            generation_strategy TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE notification_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            notification_id TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            user_action TEXT NOT NULL,
+            response_time REAL NOT NULL,
+            was_expanded BOOLEAN NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for text in COLLIDING:
+        conn.execute("INSERT INTO generated_notifications (notification_id, task_id, "
+                     "hook_message, next_step, confidence_score, generation_strategy) "
+                     "VALUES (?, 1, 'hook', 'step', 0.5, 'template')", (text,))
+        conn.execute("INSERT INTO notification_responses (notification_id, task_id, "
+                     "user_action, response_time, was_expanded) "
+                     "VALUES (?, 1, 'clicked', 1.0, 0)", (text,))
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(db_path, durability='sync', engagement='table',
+                         shared_engagement=False, in_memory=False)
+    try:
+        resolved = [parse_notification_id(text, db.resolve_legacy_notification_id)
+                    for text in COLLIDING]
+        assert len(set(resolved)) == 2
+        conn = sqlite3.connect(db_path)
+        stored = [row[0] for row in conn.execute(
+            "SELECT notification_id FROM generated_notifications ORDER BY id")]
+        responded = [row[0] for row in conn.execute(
+            "SELECT notification_id FROM notification_responses ORDER BY id")]
+        conn.close()
+        assert resolved == stored == responded
+    finally:
+        db.close()
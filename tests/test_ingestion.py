@@ -0,0 +1,29 @@
+import pytest
+
+from src.core.scroll_breaker import ScrollBreakerAI
+
+
+def _scrolling(user_id, start=1_700_000_000.0, seconds=90):
+    """A session long enough to trigger a notification"""
+    return [(user_id, start + offset, 'scroll') for offset in range(0, seconds, 5)]
+
+
+@pytest.fixture
+def ai(db_path):
+    system = ScrollBreakerAI(db_path, llm_provider='none', durability='sync', shards=1,
+                             warm_start=False)
+    yield system
+    system.close()
+
+
+def test_ingestion_defers_triggers_beyond_the_limit(ai):
+    events = _scrolling(1) + _scrolling(1001) + _scrolling(1002)
+    notifications, deferred = ai.ingest_events(events, max_notifications=1)
+    assert [n.task_id for n in notifications] and len(deferred) == 2
+    assert {user_id for user_id, _ in deferred} == {1001, 1002}
+    assert all(context['scrolling_time'] >= 60 for _, context in deferred)
+
+
+def test_ingestion_defers_everything_past_the_deadline(ai):
+    notifications, deferred = ai.ingest_events(_scrolling(1), deadline=0.0)
+    assert notifications == [] and [user_id for user_id, _ in deferred] == [1]
@@ -0,0 +1,89 @@
+import sqlite3
+from argparse import Namespace
+
+import pytest
+
+from src.database import maintenance
+from src.database.manager import DatabaseManager
+from src.database.memory import InMemoryDatabase, check_no_memory_owner
+
+
+def in_memory(db_path) -> DatabaseManager:
+    return DatabaseManager(db_path, durability='sync', seed=False, engagement='table',
+                           shared_engagement=False, in_memory=True)
+
+
+def usernames(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT username FROM users ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_checkpoints_write_the_file_and_reload(db_path):
+    db = in_memory(db_path)
+    try:
+        db.create_user("ada", "ada@example.com")
+        assert db.checkpoint()
+        assert usernames(db_path) == ["ada"]
+        # Nothing changed since
+        assert not db.checkpoint()
+        db.create_user("grace", "grace@example.com")
+        assert usernames(db_path) == ["ada"]
+    finally:
+        db.close()
+    assert usernames(db_path) == ["ada", "grace"]
+
+    db = in_memory(db_path)
+    try:
+        conn = db._connect()
+        assert [row[0] for row in conn.execute("SELECT username FROM users ORDER BY id")] == \
+            ["ada", "grace"]
+        conn.close()
+    finally:
+        db.close()
+
+
+def test_forced_checkpoint_and_interval(db_path):
+    memory = InMemoryDatabase(db_path, checkpoint_interval=0)
+    try:
+        conn = memory.connect()
+        conn.execute("CREATE TABLE items (value INTEGER)")
+        conn.commit()
+        conn.close()
+        assert memory.checkpoint()
+        assert not memory.checkpoint()
+        assert memory.checkpoint(force=True)
+        assert memory._thread is None
+    finally:
+        memory.close()
+
+
+def test_maintenance_refuses_a_database_open_in_memory(db_path):
+    db = in_memory(db_path)
+    try:
+        with pytest.raises(RuntimeError, match="open in memory"):
+            check_no_memory_owner(db_path)
+        with pytest.raises(RuntimeError, match="already open in memory"):
+            InMemoryDatabase(db_path)
+        with pytest.raises(RuntimeError, match="open in memory"):
+            maintenance.backfill_rollups(Namespace(db=db_path))
+        with pytest.raises(RuntimeError, match="open in memory"):
+            maintenance.archive(Namespace(db=db_path, archive_dir=None, horizon_days=None,
+                                          vacuum=False))
+    finally:
+        db.close()
+    check_no_memory_owner(db_path)
+    maintenance.backfill_rollups(Namespace(db=db_path))
+
+
+def test_split_shard_refuses_a_shard_open_in_memory(tmp_path):
+    store_path = str(tmp_path / "store.db")
+    maintenance.split_shard(Namespace(db=store_path, shard=0))
+    memory = InMemoryDatabase(str(tmp_path / "store.shard1.db"))
+    try:
+        with pytest.raises(RuntimeError, match="store.shard1.db is open in memory"):
+            maintenance.split_shard(Namespace(db=store_path, shard=1))
+    finally:
+        memory.close()
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from src.instrumentation.metrics import (
+    LATENCY_BUCKETS, METRIC_PREFIX, MetricsRegistry, instrumented, timed
+)
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry(enabled=True)
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+    registry.observe("db.query", 0.01)
+    registry.increment("llm.fallback")
+    with registry.span("llm.generate"):
+        pass
+    assert registry.snapshot() == {'spans': {}, 'counters': {}, 'gauges': {}}
+
+
+def test_histogram_quantiles_use_bucket_bounds(registry):
+    for value in (0.0002, 0.0003, 0.004, 0.2):
+        registry.observe("db.query", value)
+    summary = registry.snapshot()['spans']['db.query']
+    assert summary['count'] == 4
+    assert summary['p50'] == 0.0005
+    assert summary['p99'] == 0.2
+    assert summary['max'] == 0.2
+
+
+def test_prometheus_rendering(registry):
+    registry.observe("db.query", 0.0003)
+    registry.observe("db.query", 100.0)
+    registry.increment("llm.fallback", 2)
+    registry.set_gauge("db.outbox.queue_depth", 5)
+    lines = registry.to_prometheus().splitlines()
+
+    span = f"{METRIC_PREFIX}_span_seconds"
+    assert f"# TYPE {span} histogram" in lines
+    buckets = [line for line in lines if line.startswith(f"{span}_bucket")]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    assert f'{span}_bucket{{span="db.query",le="0.0005"}} 1' in lines
+    assert f'{span}_bucket{{span="db.query",le="30.0"}} 1' in lines
+    assert f'{span}_bucket{{span="db.query",le="+Inf"}} 2' in lines
+    assert f'{span}_count{{span="db.query"}} 2' in lines
+    counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+    assert counts == sorted(counts)
+
+    assert f"# TYPE {METRIC_PREFIX}_events_total counter" in lines
+    assert f'{METRIC_PREFIX}_events_total{{name="llm.fallback"}} 2' in lines
+    assert f'{METRIC_PREFIX}_gauge{{name="db.outbox.queue_depth"}} 5' in lines
+
+
+def test_write_picks_the_format_from_the_extension(registry, tmp_path):
+    registry.increment("requests")
+    registry.write(str(tmp_path / "metrics.json"))
+    registry.write(str(tmp_path / "metrics.prom"))
+    assert json.loads((tmp_path / "metrics.json").read_text())['counters'] == {'requests': 1}
+    assert "# TYPE" in (tmp_path / "metrics.prom").read_text()
+
+
+def test_failures_are_counted_per_span(registry):
+    @timed("llm.generate", registry)
+    def generate():
+        raise TimeoutError
+
+    with pytest.raises(TimeoutError):
+        generate()
+    with pytest.raises(KeyError):
+        with registry.span("db.query"):
+            raise KeyError
+    snapshot = registry.snapshot()
+    assert snapshot['counters'] == {'llm.generate.errors': 1, 'db.query.errors': 1}
+    assert set(snapshot['spans']) == {'llm.generate', 'db.query'}
+
+
+def test_instrumented_times_every_method(registry):
+    @instrumented("store", registry)
+    class Store:
+        def get(self):
+            return 1
+
+        def _put(self):
+            return 2
+
+    store = Store()
+    assert (store.get(), store._put()) == (1, 2)
+    assert set(registry.snapshot()['spans']) == {'store.get', 'store.put'}
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+from src.models.models import GeneratedNotification, Task, task_from_row
+
+
+def test_models_have_no_instance_dict():
+    task = Task(1, 1, "Read", "learning", 5, "", "simple", datetime.now(), datetime.now())
+    assert not hasattr(task, '__dict__')
+    with pytest.raises(AttributeError):
+        task.unknown = 1
+
+
+def test_timestamp_strings_are_parsed_on_first_access():
+    notification = GeneratedNotification(None, 1, 1, "hook", None, "step", 0.5, 'template',
+                                         "2024-05-01 12:30:00")
+    assert notification.timestamp == datetime(2024, 5, 1, 12, 30)
+    assert notification.timestamp is notification.timestamp
+    notification.timestamp = "2024-06-01 08:00:00"
+    assert notification.timestamp == datetime(2024, 6, 1, 8)
+
+
+def test_tasks_map_from_rows(db):
+    tasks = db.get_user_tasks(1)
+    assert tasks and all(isinstance(task, Task) for task in tasks)
+    assert all(task.is_active is True for task in tasks)
+    assert all(isinstance(task.created_at, datetime) for task in tasks)
+    row = (4, 1, "Read", "learning", 5, "notes", "simple",
+           "2024-05-01 12:00:00", "2024-05-02 12:00:00", 0)
+    task = task_from_row(None, row)
+    assert (task.id, task.title, task.is_active) == (4, "Read", False)
+    assert task.updated_at == datetime(2024, 5, 2, 12)
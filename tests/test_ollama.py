@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import pytest
+import requests
+
+from src.models.models import Task
+from src.notifications.generator import SYSTEM_PROMPT, LLMNotificationGenerator
+from src.notifications.providers import OllamaProvider, ProviderError, ProviderRateLimited
+
+ANSWER = {
+    'response': '{"hook": "Write one paragraph", "next_step": "Open the draft", '
+                '"confidence": 0.8',
+    'prompt_eval_count': 42, 'prompt_eval_duration': 20_000_000,
+    'eval_count': 30, 'eval_duration': 300_000_000,
+}
+
+
+class FakeResponse:
+    def __init__(self, status: int, body: dict):
+        self.status_code = status
+        self.body = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Records request bodies and answers with ``response`` (or raises it)"""
+
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def post(self, url, json, timeout):
+        self.requests.append(json)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+    def close(self):
+        pass
+
+
+def provider(response) -> OllamaProvider:
+    ollama = OllamaProvider(host="http://ollama:11434", model="llama3", keep_alive="1h")
+    ollama.session = FakeSession(response)
+    return ollama
+
+
+def task(task_id: int, title: str) -> Task:
+    now = datetime(2026, 1, 1)
+    return Task(id=task_id, user_id=1, title=title, category='learning', importance=7,
+                notes="finished the basics", task_type='complex',
+                created_at=now, updated_at=now)
+
+
+def test_requests_keep_the_model_loaded_and_share_the_system_prompt(metrics):
+    generator = LLMNotificationGenerator('none')
+    generator.backend = ollama = provider(FakeResponse(200, ANSWER))
+    context = {'hour': 20, 'scrolling_time': 300}
+    for notified in (task(1, "Write thesis"), task(2, "Learn Spanish")):
+        notification = generator.generate_notification(notified, context)
+        assert notification.generation_strategy == "ollama_generated"
+        assert notification.hook_message == "Write one paragraph"
+
+    first, second = ollama.session.requests
+    assert first['keep_alive'] == second['keep_alive'] == "1h"
+    assert first['model'] == "llama3"
+    # The fixed instructions go in the system prompt; only the task part varies
+    assert first['system'] == second['system'] == SYSTEM_PROMPT
+    assert first['options'] == second['options']
+    assert SYSTEM_PROMPT not in first['prompt']
+    assert "Write thesis" in first['prompt'] and "Learn Spanish" in second['prompt']
+
+    snapshot = metrics.snapshot()
+    assert snapshot['counters']['llm.ollama.prompt_eval_tokens'] == 84
+    assert snapshot['counters']['llm.ollama.eval_tokens'] == 60
+    assert snapshot['spans']['llm.ollama.eval']['count'] == 2
+
+
+def test_health_loads_the_model_with_one_token():
+    ollama = provider(FakeResponse(200, {'response': ''}))
+    assert ollama.health(SYSTEM_PROMPT)
+    request, = ollama.session.requests
+    assert request['options']['num_predict'] == 1
+    assert request['system'] == SYSTEM_PROMPT
+    assert request['keep_alive'] == "1h"
+
+
+@pytest.mark.parametrize('response, error', [
+    (FakeResponse(429, {}), ProviderRateLimited),
+    (FakeResponse(500, {}), ProviderError),
+    (requests.ConnectionError("refused"), ProviderError),
+])
+def test_request_failures_raise_provider_errors(response, error):
+    ollama = provider(response)
+    with pytest.raises(error):
+        ollama.generate("prompt", SYSTEM_PROMPT)
+    assert not ollama.health(SYSTEM_PROMPT)
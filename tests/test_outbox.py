@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src.database.outbox import WriteBehindOutbox
+
+
+def _outbox(path, **options):
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE IF NOT EXISTS rows (value TEXT NOT NULL)")
+        return conn
+
+    def apply(cursor, entry):
+        kind, item = entry
+        cursor.execute("INSERT INTO rows (value) VALUES (?)", (item,))
+
+    return WriteBehindOutbox(connect, apply, flush_interval=0.001, **options)
+
+
+def _values(path):
+    conn = sqlite3.connect(path)
+    values = [row[0] for row in conn.execute("SELECT value FROM rows ORDER BY rowid")]
+    conn.close()
+    return values
+
+
+def test_flush_commits_everything_submitted(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    outbox = _outbox(path)
+    for i in range(50):
+        outbox.submit('row', str(i))
+    assert outbox.flush(timeout=5)
+    assert _values(path) == [str(i) for i in range(50)]
+    assert outbox.close()
+
+
+def test_pending_notifications_are_visible_until_committed(tmp_path):
+    outbox = _outbox(str(tmp_path / "outbox.db"))
+    outbox.submit('row', 'a', notification_id=7, task_id=3)
+    assert outbox.pending_task_id(7) in (3, None)
+    assert outbox.flush(timeout=5)
+    assert outbox.pending_task_id(7) is None
+    assert outbox.close()
+
+
+def test_unserializable_item_does_not_stop_the_writer(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    outbox = _outbox(path)
+    outbox.submit('row', 'before')
+    outbox.submit('row', object())  # not a type sqlite3 can bind
+    outbox.submit('row', 'after')
+    assert outbox.flush(timeout=5)
+    outbox.submit('row', 'later')
+    assert outbox.flush(timeout=5)
+    assert _values(path) == ['before', 'after', 'later']
+    assert outbox.close()
+
+
+def test_flush_and_close_report_stranded_writes(tmp_path):
+    def connect():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    outbox = WriteBehindOutbox(connect, lambda cursor, entry: None)
+    outbox._thread.join(timeout=5)
+    outbox.submit('row', 'stranded')
+    assert outbox.flush(timeout=1) is False
+    assert outbox.close() is False
+
+
+class _WriterCrash(BaseException):
+    """Escapes the writer's error handling, like an interpreter-level failure"""
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_flush_commits_what_a_dead_writer_left_queued(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    release = threading.Event()
+
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE IF NOT EXISTS rows (value TEXT NOT NULL)")
+        return conn
+
+    def apply(cursor, entry):
+        if entry[1] == 'crash':
+            release.wait()
+            raise _WriterCrash()
+        cursor.execute("INSERT INTO rows (value) VALUES (?)", (entry[1],))
+
+    outbox = WriteBehindOutbox(connect, apply, batch_size=1, flush_interval=0.001)
+    outbox.submit('row', 'crash')
+    outbox.submit('row', 'after')
+    threading.Timer(0.2, release.set).start()
+    started = time.monotonic()
+    assert outbox.flush()  # queued behind the crash, without a timeout
+    assert time.monotonic() - started < 5
+    assert not outbox._thread.is_alive()
+    assert _values(path) == ['after']
+    outbox.submit('row', 'later')
+    assert outbox.close()
+    assert _values(path) == ['after', 'later']
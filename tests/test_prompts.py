@@ -0,0 +1,67 @@
+import random
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.models import Task
+from src.notifications.generator import PROGRESS_KEYWORDS, LLMNotificationGenerator
+
+
+@pytest.fixture
+def generator():
+    return LLMNotificationGenerator('none')
+
+
+def keyword_scan(notes: str) -> str:
+    """The keyword-list scan the precompiled pattern replaced"""
+    notes = notes.lower()
+    for level in ('advanced', 'intermediate', 'beginner'):
+        if any(keyword in notes for keyword in PROGRESS_KEYWORDS[level]):
+            return level
+    return 'beginner'
+
+
+def test_progress_pattern_matches_keyword_scan(generator):
+    keywords = [keyword for words in PROGRESS_KEYWORDS.values() for keyword in words]
+    fragments = keywords + [word.upper() for word in keywords] + [
+        "notes", " ", "almost", "done", "half", "way", "work", "on", "new", "to",
+        "basics", "Finish", "ing",
+    ]
+    rng = random.Random(3)
+    samples = ["", "nothing relevant", "ALMOST DONE", "Just Started, currently halfway"]
+    samples += ["".join(rng.choices(fragments, k=rng.randint(1, 6))) for _ in range(2000)]
+    for notes in samples:
+        assert generator._analyze_progress_level(notes) == keyword_scan(notes), notes
+
+
+def test_task_prompt_cached_per_task_version(generator, metrics):
+    created = datetime(2026, 1, 1)
+    task = Task(id=5, user_id=1, title="Write thesis", category='learning', importance=8,
+                notes="just started", task_type='complex',
+                created_at=created, updated_at=created)
+    first = generator._task_prompt(task)
+    assert generator._task_prompt(task) is first
+    assert metrics.snapshot()['counters']['llm.prompt_cache.miss'] == 1
+
+    edited = replace(task, notes="almost done", updated_at=created + timedelta(hours=1))
+    prompt = generator._task_prompt(edited)
+    assert metrics.snapshot()['counters']['llm.prompt_cache.miss'] == 2
+    assert "Progress Level: advanced" in prompt and "almost done" in prompt
+
+    # Unsaved tasks have no version to cache under
+    generator._task_prompt(replace(task, id=None))
+    generator._task_prompt(replace(task, id=None))
+    assert metrics.snapshot()['counters']['llm.prompt_cache.miss'] == 4
+
+
+def test_prompt_suffix_changes_without_a_cache_miss(generator, metrics):
+    created = datetime(2026, 1, 1)
+    task = Task(id=6, user_id=1, title="Run", category='health', importance=5,
+                notes="", task_type='complex', created_at=created, updated_at=created)
+    morning = generator._build_llm_prompt(task, {'hour': 8, 'scrolling_time': 60})
+    evening = generator._build_llm_prompt(task, {'hour': 20, 'scrolling_time': 600},
+                                          {'total': 4, 'positive': 1})
+    assert "Time of day: morning" in morning and "Time of day: evening" in evening
+    assert "600 seconds" in evening and "25.0%" in evening
+    assert metrics.snapshot()['counters']['llm.prompt_cache.miss'] == 1
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from src.models.models import Task
+from src.notifications.generator import SYSTEM_PROMPT, LLMNotificationGenerator
+from src.notifications.providers import (
+    ProviderError, ProviderRateLimited, StubProvider, create_provider
+)
+
+TASK = Task(id=3, user_id=1, title="Practice piano", category='personal', importance=6,
+            notes="halfway through the book", task_type='complex',
+            created_at=datetime(2026, 1, 1), updated_at=datetime(2026, 1, 1))
+CONTEXT = {'hour': 19, 'scrolling_time': 240}
+
+
+def stub(**rates) -> StubProvider:
+    return StubProvider(latency_ms=0, seed=1, **rates)
+
+
+def generator_with(backend) -> LLMNotificationGenerator:
+    generator = LLMNotificationGenerator('none')
+    generator.backend = backend
+    return generator
+
+
+def test_answers_are_notification_json_about_the_task():
+    generator = generator_with(None)
+    prompt = generator._build_llm_prompt(TASK, CONTEXT)
+    data = json.loads(stub().generate(prompt, SYSTEM_PROMPT))
+    assert set(data) == {'hook', 'next_step', 'expanded_content', 'confidence'}
+    assert "Practice piano" in data['hook'] + data['next_step']
+    assert 0.6 <= data['confidence'] <= 0.95
+
+
+def test_same_seed_same_answers():
+    first, second = stub(malformed_rate=0.5), stub(malformed_rate=0.5)
+    assert ([first.generate("Task: Run", "") for _ in range(20)] ==
+            [second.generate("Task: Run", "") for _ in range(20)])
+
+
+def test_failure_rates_are_honoured():
+    provider = stub(error_rate=0.2, rate_limit_rate=0.1, malformed_rate=0.3)
+    outcomes = {'error': 0, 'rate_limited': 0, 'malformed': 0, 'ok': 0}
+    for _ in range(4000):
+        try:
+            text = provider.generate("Task: Run", "")
+        except ProviderRateLimited:
+            outcomes['rate_limited'] += 1
+            continue
+        except ProviderError:
+            outcomes['error'] += 1
+            continue
+        try:
+            json.loads(text)
+            outcomes['ok'] += 1
+        except json.JSONDecodeError:
+            outcomes['malformed'] += 1
+    assert outcomes['rate_limited'] / 4000 == pytest.approx(0.1, abs=0.02)
+    assert outcomes['error'] / 4000 == pytest.approx(0.2, abs=0.02)
+    assert outcomes['malformed'] / 4000 == pytest.approx(0.3, abs=0.03)
+
+
+def test_errors_fall_back_to_templates(metrics):
+    generator = generator_with(stub(error_rate=1))
+    with pytest.raises(ProviderError):
+        asyncio.run(generator.backend.agenerate("Task: Run", SYSTEM_PROMPT))
+    notification = generator.generate_notification(TASK, CONTEXT)
+    assert notification.generation_strategy != "stub_generated"
+    assert metrics.snapshot()['counters']['llm.fallback'] == 1
+
+
+def test_rate_limits_are_reported(metrics):
+    generator = generator_with(stub(rate_limit_rate=1))
+    limited = []
+    generator.on_rate_limit = lambda: limited.append(True)
+    generator.generate_notification(TASK, CONTEXT)
+    assert limited == [True]
+    assert metrics.snapshot()['counters']['llm.rate_limited'] == 1
+
+
+def test_malformed_output_is_parsed_leniently(metrics):
+    generator = generator_with(stub(malformed_rate=1))
+    for _ in range(10):
+        notification = generator.generate_notification(TASK, CONTEXT)
+        assert notification.generation_strategy == "stub_generated"
+        assert notification.hook_message and notification.next_step
+    assert metrics.snapshot()['counters']['llm.parse_errors'] == 10
+
+
+def test_create_provider():
+    assert create_provider('none') is None
+    assert isinstance(create_provider('stub', latency_ms=0), StubProvider)
+    with pytest.raises(ValueError):
+        create_provider('unknown')
@@ -0,0 +1,31 @@
+import time
+
+from src.notifications.queue import TokenBucket
+
+
+def test_unlimited_rate_never_waits():
+    bucket = TokenBucket(0)
+    assert all(bucket.acquire(time.monotonic()) for _ in range(100))
+
+
+def test_reserve_is_clamped_to_the_burst():
+    # A one-token bucket cannot hold a token back for anyone; refills must
+    # still be served instead of waiting for a second token that never comes
+    bucket = TokenBucket(rate=20, burst=1)
+    assert bucket.acquire(time.monotonic(), reserve=1.0)
+    assert bucket.acquire(time.monotonic() + 1, reserve=1.0)
+
+
+def test_reserve_leaves_tokens_for_other_callers():
+    bucket = TokenBucket(rate=0.001, burst=3)
+    deadline = time.monotonic()
+    assert bucket.acquire(deadline, reserve=2)
+    assert not bucket.acquire(deadline, reserve=2)
+    assert bucket.acquire(deadline)
+
+
+def test_penalize_blocks_until_it_expires():
+    bucket = TokenBucket(rate=1000, burst=5)
+    bucket.penalize(0.05)
+    assert not bucket.acquire(time.monotonic())
+    assert bucket.acquire(time.monotonic() + 1)
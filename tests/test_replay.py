@@ -0,0 +1,109 @@
+import sqlite3
+
+import pytest
+
+from src.core.selection import SelectionPolicy
+from src.database.manager import DatabaseManager
+from src.simulation.replay import PolicyEstimate, ReplayEngine
+
+
+class FixedPolicy(SelectionPolicy):
+    """Always picks ``task_id``, recording what it was offered and saw"""
+    name = 'fixed'
+
+    def __init__(self, store, task_id):
+        super().__init__(store)
+        self.task_id = task_id
+        self.offered = []
+        self.seen_responses = []
+
+    def select(self, tasks, context):
+        self.offered.append(sorted(task.id for task in tasks))
+        self.seen_responses.append(self.store.get_task_performance(self.task_id)['total'])
+        return next(task for task in tasks if task.id == self.task_id), 1.0
+
+
+def build_history(db_path, decisions, inactive=()):
+    """Two tasks for user 1 and ``decisions`` as (task_id, at, propensity,
+    action or None, responded at)"""
+    DatabaseManager(db_path, durability='sync', seed=False, engagement='table',
+                    shared_engagement=False, in_memory=False).close()
+    conn = sqlite3.connect(db_path)
+    for task_id in (1, 2):
+        conn.execute('''
+            INSERT INTO tasks (id, user_id, title, category, importance, task_type,
+                               created_at, is_active)
+            VALUES (?, 1, ?, 'work', 5, 'simple', '2026-01-01 00:00:00', ?)
+        ''', (task_id, f"Task {task_id}", task_id not in inactive))
+    for notification_id, (task_id, at, propensity, action, responded_at) in \
+            enumerate(decisions, 1):
+        conn.execute('''
+            INSERT INTO generated_notifications
+                (notification_id, task_id, hook_message, next_step, confidence_score,
+                 generation_strategy, timestamp, context_key, selection_propensity)
+            VALUES (?, ?, 'hook', 'step', 0.5, 'test', ?, 'evening', ?)
+        ''', (notification_id, task_id, at, propensity))
+        if action is not None:
+            conn.execute('''
+                INSERT INTO notification_responses
+                    (notification_id, task_id, user_action, response_time,
+                     was_expanded, timestamp)
+                VALUES (?, ?, ?, 1.0, 0, ?)
+            ''', (notification_id, task_id, action, responded_at))
+    conn.commit()
+    conn.close()
+
+
+def replay(db_path, task_id=1):
+    engine = ReplayEngine(db_path, policies=[], include_archives=False)
+    policy = FixedPolicy(engine.store, task_id)
+    engine.policies = {'fixed': policy}
+    return engine.run(), policy
+
+
+def test_estimates_on_hand_built_history(db_path):
+    build_history(db_path, [
+        (1, '2026-01-02 10:00:00', 0.5, 'clicked', '2026-01-02 10:01:00'),
+        (2, '2026-01-02 11:00:00', 0.25, 'clicked', '2026-01-02 11:01:00'),
+        (1, '2026-01-02 12:00:00', 0.8, 'dismissed', '2026-01-02 12:01:00'),
+        (1, '2026-01-02 13:00:00', None, 'clicked', '2026-01-02 13:01:00'),
+    ])
+    report, _ = replay(db_path)
+
+    assert report['decisions'] == 4
+    assert report['unlogged_decisions'] == 1
+    assert report['logged_positive_rate'] == pytest.approx(3 / 4)
+    estimate = report['policies']['fixed']
+    assert estimate['decisions'] == 3
+    assert estimate['match_rate'] == pytest.approx(2 / 3)
+    assert estimate['ips'] == pytest.approx((1 / 0.5) / 3)
+    assert estimate['snips'] == pytest.approx((1 / 0.5) / (1 / 0.5 + 1 / 0.8))
+
+
+def test_responses_apply_when_given(db_path):
+    # The first response arrives after the second decision was made
+    build_history(db_path, [
+        (1, '2026-01-02 10:00:00', 0.5, 'clicked', '2026-01-02 11:30:00'),
+        (1, '2026-01-02 11:00:00', 0.5, None, None),
+        (1, '2026-01-02 12:00:00', 0.5, None, None),
+    ])
+    _, policy = replay(db_path)
+    assert policy.seen_responses == [0, 0, 1]
+
+
+def test_inactive_tasks_are_not_candidates(db_path):
+    build_history(db_path, [
+        (1, '2026-01-02 10:00:00', 0.5, 'clicked', '2026-01-02 10:01:00'),
+        (2, '2026-01-02 11:00:00', 0.5, 'clicked', '2026-01-02 11:01:00'),
+    ], inactive=(2,))
+    report, policy = replay(db_path)
+    assert policy.offered == [[1], [1]]
+    # Decisions on the deactivated task still count against the candidate
+    assert report['policies']['fixed']['decisions'] == 2
+
+
+def test_policy_estimate_without_matches():
+    estimate = PolicyEstimate('none')
+    estimate.add(False, 1, 0.5)
+    assert estimate.to_dict() == {'decisions': 1, 'match_rate': 0.0, 'ips': 0.0, 'snips': 0.0}
+    assert PolicyEstimate('empty').to_dict()['ips'] == 0.0
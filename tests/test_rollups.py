@@ -0,0 +1,97 @@
+import sqlite3
+from argparse import Namespace
+from datetime import datetime
+
+import pytest
+
+from src.database import maintenance
+from src.models.ids import NotificationIdGenerator
+from src.models.models import GeneratedNotification, NotificationResponse
+
+IDS = NotificationIdGenerator(8)
+
+
+def _notify(db, task_id, action=None):
+    notification_id = IDS.next_id()
+    db.save_notification(GeneratedNotification(
+        None, notification_id, task_id, "hook", None, "step", 0.5, 'template', datetime.now()))
+    if action is not None:
+        db.save_response(NotificationResponse(None, notification_id, task_id, action, 1.0,
+                                              False, datetime.now(), {}))
+    return notification_id
+
+
+def _age(db, notification_id, days):
+    """Move a notification and its responses ``days`` into the past"""
+    conn = sqlite3.connect(db.db_path)
+    for table in ('generated_notifications', 'notification_responses'):
+        conn.execute(f"UPDATE {table} SET timestamp = datetime(timestamp, ?) "
+                     "WHERE notification_id = ?", (f"-{days} days", notification_id))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def history(db):
+    """User 1 with a clicked, a dismissed and an unanswered notification on one
+    task, and user 2 with one clicked notification"""
+    task_id = db.get_user_tasks(1)[0].id
+    other_user = db.create_user("other", "other@example.com")
+    other_task = db.create_task(other_user, "Other task", 'health', 5)
+    ids = [_notify(db, task_id, 'clicked'), _notify(db, task_id, 'dismissed'),
+           _notify(db, task_id), _notify(db, other_task, 'clicked')]
+    return db, task_id, other_user, ids
+
+
+def test_stats_are_filtered_by_user(history):
+    db, task_id, other_user, _ = history
+    everyone = db.get_system_stats()
+    mine = db.get_system_stats(user_id=1)
+    theirs = db.get_system_stats(user_id=other_user)
+    assert (everyone['total_notifications'], everyone['total_responses']) == (4, 3)
+    assert (mine['total_notifications'], mine['total_responses']) == (3, 2)
+    assert (theirs['total_notifications'], theirs['total_responses']) == (1, 1)
+    assert theirs['category_performance']['health'] == {'total_responses': 1,
+                                                        'success_rate': 1.0}
+    assert theirs['active_tasks'] == 1
+
+
+def test_backfill_matches_the_incremental_rollups(history):
+    db = history[0]
+    before = [db.get_system_stats(window=window) for window in (None, '24h', '30d')]
+    db.backfill_rollups()
+    assert [db.get_system_stats(window=window) for window in (None, '24h', '30d')] == before
+
+
+def test_windows_count_only_recent_history(history):
+    db, _, _, ids = history
+    _age(db, ids[0], 10)
+    db.backfill_rollups()
+    assert db.get_system_stats(window='24h')['total_notifications'] == 3
+    assert db.get_system_stats(window='7d')['total_notifications'] == 3
+    assert db.get_system_stats(window='30d')['total_notifications'] == 4
+    assert db.get_system_stats()['total_notifications'] == 4
+    with pytest.raises(ValueError):
+        db.get_system_stats(window='1y')
+
+
+def test_failed_backfill_keeps_the_old_rollups(history, monkeypatch):
+    db = history[0]
+    before = db.get_system_stats()
+    backfill_from = db._backfill_from
+
+    def fail_after(cursor, schema):
+        backfill_from(cursor, schema)
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(db, '_backfill_from', fail_after)
+    with pytest.raises(sqlite3.OperationalError):
+        db.backfill_rollups()
+    assert db.get_system_stats() == before
+
+
+def test_maintenance_backfill_seeds_nothing(db_path):
+    maintenance.backfill_rollups(Namespace(db=db_path))
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    conn.close()
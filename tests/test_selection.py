@@ -0,0 +1,31 @@
+import pytest
+
+from src.core.selection import SELECTION_POLICIES, SelectionPolicy, create_policy
+
+CONTEXT = {'scrolling_time': 600, 'hour': 21, 'day_of_week': 4}
+
+
+def _choices(db, name, seed, rounds=30):
+    policy = create_policy(name, db, seed=seed)
+    tasks = db.get_user_tasks(1)
+    return [policy.select(tasks, CONTEXT)[0].id for _ in range(rounds)]
+
+
+@pytest.mark.parametrize('name', sorted(SELECTION_POLICIES))
+def test_same_seed_same_choices(db, name):
+    assert _choices(db, name, seed=7) == _choices(db, name, seed=7)
+
+
+def test_policies_draw_from_their_own_generator(db):
+    policy = create_policy('thompson', db, seed=1)
+    other = create_policy('thompson', db, seed=1)
+    policy.rng.random()
+    assert policy.rng is not other.rng
+    assert policy.rng.random() != other.rng.random()
+
+
+def test_policy_interface_is_abstract(db):
+    with pytest.raises(TypeError):
+        SelectionPolicy(db)
+    with pytest.raises(ValueError):
+        create_policy('unknown', db)
@@ -0,0 +1,43 @@
+import pytest
+
+from src.core.scroll_breaker import ScrollBreakerAI
+from src.models.ids import format_notification_id
+from src.server.app import NotificationServer
+
+
+@pytest.fixture
+def server(db_path):
+    ai = ScrollBreakerAI(db_path, llm_provider='none', durability='sync', shards=1,
+                         warm_start=False)
+    yield NotificationServer(ai, port=0)
+    ai.close()
+
+
+def _response(notification_id):
+    return {'notification_id': format_notification_id(notification_id),
+            'user_action': 'clicked', 'response_time': 2.5}
+
+
+def test_failing_item_does_not_discard_the_batch(server, monkeypatch, metrics):
+    ai = server.ai_system
+    ids = [ai.generate_smart_notification({'scrolling_time': 300}, user_id=1).notification_id
+           for _ in range(3)]
+    record = ai.process_user_response
+
+    def process(notification_id, *args):
+        if notification_id == ids[1]:
+            raise RuntimeError("database is locked")
+        return record(notification_id, *args)
+
+    monkeypatch.setattr(ai, 'process_user_response', process)
+    results = server._respond_batch({'responses': [_response(i) for i in ids]}, {})['results']
+    assert [result['status'] for result in results] == ['success', 'error', 'success']
+    assert results[1]['error'] == "database is locked"
+    assert metrics.snapshot()['counters']['server.batch_item_errors'] == 1
+
+
+def test_invalid_items_are_reported_individually(server):
+    results = server._respond_batch({'responses': [
+        "not an object", {'notification_id': "bad", 'user_action': 'clicked',
+                          'response_time': 1}]}, {})['results']
+    assert [result['status'] for result in results] == ['error', 'error']
@@ -0,0 +1,74 @@
+import sqlite3
+
+from src.database import manager
+from src.database.archive import NotificationArchive
+from src.database.manager import record_legacy_ids
+from src.database.sharding import ShardedDatabaseManager
+from tests.test_archive import archive_all, notify
+
+
+def _segment_rows(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT task_id FROM generated_notifications").fetchall()
+    conn.close()
+    return sorted(row[0] for row in rows)
+
+
+def test_split_shard_moves_archived_history_with_its_tasks(tmp_path):
+    store = ShardedDatabaseManager(str(tmp_path / "store"), num_shards=1, durability='sync')
+    try:
+        tasks = {}
+        for n in range(4):
+            user_id = store.create_user(f"user{n}", f"user{n}@example.com")
+            tasks[user_id] = store.create_task(user_id, f"Task {n}", 'work', 5)
+            notify(store, tasks[user_id])
+        store.flush()
+        archive_all(store.shards[0].db_path, str(tmp_path / "archive"))
+
+        new_shard = store.split_shard(0)
+        source = NotificationArchive(store.shards[0].db_path)
+        target = NotificationArchive(store.shards[new_shard].db_path)
+        [(_, source_path)] = source.segments()
+        [(_, target_path)] = target.segments()
+        assert source_path != target_path
+
+        moved_tasks = [task_id for user_id, task_id in tasks.items()
+                       if store._shard_id_for_user(user_id) == new_shard]
+        kept_tasks = [task_id for task_id in tasks.values() if task_id not in moved_tasks]
+        assert moved_tasks and kept_tasks
+        assert _segment_rows(target_path) == sorted(moved_tasks * 3)
+        assert _segment_rows(source_path) == sorted(kept_tasks * 3)
+    finally:
+        store.close()
+
+
+def test_split_shard_leaves_no_moved_state_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(manager, 'ENGAGEMENT_MODE', 'events')
+    store = ShardedDatabaseManager(str(tmp_path / "store"), num_shards=1, durability='sync')
+    try:
+        tasks = {}
+        for n in range(4):
+            user_id = store.create_user(f"user{n}", f"user{n}@example.com")
+            tasks[user_id] = store.create_task(user_id, f"Task {n}", 'work', 5)
+            store.update_task_engagement(tasks[user_id], 'dismissed')
+        # Mappings of text IDs converted before the split
+        source = store.shards[0]
+        conn = sqlite3.connect(source.db_path)
+        record_legacy_ids(conn.cursor(), {f"notif_{task_id}_1700000000": 1000 + task_id
+                                          for task_id in tasks.values()})
+        conn.commit()
+        conn.close()
+
+        new_shard = store.split_shard(0)
+        target = store.shards[new_shard]
+        for user_id, task_id in tasks.items():
+            owner, other = ((target, source) if store._shard_id_for_user(user_id) == new_shard
+                            else (source, target))
+            assert owner._engagement_log.get(task_id).consecutive_dismissals == 1
+            assert other._engagement_log.get(task_id) is None
+            text_id = f"notif_{task_id}_1700000000"
+            assert owner.resolve_legacy_notification_id(text_id) == 1000 + task_id
+            assert other.resolve_legacy_notification_id(text_id) is None
+            assert store.resolve_legacy_notification_id(text_id) == 1000 + task_id
+    finally:
+        store.close()
@@ -0,0 +1,50 @@
+import pytest
+
+from src.database import shared_state
+from src.database.shared_state import HEADER_SIZE, SEQ, SharedEngagementStore
+from src.models.engagement import EngagementState
+
+pytestmark = pytest.mark.skipif(shared_state.fcntl is None, reason="needs POSIX file locks")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedEngagementStore(str(tmp_path / "shared.db"), lambda: ([], [], []),
+                                  capacity=8)
+    yield store
+    store.close()
+
+
+def _slot_seq(store, task_id):
+    return SEQ.unpack_from(store._buf, HEADER_SIZE + task_id * store._slot_size)[0]
+
+
+def _set_slot_seq(store, task_id, seq):
+    SEQ.pack_into(store._buf, HEADER_SIZE + task_id * store._slot_size, seq)
+
+
+def test_writes_are_visible_to_readers(store):
+    store.update_engagement(3, lambda: EngagementState(consecutive_dismissals=2,
+                                                       engagement_score=0.5))
+    store.add_response(3, None, positive=1, negative=0)
+    state = store.engagement(3)
+    assert (state.consecutive_dismissals, state.engagement_score) == (2, 0.5)
+    assert store.counts(3) == (1, 1, 0)
+    assert _slot_seq(store, 3) % 2 == 0
+
+
+def test_slot_left_mid_write_falls_back_and_is_repaired(store, monkeypatch):
+    monkeypatch.setattr(shared_state, 'MAX_READ_RETRIES', 5)
+    _set_slot_seq(store, 2, 7)  # a writer died between its two sequence updates
+    assert store.engagement(2) is None
+    assert store.counts(2) is None
+    assert store.arm(2, 'evening:weekday:long') is None
+
+    store.add_response(2, None, positive=0, negative=1)
+    assert _slot_seq(store, 2) == 10
+    assert store.counts(2) == (1, 0, 1)
+
+
+def test_layout_mismatch_is_rejected(store, tmp_path):
+    with pytest.raises(RuntimeError):
+        SharedEngagementStore(str(tmp_path / "shared.db"), lambda: ([], [], []), capacity=16)
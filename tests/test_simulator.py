@@ -0,0 +1,37 @@
+import random
+
+from src.core.scroll_breaker import ScrollBreakerAI
+from src.simulation.simulator import SimulationConfig, UserSimulator
+
+
+def test_supplied_system_gets_simulated_users(db_path):
+    ai = ScrollBreakerAI(db_path, llm_provider='none', durability='sync', shards=1,
+                         warm_start=False)
+    try:
+        simulator = UserSimulator(SimulationConfig(users=3, requests=30, seed=5,
+                                                   db_path=db_path), ai_system=ai)
+        report = simulator.run()
+        assert len(simulator.users) == 3
+        assert report['config']['users'] == 3
+        assert report['latency']['generate']['count'] == 30
+    finally:
+        ai.close()
+
+
+def test_same_seed_same_report(tmp_path):
+    reports = []
+    for run in range(2):
+        config = SimulationConfig(users=3, requests=40, seed=11,
+                                  db_path=str(tmp_path / f"run{run}.db"))
+        simulator = UserSimulator(config)
+        # Runs must not depend on, or reseed, the global generator
+        random.seed(run)
+        state = random.getstate()
+        try:
+            report = simulator.run()
+        finally:
+            if simulator.ai_system is not None:
+                simulator.ai_system.close()
+        assert random.getstate() == state
+        reports.append(report['engagement'])
+    assert reports[0] == reports[1]
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.core.scroll_breaker import ScrollBreakerAI
+from src.core.warm_start import load_snapshot, save_snapshot
+
+LAYOUT = {'shards': 1, 'engagement': 'table', 'durability': 'sync'}
+STATE = {'pool': [1, 2, 3]}
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "warm.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE rows (value INTEGER)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _save(database, schema_version=1, layout=LAYOUT):
+    snapshot = database + '.warm'
+    assert save_snapshot(snapshot, [database], schema_version, layout, STATE)
+    return snapshot
+
+
+def test_snapshot_round_trips_once(database):
+    snapshot = _save(database)
+    assert load_snapshot(snapshot, database, 1, LAYOUT) == STATE
+    assert not os.path.exists(snapshot)
+    assert load_snapshot(snapshot, database, 1, LAYOUT) is None
+
+
+@pytest.mark.parametrize('layout', [
+    {**LAYOUT, 'shards': 4},
+    {**LAYOUT, 'engagement': 'events'},
+    {**LAYOUT, 'durability': 'batched'},
+])
+def test_other_layout_is_rejected(database, layout):
+    assert load_snapshot(_save(database), database, 1, layout) is None
+
+
+def test_other_schema_version_is_rejected(database):
+    assert load_snapshot(_save(database), database, 2, LAYOUT) is None
+
+
+def test_other_database_is_rejected(database, tmp_path):
+    other = str(tmp_path / "other.db")
+    sqlite3.connect(other).close()
+    assert load_snapshot(_save(database), other, 1, LAYOUT) is None
+
+
+def test_database_written_after_the_snapshot_is_rejected(database):
+    snapshot = _save(database)
+    conn = sqlite3.connect(database)
+    conn.execute("INSERT INTO rows VALUES (1)")
+    conn.commit()
+    conn.close()
+    assert load_snapshot(snapshot, database, 1, LAYOUT) is None
+
+
+def test_corrupt_payload_is_rejected(database):
+    snapshot = _save(database)
+    with open(snapshot, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+    assert load_snapshot(snapshot, database, 1, LAYOUT) is None
+
+
+def test_worker_restarts_warm_only_with_the_same_layout(db_path):
+    ai = ScrollBreakerAI(db_path, llm_provider='none', durability='sync', warm_start=True)
+    ai.generate_smart_notification({'scrolling_time': 600, 'hour': 21}, user_id=1)
+    ai.close()
+    assert os.path.exists(db_path + '.warm')
+
+    ai = ScrollBreakerAI(db_path, llm_provider='none', durability='sync', warm_start=True)
+    assert ai.warm_started
+    ai.close()
+
+    ai = ScrollBreakerAI(db_path, llm_provider='none', durability='batched', warm_start=True)
+    assert not ai.warm_started
+    ai.warm_start = False
+    ai.close()